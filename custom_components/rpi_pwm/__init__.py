@@ -1,63 +1,319 @@
 """The rpi PWM component."""
 
+import asyncio
 import logging
-from platform import uname
+from dataclasses import dataclass, field
 from types import MappingProxyType
 from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_PIN, Platform
-from homeassistant.core import HomeAssistant
-from rpi_hardware_pwm import HardwarePWM
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_PIN,
+    CONF_PORT,
+    CONF_TYPE,
+    EVENT_HOMEASSISTANT_STOP,
+    Platform,
+)
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.typing import ConfigType
 
 from .const import (
     CONF_FREQUENCY,
     CONF_RPI,
-    GPIO13,
-    GPIO18,
-    GPIO19,
-    KERNEL_VERSION_RPI5_CHIP_2,
-    RPI5,
+    CONF_SOURCE_SENSOR,
+    DATA_BRING_UP,
+    DATA_FRAME_CLOCK,
+    DATA_HARDWARE,
+    DATA_REMOTES,
+    DATA_SIMULATOR,
+    DEFAULT_AGENT_PORT,
+    DOMAIN,
+    RPI_UNKNOWN,
+    SIGNAL_RECONFIGURE,
 )
+from .hardware import HardwareProfile, probe_hardware
+from .metrics import ChannelMetrics
+from .remote import RemotePwmChannel, RemotePwmClient
+from .services import async_setup_services
+from .simulate import PwmSimulator, SimulatedPwmChannel
+from .sysfs import SysfsPwmChannel, SysfsPwmError, open_channels
+from .transition import FrameClock
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.LIGHT, Platform.NUMBER, Platform.FAN]
-
-
-def _make_pwm_device(config: MappingProxyType[str, Any]) -> HardwarePWM:
-    """Non-async function to create the HardwarePWM object."""
-    chip = 0
-    channel = 0
-    if config[CONF_PIN] in [GPIO13, GPIO19]:
-        channel = 1
-    if config[CONF_RPI] == RPI5:
-        release = uname().release.split(".")
-        kernel_version = float(release[0] + "." + release[1])
-        if kernel_version <= KERNEL_VERSION_RPI5_CHIP_2:
-            chip = 2
-        if config[CONF_PIN] in [GPIO18, GPIO19]:
-            channel += 2
-    pwm = HardwarePWM(
-        pwm_channel=channel,
+PLATFORMS = [Platform.LIGHT, Platform.NUMBER, Platform.FAN, Platform.SENSOR]
+
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+PwmChannel = SysfsPwmChannel | RemotePwmChannel
+BringUpRequest = tuple[MappingProxyType[str, Any], asyncio.Future[PwmChannel]]
+
+# Config keys that can not be changed on a running entity
+RELOAD_KEYS = (CONF_PIN, CONF_TYPE, CONF_RPI, CONF_SOURCE_SENSOR, CONF_HOST, CONF_PORT)
+
+
+@dataclass
+class RpiPwmData:
+    """Runtime data of a config entry, which owns one PWM channel."""
+
+    config: MappingProxyType[str, Any]
+    pwm: asyncio.Future[PwmChannel]
+    metrics: ChannelMetrics = field(default_factory=ChannelMetrics)
+
+
+RpiPwmConfigEntry = ConfigEntry[RpiPwmData]
+
+
+def async_get_simulator(hass: HomeAssistant) -> PwmSimulator:
+    """Return the simulated PWM sysfs tree, shared by all simulated entities."""
+    data = hass.data.setdefault(DOMAIN, {})
+    if DATA_SIMULATOR not in data:
+        data[DATA_SIMULATOR] = PwmSimulator()
+    return data[DATA_SIMULATOR]
+
+
+@callback
+def async_get_frame_clock(hass: HomeAssistant) -> FrameClock:
+    """Return the frame clock thread, shared by all threaded transitions."""
+    data = hass.data.setdefault(DOMAIN, {})
+    if DATA_FRAME_CLOCK not in data:
+        clock = data[DATA_FRAME_CLOCK] = FrameClock(hass.loop)
+        hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, lambda _event: clock.stop()
+        )
+    return data[DATA_FRAME_CLOCK]
+
+
+@callback
+def async_get_remote_client(
+    hass: HomeAssistant,
+    host: str,
+    port: int = DEFAULT_AGENT_PORT,
+    secret: str | None = None,
+) -> RemotePwmClient:
+    """Return the connection to the PWM agent of a remote Pi, shared by its entries."""
+    remotes = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_REMOTES, {})
+    if (host, port) in remotes:
+        if secret is not None:
+            # A changed secret applies from the next connection on.
+            remotes[(host, port)].secret = secret
+    else:
+        client = remotes[(host, port)] = RemotePwmClient(hass.loop, host, port, secret)
+
+        async def _async_close(_event: Event) -> None:
+            await client.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_close)
+    return remotes[(host, port)]
+
+
+async def async_get_hardware_profile(hass: HomeAssistant) -> HardwareProfile:
+    """
+    Return the hardware profile, probed once per Home Assistant run.
+
+    Callers share the running probe. A probe that fails is not kept, the next
+    call probes again.
+    """
+    data = hass.data.setdefault(DOMAIN, {})
+    if DATA_HARDWARE not in data:
+        data[DATA_HARDWARE] = hass.async_add_executor_job(probe_hardware)
+    probe: asyncio.Future[HardwareProfile] = data[DATA_HARDWARE]
+    try:
+        # A cancelled caller must not cancel the probe of the others.
+        return await asyncio.shield(probe)
+    except Exception:
+        if data.get(DATA_HARDWARE) is probe and probe.done():
+            del data[DATA_HARDWARE]
+        raise
+
+
+def _make_pwm_device(
+    config: MappingProxyType[str, Any],
+    profile: HardwareProfile,
+    simulator: PwmSimulator | None = None,
+) -> SysfsPwmChannel:
+    """Create the (not yet opened) PWM channel of a config."""
+    try:
+        chip, channel = profile.pwm_channel(config[CONF_PIN], config[CONF_RPI])
+    except KeyError as err:
+        msg = f"{config[CONF_PIN]} is not a PWM pin of this board"
+        raise SysfsPwmError(msg) from err
+    if config[CONF_RPI] == RPI_UNKNOWN:
+        if simulator is None:
+            msg = "A simulator is needed to simulate a PWM channel"
+            raise SysfsPwmError(msg)
+        return SimulatedPwmChannel(
+            simulator,
+            channel=channel,
+            hz=config[CONF_FREQUENCY],
+            chip=chip,
+        )
+    return SysfsPwmChannel(
+        channel=channel,
         hz=config[CONF_FREQUENCY],
         chip=chip,
     )
-    pwm.start(0)
-    return pwm
 
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+def _make_pwm_devices(
+    configs: list[MappingProxyType[str, Any]],
+    profile: HardwareProfile,
+    simulator: PwmSimulator | None = None,
+) -> list[SysfsPwmChannel | SysfsPwmError]:
+    """
+    Non-async function to export and open several PWM channels together.
+
+    Returns the open channel or the error of each config, in order; a config
+    that can not be resolved to a channel, like one with an unknown pin,
+    fails only itself.
+    """
+    results: list[SysfsPwmChannel | SysfsPwmError] = []
+    for config in configs:
+        try:
+            results.append(_make_pwm_device(config, profile, simulator))
+        except SysfsPwmError as err:
+            results.append(err)
+
+    channels = [pwm for pwm in results if isinstance(pwm, SysfsPwmChannel)]
+    errors = iter(open_channels(channels))
+    for index, pwm in enumerate(results):
+        if isinstance(pwm, SysfsPwmChannel) and (error := next(errors)) is not None:
+            results[index] = error
+    return results
+
+
+@callback
+def async_request_pwm_channel(
+    hass: HomeAssistant, config: MappingProxyType[str, Any]
+) -> asyncio.Future[PwmChannel]:
+    """
+    Queue a PWM channel for bring-up and return a future of the open channel.
+
+    Requests made before the bring-up task runs, like those of all config
+    entries set up at startup, are exported and opened in one executor job;
+    channels of remote Pis are opened with pipelined requests to their agents.
+    """
+    data = hass.data.setdefault(DOMAIN, {})
+    future: asyncio.Future[PwmChannel] = hass.loop.create_future()
+    if DATA_BRING_UP not in data:
+        data[DATA_BRING_UP] = []
+        hass.async_create_task(
+            _async_bring_up(hass), "rpi_pwm channel bring-up", eager_start=False
+        )
+    data[DATA_BRING_UP].append((config, future))
+    return future
+
+
+async def _async_bring_up(hass: HomeAssistant) -> None:
+    """Bring up all queued PWM channels, the local and remote ones in parallel."""
+    batch = hass.data[DOMAIN].pop(DATA_BRING_UP)
+    await asyncio.gather(
+        _async_bring_up_local(
+            hass, [request for request in batch if CONF_HOST not in request[0]]
+        ),
+        _async_bring_up_remote(
+            hass, [request for request in batch if CONF_HOST in request[0]]
+        ),
+    )
+
+
+async def _async_bring_up_remote(
+    hass: HomeAssistant,
+    batch: list[BringUpRequest],
+) -> None:
+    """Open the queued channels of remote Pis, all requests in flight at once."""
+    if not batch:
+        return
+    results = await asyncio.gather(
+        *(
+            async_get_remote_client(
+                hass, config[CONF_HOST], config[CONF_PORT], config.get(CONF_PASSWORD)
+            ).async_open_channel(config[CONF_PIN], config[CONF_FREQUENCY])
+            for config, _ in batch
+        ),
+        return_exceptions=True,
+    )
+    await _async_hand_out(hass, batch, results)
+
+
+async def _async_bring_up_local(
+    hass: HomeAssistant,
+    batch: list[BringUpRequest],
+) -> None:
+    """Export and open the queued local channels together."""
+    if not batch:
+        return
+    profile = await async_get_hardware_profile(hass)
+    configs = [config for config, _ in batch]
+    simulator = None
+    if any(config[CONF_RPI] == RPI_UNKNOWN for config in configs):
+        simulator = async_get_simulator(hass)
+    _LOGGER.debug("Bringing up %d PWM channels", len(configs))
+    try:
+        results = await hass.async_add_executor_job(
+            _make_pwm_devices, configs, profile, simulator
+        )
+    except Exception as err:
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(err)
+        raise
+    await _async_hand_out(hass, batch, results)
+
+
+async def _async_hand_out(
+    hass: HomeAssistant,
+    batch: list[BringUpRequest],
+    results: list[PwmChannel | BaseException],
+) -> None:
+    """Resolve the futures of a batch, closing channels nobody waits for."""
+    for (_, future), result in zip(batch, results, strict=True):
+        if future.cancelled():
+            if not isinstance(result, BaseException):
+                await hass.async_add_executor_job(result.close)
+        elif isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:  # noqa: ARG001
+    """Set up the rpi-pwm services."""
+    async_setup_services(hass)
+    return True
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: RpiPwmConfigEntry) -> bool:
     """Set up rpi-pwm from a config entry."""
+    entry.runtime_data = RpiPwmData(
+        config=entry.data, pwm=async_request_pwm_channel(hass, entry.data)
+    )
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
     entry.async_on_unload(entry.add_update_listener(config_entry_update_listener))
     return True
 
 
-async def config_entry_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Update listener, called when the config entry options are changed."""
-    await hass.config_entries.async_reload(entry.entry_id)
+async def config_entry_update_listener(
+    hass: HomeAssistant, entry: RpiPwmConfigEntry
+) -> None:
+    """
+    Update listener, called when the config entry is changed.
+
+    A change of one of the RELOAD_KEYS (the pin, entity type, board, source
+    sensor or the host and port of the agent) needs a reload; everything else
+    is applied to the running entity, so the output keeps running.
+    """
+    running = entry.runtime_data.config
+    if any(entry.data.get(key) != running.get(key) for key in RELOAD_KEYS):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    entry.runtime_data.config = entry.data
+    async_dispatcher_send(hass, SIGNAL_RECONFIGURE.format(entry.unique_id), entry.data)
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
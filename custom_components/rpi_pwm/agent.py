@@ -0,0 +1,498 @@
+"""
+Standalone agent that drives the PWM channels of a Pi for a remote Home Assistant.
+
+The agent only needs the standard library. It owns the local sysfs channels
+(or a simulated tree) and serves the protocol of remote.py; frame plans are
+played here, on the event loop of the agent, so the network carries only
+the plans and targets.
+
+The agent listens on localhost unless told otherwise. With a shared secret,
+only clients that know it are served.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import hmac
+import ipaddress
+import logging
+import secrets
+import struct
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .const import DEFAULT_AGENT_PORT, RPI5, RPI_UNKNOWN
+from .hardware import HardwareProfile, probe_hardware
+from .remote import (
+    CHALLENGE_SIZE,
+    DUTY,
+    FLAG_REPLY,
+    FREQUENCY,
+    HEADER,
+    MAX_PAYLOAD,
+    OP_AUTH,
+    OP_CANCEL,
+    OP_CLOSE,
+    OP_DONE,
+    OP_ERROR,
+    OP_FREQUENCY,
+    OP_HELLO,
+    OP_OPEN,
+    OP_PLAY,
+    OP_SET,
+    OP_START,
+    OP_STOP,
+    PROTOCOL_VERSION,
+    STATE,
+    VERSION,
+    WRITTEN,
+    decode_plan,
+    encode_profile,
+    sign_challenge,
+)
+from .simulate import SIMULATED_NPWM, PwmSimulator, SimulatedPwmChannel
+from .sysfs import SysfsPwmChannel, SysfsPwmError, open_channels
+from .transition import TransitionRunner
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from .transition import FramePlan
+
+_LOGGER = logging.getLogger(__name__)
+
+Request = tuple[int, int, int, bytes]  # op, handle, request id, payload
+
+# A Pi 5 has four independent channels to simulate
+SIMULATED_PROFILE = HardwareProfile(
+    board_model=f"{RPI5} (simulated)", chips={0: SIMULATED_NPWM}
+)
+DEFAULT_HOST = "127.0.0.1"
+
+
+class AgentChannel:
+    """An open channel of the agent and the plan it plays, if any."""
+
+    def __init__(self, key: tuple[int, int], pwm: SysfsPwmChannel) -> None:
+        """Initialize the channel around an open sysfs channel."""
+        self.key = key
+        self.pwm = pwm
+        self.runner: TransitionRunner | None = None
+        self._failed = False
+
+    def state(self) -> bytes:
+        """Return the output state as sent in replies."""
+        pwm = self.pwm
+        return STATE.pack(pwm.period_ns, pwm.duty_ns, pwm.is_enabled)
+
+    def play(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        plan: FramePlan,
+        period: float | None,
+        on_done: Callable[[], None],
+    ) -> None:
+        """Play a plan of duty cycles in ns, replacing the running one."""
+        self.cancel()
+        self._failed = False
+        self.runner = TransitionRunner(
+            loop, plan, self._write_frame, on_done, None, period
+        )
+        self.runner.start()
+
+    def cancel(self) -> None:
+        """Stop the running plan, the output keeps the value it reached."""
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner = None
+
+    def close(self) -> None:
+        """Stop playing and close the channel, the output keeps its state."""
+        self.cancel()
+        self.pwm.close()
+
+    def _write_frame(self, duty_ns: float) -> None:
+        """Write one frame of a plan, errors are only logged once."""
+        try:
+            self.pwm.change_duty_ns(int(duty_ns))
+        except SysfsPwmError as err:
+            error = err
+        else:
+            return
+        if not self._failed:
+            _LOGGER.error("Playing on %s failed: %s", self.pwm.path, error)
+        self._failed = True
+
+
+class AgentConnection(asyncio.Protocol):
+    """
+    One client connection of the agent.
+
+    Requests are handled in order. All the requests that arrived together
+    are answered with a single write, and consecutive OP_OPEN requests are
+    opened together in one executor job, so udev is waited for only once.
+    Until the client answered the challenge, only OP_HELLO and OP_AUTH are
+    served.
+    """
+
+    def __init__(self, agent: PwmAgent) -> None:
+        """Initialize the connection of an agent."""
+        self._agent = agent
+        self._loop = asyncio.get_running_loop()
+        self._transport: asyncio.Transport | None = None
+        self._buffer = bytearray()
+        self._requests: deque[Request] = deque()
+        self._opening: asyncio.Task[None] | None = None
+        self._challenge = b""
+        self._authenticated = False
+        self.channels: dict[int, AgentChannel] = {}
+
+    @property
+    def connected(self) -> bool:
+        """Return if the client is still connected."""
+        return self._transport is not None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Remember the transport of the new connection."""
+        self._transport = transport  # type: ignore[assignment]
+        _LOGGER.info("Connection from %s", transport.get_extra_info("peername"))
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Close the channels of the connection, the outputs keep their state."""
+        _LOGGER.info("Connection closed: %s", exc or "by the client")
+        self._transport = None
+        self._requests.clear()
+        for handle in list(self.channels):
+            self._agent.release(self, handle)
+
+    def data_received(self, data: bytes) -> None:
+        """Split the received data into requests and handle them."""
+        buffer = self._buffer
+        buffer += data
+        offset = 0
+        while len(buffer) - offset >= HEADER.size:
+            op, handle, request_id, length = HEADER.unpack_from(buffer, offset)
+            if length > MAX_PAYLOAD:
+                _LOGGER.error("Request of %d bytes is too long, disconnecting", length)
+                if self._transport is not None:
+                    self._transport.close()
+                return
+            end = offset + HEADER.size + length
+            if len(buffer) < end:
+                break
+            self._requests.append(
+                (op, handle, request_id, bytes(buffer[offset + HEADER.size : end]))
+            )
+            offset = end
+        del buffer[:offset]
+        if self._opening is None:
+            self._process()
+
+    def _process(self) -> None:
+        """Handle the queued requests until one has to wait for an open."""
+        replies = []
+        requests = self._requests
+        while requests:
+            if requests[0][0] == OP_OPEN and self._authenticated:
+                batch = []
+                while requests and requests[0][0] == OP_OPEN:
+                    batch.append(requests.popleft())
+                self._opening = self._loop.create_task(self._async_open(batch))
+                break
+            op, handle, request_id, payload = requests.popleft()
+            replies.append(self._handle(op, handle, request_id, payload))
+        self._send(replies)
+
+    def _send(self, messages: list[bytes]) -> None:
+        """Write messages to the client in one go."""
+        if messages and self._transport is not None:
+            self._transport.write(b"".join(messages))
+
+    def _handle(self, op: int, handle: int, request_id: int, payload: bytes) -> bytes:
+        """Handle one request and return the reply."""
+        try:
+            reply = self._execute(op, handle, payload)
+        except (SysfsPwmError, ValueError, struct.error) as err:
+            return _message(OP_ERROR, handle, request_id, str(err).encode())
+        return _message(op | FLAG_REPLY, handle, request_id, reply)
+
+    def _execute(self, op: int, handle: int, payload: bytes) -> bytes:
+        """Execute one request other than OP_OPEN, return the reply payload."""
+        if op == OP_HELLO:
+            (version,) = VERSION.unpack(payload)
+            if version != PROTOCOL_VERSION:
+                msg = f"Protocol version {version} is not supported"
+                raise SysfsPwmError(msg)
+            self._challenge = secrets.token_bytes(CHALLENGE_SIZE)
+            return self._challenge
+        if op == OP_AUTH:
+            return self._authenticate(payload)
+        if not self._authenticated:
+            msg = "Not authenticated"
+            raise SysfsPwmError(msg)
+        channel = self.channels.get(handle)
+        if channel is None:
+            msg = f"Channel {handle} is not open"
+            raise SysfsPwmError(msg)
+        if op == OP_PLAY:
+            play_id, plan, period = decode_plan(payload)
+            channel.play(
+                self._loop,
+                plan,
+                period,
+                lambda: self._send(
+                    [_message(OP_DONE, handle, play_id, channel.state())]
+                ),
+            )
+            return b""
+        # Anything else takes over from a running plan.
+        channel.cancel()
+        pwm = channel.pwm
+        if op == OP_SET:
+            return WRITTEN.pack(pwm.change_duty_ns(DUTY.unpack(payload)[0]))
+        if op == OP_START:
+            (duty_ns,) = DUTY.unpack(payload)
+            pwm.start(None if duty_ns < 0 else duty_ns)
+        elif op == OP_STOP:
+            pwm.stop()
+        elif op == OP_FREQUENCY:
+            pwm.change_frequency(FREQUENCY.unpack(payload)[0])
+        elif op == OP_CLOSE:
+            self._agent.release(self, handle)
+            return b""
+        elif op != OP_CANCEL:
+            msg = f"Unknown operation {op}"
+            raise SysfsPwmError(msg)
+        return channel.state()
+
+    def _authenticate(self, answer: bytes) -> bytes:
+        """Check the answer to the challenge, return the hardware profile."""
+        challenge, self._challenge = self._challenge, b""
+        if not challenge or not self._agent.verify(challenge, answer):
+            _LOGGER.warning(
+                "Client %s did not answer the challenge, disconnecting",
+                self._transport.get_extra_info("peername") if self._transport else None,
+            )
+            # After the reply is written
+            if self._transport is not None:
+                self._loop.call_soon(self._transport.close)
+            msg = "Invalid secret"
+            raise SysfsPwmError(msg)
+        self._authenticated = True
+        return encode_profile(self._agent.profile)
+
+    async def _async_open(self, batch: list[Request]) -> None:
+        """Open a batch of channels and go on with the queued requests."""
+        replies = []
+        try:
+            requests = []
+            for op, handle, request_id, payload in batch:
+                try:
+                    (hz,) = FREQUENCY.unpack_from(payload)
+                    pin = payload[FREQUENCY.size :].decode()
+                except (struct.error, UnicodeDecodeError) as err:
+                    replies.append(
+                        _message(OP_ERROR, handle, request_id, str(err).encode())
+                    )
+                    continue
+                requests.append((op, handle, request_id, pin, hz))
+            results = await self._agent.async_open(
+                self, [(handle, pin, hz) for _, handle, _, pin, hz in requests]
+            )
+            for (op, handle, request_id, _, _), result in zip(
+                requests, results, strict=True
+            ):
+                if isinstance(result, SysfsPwmError):
+                    replies.append(
+                        _message(OP_ERROR, handle, request_id, str(result).encode())
+                    )
+                else:
+                    replies.append(
+                        _message(op | FLAG_REPLY, handle, request_id, result.state())
+                    )
+        finally:
+            self._opening = None
+        self._send(replies)
+        if self._transport is not None:
+            self._process()
+
+
+def _message(op: int, handle: int, request_id: int, payload: bytes) -> bytes:
+    """Return a complete message."""
+    return HEADER.pack(op, handle, request_id, len(payload)) + payload
+
+
+class PwmAgent:
+    """
+    The channels of this Pi, served to the clients that connect.
+
+    Each hardware channel has one owner: a client that opens a channel that
+    is already open (typically the same Home Assistant after reconnecting)
+    takes it over.
+    """
+
+    def __init__(
+        self,
+        profile: HardwareProfile,
+        simulator: PwmSimulator | None = None,
+        secret: bytes | None = None,
+    ) -> None:
+        """
+        Initialize the agent, on a simulated sysfs tree if one is given.
+
+        Without a secret every client is served.
+        """
+        self.profile = profile
+        self._simulator = simulator
+        self._secret = secret
+        self._owners: dict[tuple[int, int], tuple[AgentConnection, int]] = {}
+
+    def verify(self, challenge: bytes, answer: bytes) -> bool:
+        """Return if a client answered a challenge with the secret."""
+        if not self._secret:
+            return True
+        return hmac.compare_digest(sign_challenge(self._secret, challenge), answer)
+
+    async def async_start(self, host: str | None, port: int) -> asyncio.Server:
+        """Start serving on host and port, None listens on all interfaces."""
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: AgentConnection(self), host, port)
+
+    def _make_channel(self, chip: int, channel: int, hz: float) -> SysfsPwmChannel:
+        """Return an unopened channel of the sysfs tree or the simulator."""
+        if self._simulator is not None:
+            return SimulatedPwmChannel(self._simulator, channel, hz, chip)
+        return SysfsPwmChannel(channel, hz, chip)
+
+    async def async_open(
+        self, connection: AgentConnection, requests: list[tuple[int, str, float]]
+    ) -> list[AgentChannel | SysfsPwmError]:
+        """
+        Open the channels of pins for a connection, under the given handles.
+
+        Returns one AgentChannel or error per request, in order.
+        """
+        usable = self.profile.pin_channels(self.profile.rpi_version)
+        results: list[AgentChannel | SysfsPwmError] = []
+        opening: list[tuple[int, int, AgentChannel]] = []
+        for handle, pin, hz in requests:
+            if pin not in usable:
+                results.append(SysfsPwmError(f"{pin} is no PWM pin of this board"))
+                continue
+            key = usable[pin]
+            self.release(connection, handle)
+            if (owner := self._owners.get(key)) is not None:
+                _LOGGER.info("Taking over %s from an earlier connection", pin)
+                self.release(*owner)
+            try:
+                channel = AgentChannel(key, self._make_channel(*key, hz))
+            except SysfsPwmError as err:
+                results.append(err)
+                continue
+            # Claim the channel right away, so another open waits its turn.
+            self._owners[key] = (connection, handle)
+            results.append(channel)
+            opening.append((len(results) - 1, handle, channel))
+
+        errors = await asyncio.get_running_loop().run_in_executor(
+            None, open_channels, [channel.pwm for _, _, channel in opening]
+        )
+        for (index, handle, channel), error in zip(opening, errors, strict=True):
+            owned = self._owners.get(channel.key) == (connection, handle)
+            if error is not None:
+                results[index] = error
+            elif owned and connection.connected:
+                connection.channels[handle] = channel
+                continue
+            else:
+                # Lost or taken over while opening.
+                channel.close()
+                results[index] = SysfsPwmError("The channel was taken over")
+            if owned:
+                del self._owners[channel.key]
+        return results
+
+    def release(self, connection: AgentConnection, handle: int) -> None:
+        """Close the channel of a connection, the output keeps its state."""
+        channel = connection.channels.pop(handle, None)
+        if channel is None:
+            return
+        channel.close()
+        if self._owners.get(channel.key) == (connection, handle):
+            del self._owners[channel.key]
+
+
+def main() -> None:
+    """Run the agent until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help="address to listen on, 0.0.0.0 for all (default: %(default)s)",
+    )
+    parser.add_argument("--port", type=int, default=DEFAULT_AGENT_PORT)
+    parser.add_argument(
+        "--secret-file",
+        type=Path,
+        help="file with the secret that clients have to know",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="drive a simulated sysfs tree instead of the hardware",
+    )
+    parser.add_argument("--debug", action="store_true", help="log debug messages")
+    args = parser.parse_args()
+    secret = None
+    if args.secret_file is not None:
+        try:
+            secret = args.secret_file.read_bytes().strip()
+        except OSError as err:
+            parser.error(f"Could not read the secret: {err}")
+    logging.basicConfig(
+        level=logging.DEBUG if args.debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_async_serve(args, secret))
+
+
+async def _async_serve(args: argparse.Namespace, secret: bytes | None) -> None:
+    """Serve until cancelled."""
+    profile = SIMULATED_PROFILE if args.simulate else probe_hardware()
+    simulator = None
+    if profile.rpi_version == RPI_UNKNOWN:
+        _LOGGER.warning("No Raspberry Pi detected, simulating the PWM outputs")
+        profile = SIMULATED_PROFILE
+    if profile is SIMULATED_PROFILE:
+        simulator = PwmSimulator()
+    if not secret and not _is_loopback(args.host):
+        _LOGGER.warning(
+            "Listening on %s without a secret: anyone who reaches this address"
+            " can drive the PWM outputs",
+            args.host,
+        )
+    server = await PwmAgent(profile, simulator, secret).async_start(
+        args.host, args.port
+    )
+    _LOGGER.info(
+        "PWM agent for %s listening on %s port %d",
+        profile.board_model,
+        args.host,
+        args.port,
+    )
+    async with server:
+        await server.serve_forever()
+
+
+def _is_loopback(host: str) -> bool:
+    """Return if host only listens on the loopback interface."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
@@ -0,0 +1,52 @@
+"""Perceptual brightness curves, compiled into lookup tables."""
+
+from __future__ import annotations
+
+from array import array
+
+from .const import CONST_PWM_MAX
+
+CURVE_LINEAR = "linear"
+CURVE_GAMMA = "gamma"
+CURVE_CIE1931 = "cie1931"
+
+CURVES = [CURVE_LINEAR, CURVE_GAMMA, CURVE_CIE1931]
+
+HASS_BRIGHTNESS_TABLE_SIZE = 256  # Home Assistant brightness 0..255
+TRANSITION_TABLE_SIZE = 4096
+
+# CIE 1931 lightness: L* above this value uses the cubic part of the curve.
+_CIE_LINEAR_LIMIT = 8.0
+_CIE_KAPPA = 903.3
+
+
+def _cie1931(lightness: float) -> float:
+    """Return relative luminance (0..1) for a perceived lightness of 0..1."""
+    l_star = lightness * 100.0
+    if l_star <= _CIE_LINEAR_LIMIT:
+        return l_star / _CIE_KAPPA
+    return ((l_star + 16.0) / 116.0) ** 3
+
+
+def build_brightness_table(
+    curve: str,
+    gamma: float = 2.2,
+    size: int = HASS_BRIGHTNESS_TABLE_SIZE,
+) -> array[float]:
+    """
+    Compile a curve into a table of duty cycles (0..100%).
+
+    Entry i holds the duty cycle for a perceived brightness of i / (size - 1),
+    so the table is monotonically increasing from 0% to 100%.
+    """
+    last = size - 1
+    if curve == CURVE_GAMMA:
+        table = array("d", ((i / last) ** gamma * CONST_PWM_MAX for i in range(size)))
+    elif curve == CURVE_CIE1931:
+        table = array("d", (_cie1931(i / last) * CONST_PWM_MAX for i in range(size)))
+    else:
+        table = array("d", (i * CONST_PWM_MAX / last for i in range(size)))
+    # Pin the end points, so on and off are exact whatever the rounding.
+    table[0] = 0.0
+    table[last] = CONST_PWM_MAX
+    return table
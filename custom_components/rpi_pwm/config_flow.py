@@ -1,7 +1,6 @@
 """Config flow definition for rpi_pwm."""
 
 import logging
-from pathlib import Path
 from typing import Any, ClassVar
 
 import voluptuous as vol
@@ -15,27 +14,65 @@ from homeassistant.config_entries import (
     ConfigFlowResult,
 )
 from homeassistant.const import (
+    CONF_HOST,
     CONF_MAXIMUM,
     CONF_MINIMUM,
     CONF_MODE,
     CONF_NAME,
+    CONF_PASSWORD,
     CONF_PIN,
+    CONF_PORT,
     CONF_TYPE,
     Platform,
 )
 from homeassistant.helpers import selector
 
+from . import async_get_hardware_profile, async_get_remote_client
+from .brightness import CURVES
 from .const import (
+    CONF_BRIGHTNESS_CURVE,
+    CONF_EASING,
+    CONF_FRAME_RATE,
     CONF_FREQUENCY,
+    CONF_GAMMA,
+    CONF_HYSTERESIS,
     CONF_INVERT,
+    CONF_KICKSTART_TIME,
+    CONF_MIN_INTERVAL,
     CONF_NORMALIZE_LOWER,
     CONF_NORMALIZE_UPPER,
+    CONF_RAMP_STEPS,
+    CONF_RAMP_TIME,
     CONF_RPI,
     CONF_RPI_MODEL,
+    CONF_SLEW_RATE,
+    CONF_SLEW_RESOLUTION,
+    CONF_SOURCE_SENSOR,
+    CONF_STATE_UPDATE_RATE,
     CONF_STEP,
+    CONF_TEMPERATURE_CURVE,
+    CONF_TIMING,
+    CONST_FRAME_RATE_MAX,
+    CONST_FRAME_RATE_MIN,
     CONST_PWM_FREQ_MAX,
     CONST_PWM_FREQ_MIN,
+    CONST_STATE_UPDATE_RATE_MAX,
+    DEFAULT_AGENT_PORT,
+    DEFAULT_BRIGHTNESS_CURVE,
+    DEFAULT_EASING,
+    DEFAULT_FRAME_RATE,
     DEFAULT_FREQ,
+    DEFAULT_GAMMA,
+    DEFAULT_HYSTERESIS,
+    DEFAULT_KICKSTART_TIME,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_RAMP_STEPS,
+    DEFAULT_RAMP_TIME,
+    DEFAULT_SLEW_RATE,
+    DEFAULT_SLEW_RESOLUTION,
+    DEFAULT_STATE_UPDATE_RATE,
+    DEFAULT_TEMPERATURE_CURVE,
+    DEFAULT_TIMING,
     DOMAIN,
     GPIO12,
     GPIO13,
@@ -44,70 +81,135 @@ from .const import (
     MODE_AUTO,
     MODE_BOX,
     MODE_SLIDER,
-    RPI1_2_3,
-    RPI5,
-    RPI_PWM_PINS,
-    RPI_UNKNOWN,
+    TIMINGS,
 )
+from .controller import parse_temperature_curve
+from .hardware import HardwareProfile
+from .remote import AgentAuthError, RemotePwmClient
+from .sysfs import SysfsPwmError
+from .transition import EASINGS
 
 _LOGGER = logging.getLogger(__name__)
 
+# Config keys of the PWM agent behind outputs of another Pi
+REMOTE_KEYS = (CONF_HOST, CONF_PORT)
+
 
 class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
     """RpiPWM device Config handler."""
 
     VERSION = 1
 
-    _all_pins: ClassVar[list[str]] = [GPIO12, GPIO13, GPIO18, GPIO19]
     _available_pins: ClassVar[list[str]] = [GPIO12, GPIO13, GPIO18, GPIO19]
+    # Host, port and secret of the PWM agent, empty for outputs of this Pi
+    _remote: dict[str, Any]
 
-    def _update_free_pins(self) -> None:
-        """Update list of pins that are free to use."""
-        self._available_pins.clear()
-        self._available_pins.extend(self._all_pins)
-        for pwm in self.hass.config_entries.async_entries(DOMAIN):
-            self._available_pins.remove(pwm.data[CONF_PIN])
+    def _update_free_pins(
+        self,
+        profile: HardwareProfile,
+        rpi_version: str,
+        ignore_entry_id: str | None = None,
+    ) -> None:
+        """
+        Update list of pins whose PWM channel is still free to use.
 
-    async def _async_find_board_revision(self) -> str:
-        """Return board revision of the raspberry pi."""
-        """e.g.: Raspberry Pi 5 Model B Rev 1.0."""
-        p = Path("//proc//device-tree//model")
-        if p.is_file():
-            return await self.hass.async_add_executor_job(p.read_text)
-        _LOGGER.warning(
-            "Could not detect raspberry pi model, are you sure this is a pi?"
-            " rpi-pwm will continue in simlation mode."
+        A pin is taken when another entry drives the same channel of the same
+        chip, so GPIO12 and GPIO18 exclude each other on boards before the
+        Pi 5, while the four RP1 channels of the Pi 5 are independent. Only
+        entries on the same Pi count.
+        """
+        used = {
+            profile.pwm_channel(entry.data[CONF_PIN], entry.data[CONF_RPI])
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+            if entry.entry_id != ignore_entry_id
+            and all(entry.data.get(key) == self._remote.get(key) for key in REMOTE_KEYS)
+        }
+        self._available_pins.clear()
+        self._available_pins.extend(
+            pin
+            for pin, channel in profile.pin_channels(rpi_version).items()
+            if channel not in used
         )
-        return ""
 
     async def async_step_user(
         self,
         user_input: dict[str, Any] | None = None,  # noqa: ARG002
     ) -> ConfigFlowResult:
         """Handle a flow initialized by the user."""
-        self._update_free_pins()
-        self._rpi_board_rev = await self._async_find_board_revision()
-        self._rpi_version = RPI_UNKNOWN
+        self._remote = {}
+        profile = await async_get_hardware_profile(self.hass)
+        self._rpi_board_rev = profile.board_model
+        self._rpi_version = profile.rpi_version
+        self._update_free_pins(profile, self._rpi_version)
 
-        if self._rpi_board_rev.find(RPI5) != -1:
-            self._rpi_version = RPI5
-        elif self._rpi_board_rev.find(RPI1_2_3) != -1:
-            self._rpi_version = RPI1_2_3
+        options = {}
+        if self._available_pins:
+            options["light"] = "Light"
+            options["fan"] = "Fan"
+            options["number"] = "Number"
+        options["remote"] = "Output on another Raspberry Pi"
+        return self.async_show_menu(menu_options=options)
 
-        if (  # From 4 pins only 2 can be assigned to PWMs
-            len(self._all_pins) - len(self._available_pins) >= RPI_PWM_PINS
-        ):
-            return self.async_abort(
-                reason="All pins are configured: there are only "
-                + str(RPI_PWM_PINS)
-                + " PWM pins available for use on RPi.",
+    async def async_step_remote(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Connect to the PWM agent of another Pi."""
+        errors = {}
+        if user_input is not None:
+            remote = {
+                CONF_HOST: user_input[CONF_HOST],
+                CONF_PORT: int(user_input[CONF_PORT]),
+            }
+            if user_input.get(CONF_PASSWORD):
+                remote[CONF_PASSWORD] = user_input[CONF_PASSWORD]
+            # A connection of its own checks the secret, even when the
+            # outputs of the agent are connected already.
+            client = RemotePwmClient(
+                self.hass.loop,
+                remote[CONF_HOST],
+                remote[CONF_PORT],
+                remote.get(CONF_PASSWORD),
             )
+            try:
+                profile = await client.async_info()
+            except AgentAuthError as err:
+                _LOGGER.debug("The PWM agent refused the secret: %s", err)
+                errors["base"] = "invalid_auth"
+            except SysfsPwmError as err:
+                _LOGGER.debug("Could not reach the PWM agent: %s", err)
+                errors["base"] = "cannot_connect"
+            finally:
+                await client.async_close()
+            if not errors:
+                self._remote = remote
+                self._rpi_board_rev = profile.board_model
+                self._rpi_version = profile.rpi_version
+                self._update_free_pins(profile, self._rpi_version)
+                if not self._available_pins:
+                    return self.async_abort(reason="no_free_channels")
+                return self.async_show_menu(
+                    step_id="remote_output",
+                    menu_options={"light": "Light", "fan": "Fan", "number": "Number"},
+                )
 
-        options = {}
-        options["light"] = "Light"
-        options["fan"] = "Fan"
-        options["number"] = "Number"
-        return self.async_show_menu(menu_options=options)
+        schema = vol.Schema(
+            {
+                vol.Required(CONF_HOST): selector.TextSelector(),
+                vol.Required(
+                    CONF_PORT, default=DEFAULT_AGENT_PORT
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1, max=65535, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Optional(CONF_PASSWORD): selector.TextSelector(
+                    selector.TextSelectorConfig(type=selector.TextSelectorType.PASSWORD)
+                ),
+            }
+        )
+        if user_input is not None:
+            schema = self.add_suggested_values_to_schema(schema, user_input)
+        return self.async_show_form(step_id="remote", data_schema=schema, errors=errors)
 
     async def async_step_light(
         self, user_input: dict[str, Any] | None = None
@@ -122,6 +224,7 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
             user_input[CONF_TYPE] = Platform.LIGHT
             user_input[CONF_RPI] = self._rpi_version
             user_input[CONF_RPI_MODEL] = self._rpi_board_rev
+            user_input.update(self._remote)
             return self.async_create_entry(
                 title=self._make_entity_title(user_input=user_input),
                 data=user_input,
@@ -143,6 +246,7 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
             user_input[CONF_RPI] = self._rpi_version
             user_input[CONF_RPI_MODEL] = self._rpi_board_rev
             user_input[CONF_TYPE] = Platform.NUMBER
+            user_input.update(self._remote)
             return self.async_create_entry(
                 title=title,
                 data=user_input,
@@ -156,7 +260,10 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
         """Add a light."""
-        if user_input is not None:
+        errors = {}
+        if user_input is not None and not (
+            errors := self._validate_temperature_curve(user_input)
+        ):
             # Assign a unique ID to the flow and abort the flow
             # if another flow with the same unique ID is in progress
             title = self._make_entity_title(user_input=user_input)
@@ -166,17 +273,97 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
             user_input[CONF_RPI_MODEL] = self._rpi_board_rev
             user_input[CONF_TYPE] = Platform.FAN
             user_input[CONF_FREQUENCY] = DEFAULT_FREQ
+            user_input.update(self._remote)
             return self.async_create_entry(
                 title=title,
                 data=user_input,
             )
-        return self.async_show_form(
-            step_id="fan", data_schema=self._generate_schema_fan()
-        )
+        schema = self._generate_schema_fan()
+        if user_input is not None:
+            schema = self.add_suggested_values_to_schema(schema, user_input)
+        return self.async_show_form(step_id="fan", data_schema=schema, errors=errors)
+
+    def _validate_temperature_curve(self, user_input: dict[str, Any]) -> dict[str, str]:
+        """Return the errors of the temperature controller settings of a fan."""
+        try:
+            parse_temperature_curve(
+                user_input.get(CONF_TEMPERATURE_CURVE, DEFAULT_TEMPERATURE_CURVE)
+            )
+        except ValueError:
+            return {CONF_TEMPERATURE_CURVE: "invalid_temperature_curve"}
+        return {}
 
     def _generate_schema_light(self) -> vol.Schema:
-        """Generate schema for fan config."""
-        return self._generate_schema_fan().extend(
+        """Generate schema for light config."""
+        return self._generate_schema_frequency().extend(
+            {
+                vol.Optional(
+                    CONF_FRAME_RATE, default=DEFAULT_FRAME_RATE
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=CONST_FRAME_RATE_MIN,
+                        max=CONST_FRAME_RATE_MAX,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=1,
+                    ),
+                ),
+                vol.Optional(
+                    CONF_STATE_UPDATE_RATE, default=DEFAULT_STATE_UPDATE_RATE
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=CONST_STATE_UPDATE_RATE_MAX,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=0.5,
+                        unit_of_measurement="Hz",
+                    ),
+                ),
+                vol.Optional(
+                    CONF_EASING, default=DEFAULT_EASING
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[
+                            selector.SelectOptionDict(value=easing, label=easing)
+                            for easing in EASINGS
+                        ]
+                    )
+                ),
+                vol.Optional(
+                    CONF_BRIGHTNESS_CURVE, default=DEFAULT_BRIGHTNESS_CURVE
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[
+                            selector.SelectOptionDict(value=curve, label=curve)
+                            for curve in CURVES
+                        ]
+                    )
+                ),
+                vol.Optional(
+                    CONF_GAMMA, default=DEFAULT_GAMMA
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1.0,
+                        max=4.0,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=0.1,
+                    ),
+                ),
+                vol.Optional(
+                    CONF_TIMING, default=DEFAULT_TIMING
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[
+                            selector.SelectOptionDict(value=timing, label=timing)
+                            for timing in TIMINGS
+                        ]
+                    )
+                ),
+            }
+        )
+
+    def _generate_schema_frequency(self) -> vol.Schema:
+        """Generate schema for outputs with a configurable frequency."""
+        return self._generate_schema_pin().extend(
             {
                 vol.Optional(
                     CONF_FREQUENCY, default=DEFAULT_FREQ
@@ -193,6 +380,84 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
 
     def _generate_schema_fan(self) -> vol.Schema:
         """Generate schema for fan."""
+        return self._generate_schema_pin().extend(
+            {
+                vol.Optional(
+                    CONF_RAMP_TIME, default=DEFAULT_RAMP_TIME
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=60,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=0.1,
+                        unit_of_measurement="s",
+                    ),
+                ),
+                vol.Optional(
+                    CONF_RAMP_STEPS, default=DEFAULT_RAMP_STEPS
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=1,
+                        max=1000,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=1,
+                    ),
+                ),
+                vol.Optional(
+                    CONF_KICKSTART_TIME, default=DEFAULT_KICKSTART_TIME
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=10,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=0.1,
+                        unit_of_measurement="s",
+                    ),
+                ),
+                vol.Optional(
+                    CONF_TIMING, default=DEFAULT_TIMING
+                ): selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=[
+                            selector.SelectOptionDict(value=timing, label=timing)
+                            for timing in TIMINGS
+                        ]
+                    )
+                ),
+                vol.Optional(CONF_SOURCE_SENSOR): selector.EntitySelector(
+                    selector.EntitySelectorConfig(
+                        domain="sensor", device_class="temperature"
+                    )
+                ),
+                vol.Optional(
+                    CONF_TEMPERATURE_CURVE, default=DEFAULT_TEMPERATURE_CURVE
+                ): selector.TextSelector(),
+                vol.Optional(
+                    CONF_HYSTERESIS, default=DEFAULT_HYSTERESIS
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=20,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=0.1,
+                    ),
+                ),
+                vol.Optional(
+                    CONF_MIN_INTERVAL, default=DEFAULT_MIN_INTERVAL
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0,
+                        max=600,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=1,
+                        unit_of_measurement="s",
+                    ),
+                ),
+            }
+        )
+
+    def _generate_schema_pin(self) -> vol.Schema:
+        """Generate schema for the name and pin, shared by all entities."""
         pin_selector = [
             selector.SelectOptionDict(value=str(pin), label=str(pin))
             for pin in self._available_pins
@@ -212,7 +477,7 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
 
     def _generate_schema_number(self) -> vol.Schema:
         """Generate schema for number config."""
-        return self._generate_schema_light().extend(
+        return self._generate_schema_frequency().extend(
             {
                 vol.Optional(CONF_INVERT, default=False): selector.BooleanSelector(),
                 vol.Optional(
@@ -251,11 +516,34 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
                         ]
                     )
                 ),
+                vol.Optional(
+                    CONF_SLEW_RATE, default=DEFAULT_SLEW_RATE
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=0, mode=selector.NumberSelectorMode.BOX
+                    )
+                ),
+                vol.Optional(
+                    CONF_SLEW_RESOLUTION, default=DEFAULT_SLEW_RESOLUTION
+                ): selector.NumberSelector(
+                    selector.NumberSelectorConfig(
+                        min=CONST_FRAME_RATE_MIN,
+                        max=CONST_FRAME_RATE_MAX,
+                        mode=selector.NumberSelectorMode.BOX,
+                        step=1,
+                        unit_of_measurement="Hz",
+                    ),
+                ),
             }
         )
 
     def _make_entity_title(self, user_input: dict[str, Any]) -> str:
-        """Create a title for the entity."""
+        """Create a title for the entity, with the host for outputs of another Pi."""
+        if self._remote:
+            return (
+                f"{user_input[CONF_NAME]} @ {self._remote[CONF_HOST]} pin "
+                f"{user_input[CONF_PIN]}"
+            )
         return user_input[CONF_NAME] + " @ pin " + user_input[CONF_PIN]
 
     async def async_step_reconfigure(
@@ -263,19 +551,39 @@ class RpiPWMConfigFlow(ConfigFlow, domain=DOMAIN):
     ) -> ConfigFlowResult:
         """Reconfigure the rpi-pwm device."""
         errors = {}
-        if user_input is not None:
-            return self.async_update_reload_and_abort(
-                self._get_reconfigure_entry(),
-                data_updates=user_input,
-            )
+        entry = self._get_reconfigure_entry()
+        if user_input is not None and entry.data[CONF_TYPE] == Platform.FAN:
+            errors = self._validate_temperature_curve(user_input)
+        if user_input is not None and not errors:
+            # The update listener applies the change to the running entity,
+            # or reloads the entry when the pin, type or source sensor changed.
+            data = {**entry.data, **user_input}
+            if CONF_SOURCE_SENSOR not in user_input:
+                # A cleared optional selector is left out of the input.
+                data.pop(CONF_SOURCE_SENSOR, None)
+            self.hass.config_entries.async_update_entry(entry, data=data)
+            return self.async_abort(reason="reconfigure_successful")
 
-        self._update_free_pins()
-        # Append also the current pins to the free-pins list
-        # and generate entity specific schema
-        data = self._get_reconfigure_entry().data
+        # The channel of the entry itself is free to keep or to move, then
+        # generate entity specific schema
+        data = {**entry.data, **(user_input or {})}
+        self._remote = {
+            key: data[key] for key in (*REMOTE_KEYS, CONF_PASSWORD) if key in data
+        }
+        if self._remote:
+            try:
+                profile = await async_get_remote_client(
+                    self.hass, data[CONF_HOST], data[CONF_PORT], data.get(CONF_PASSWORD)
+                ).async_info()
+            except SysfsPwmError:
+                return self.async_abort(reason="cannot_connect")
+        else:
+            profile = await async_get_hardware_profile(self.hass)
+        self._update_free_pins(profile, data[CONF_RPI], entry.entry_id)
         if data.get(CONF_PIN) is not None:
-            self._available_pins.append(data[CONF_PIN])
-            self._available_pins.sort()
+            if data[CONF_PIN] not in self._available_pins:
+                self._available_pins.append(data[CONF_PIN])
+                self._available_pins.sort()
             if data[CONF_TYPE] == Platform.LIGHT:
                 schema = self._generate_schema_light()
             elif data[CONF_TYPE] == Platform.FAN:
@@ -2,6 +2,24 @@
 
 DOMAIN = "rpi_pwm"
 
+DATA_ENTITIES = "entities"
+DATA_SIMULATOR = "simulator"
+DATA_HARDWARE = "hardware"
+DATA_BRING_UP = "bring_up"
+DATA_FRAME_CLOCK = "frame_clock"
+DATA_SCENES = "scenes"
+DATA_REMOTES = "remotes"
+
+SIGNAL_RECONFIGURE = f"{DOMAIN}_reconfigure_{{}}"
+
+SERVICE_SET_OUTPUTS = "set_outputs"
+ATTR_OUTPUTS = "outputs"
+ATTR_VALUE = "value"
+ATTR_TRANSITION = "transition"
+SERVICE_APPLY_SCENE = "apply_scene"
+ATTR_FRAME_RATE = "frame_rate"
+ATTR_EASING = "easing"
+
 CONF_FREQUENCY = "frequency"
 CONF_NORMALIZE_LOWER = "normalize_lower"
 CONF_NORMALIZE_UPPER = "normalize_upper"
@@ -10,24 +28,64 @@ CONF_INVERT = "invert"
 CONF_STEP = "step"
 CONF_RPI = "raspberry_pi"
 CONF_RPI_MODEL = "rpi_board_model"
+CONF_FRAME_RATE = "frame_rate"
+CONF_EASING = "easing"
+CONF_BRIGHTNESS_CURVE = "brightness_curve"
+CONF_GAMMA = "gamma"
+CONF_TIMING = "timing"
+CONF_STATE_UPDATE_RATE = "state_update_rate"
+CONF_RAMP_TIME = "ramp_time"
+CONF_RAMP_STEPS = "ramp_steps"
+CONF_KICKSTART_TIME = "kickstart_time"
+CONF_SLEW_RATE = "slew_rate"
+CONF_SLEW_RESOLUTION = "slew_resolution"
+CONF_SOURCE_SENSOR = "source_sensor"
+CONF_TEMPERATURE_CURVE = "temperature_curve"
+CONF_HYSTERESIS = "hysteresis"
+CONF_MIN_INTERVAL = "min_interval"
 
 MODE_SLIDER = "slider"
 MODE_BOX = "box"
 MODE_AUTO = "auto"
 
+TIMING_EVENT_LOOP = "event_loop"
+TIMING_THREAD = "thread"
+TIMINGS = [TIMING_EVENT_LOOP, TIMING_THREAD]
+
 ATTR_FREQUENCY = "frequency"
 ATTR_INVERT = "invert"
+ATTR_RAMP_TIME = "ramp_time"
+ATTR_KICKSTART_TIME = "kickstart_time"
+ATTR_CONTROLLER_ENABLED = "controller_enabled"
 
 DEFAULT_BRIGHTNESS = 255
 DEFAULT_COLOR = (0.0, 0.0)
 DEFAULT_FREQ = 100
 DEFAULT_MODE = "auto"
 DEFAULT_FAN_PERCENTAGE = 100.0
+DEFAULT_FRAME_RATE = 25
+DEFAULT_EASING = "linear"
+DEFAULT_BRIGHTNESS_CURVE = "linear"
+DEFAULT_GAMMA = 2.2
+DEFAULT_RAMP_TIME = 0.0
+DEFAULT_RAMP_STEPS = 20
+DEFAULT_KICKSTART_TIME = 0.0
+DEFAULT_SLEW_RATE = 0.0
+DEFAULT_SLEW_RESOLUTION = 20
+DEFAULT_TEMPERATURE_CURVE = "30:0, 45:40, 60:100"
+DEFAULT_HYSTERESIS = 2.0
+DEFAULT_MIN_INTERVAL = 10.0
+DEFAULT_TIMING = TIMING_EVENT_LOOP
+DEFAULT_STATE_UPDATE_RATE = 0.0
+DEFAULT_AGENT_PORT = 7878
 
 CONST_HA_MAX_INTENSITY = 256
 CONST_PWM_FREQ_MIN = 10
 CONST_PWM_FREQ_MAX = 8000
 CONST_PWM_MAX = 100.0
+CONST_FRAME_RATE_MIN = 1
+CONST_FRAME_RATE_MAX = 100
+CONST_STATE_UPDATE_RATE_MAX = 10
 
 RPI1_2_3 = "Raspberry Pi"
 RPI5 = "Raspberry Pi 5"
@@ -37,6 +95,4 @@ GPIO12 = "GPIO12"
 GPIO13 = "GPIO13"
 GPIO18 = "GPIO18"
 GPIO19 = "GPIO19"
-KERNEL_VERSION_RPI5_CHIP_2 = 6.11
-
-RPI_PWM_PINS = 2
+KERNEL_VERSION_RPI5_CHIP_2 = (6, 11)
@@ -0,0 +1,112 @@
+"""Fan speed following a temperature curve, with hysteresis."""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from itertools import pairwise
+
+from .const import CONST_PWM_MAX
+
+
+def parse_temperature_curve(text: str) -> list[tuple[float, float]]:
+    """
+    Parse a curve like "30:0, 45:40, 60:100" into (temperature, percentage).
+
+    Points are sorted by temperature; raises ValueError on a malformed curve.
+    """
+    points = []
+    for item in text.replace(";", ",").split(","):
+        if not item.strip():
+            continue
+        temperature, separator, percentage = item.partition(":")
+        if not separator:
+            msg = f"Expected temperature:percentage, got {item.strip()!r}"
+            raise ValueError(msg)
+        point = (float(temperature), float(percentage))
+        if not 0 <= point[1] <= CONST_PWM_MAX:
+            msg = f"Percentage must be between 0 and 100, got {point[1]}"
+            raise ValueError(msg)
+        points.append(point)
+    if not points:
+        msg = "The curve needs at least one point"
+        raise ValueError(msg)
+    points.sort()
+    for (low, _), (high, _) in pairwise(points):
+        if low == high:
+            msg = f"Temperature {low} is in the curve twice"
+            raise ValueError(msg)
+    return points
+
+
+class FanCurveController:
+    """
+    Map temperatures to fan speeds, holding the speed inside a hysteresis band.
+
+    The fan speeds up as soon as the curve asks for more, but slows down only
+    once the temperature has dropped the hysteresis below the point that would
+    give the current speed. Between hardware updates at least min_interval
+    seconds pass; the caller retries after the returned delay with the latest
+    temperature.
+    """
+
+    __slots__ = (
+        "_last_update",
+        "_percentages",
+        "_temperatures",
+        "hysteresis",
+        "min_interval",
+        "percentage",
+    )
+
+    def __init__(
+        self,
+        curve: list[tuple[float, float]],
+        hysteresis: float,
+        min_interval: float,
+    ) -> None:
+        """Initialize the controller, the speed is unknown until the first update."""
+        self._temperatures = [temperature for temperature, _ in curve]
+        self._percentages = [percentage for _, percentage in curve]
+        self.hysteresis = hysteresis
+        self.min_interval = min_interval
+        self.percentage: float | None = None
+        self._last_update: float | None = None
+
+    def speed(self, temperature: float) -> float:
+        """Return the speed of the curve at a temperature, rounded to 0.1%."""
+        temperatures = self._temperatures
+        index = bisect_right(temperatures, temperature)
+        if index == 0:
+            return self._percentages[0]
+        if index == len(temperatures):
+            return self._percentages[-1]
+        low, high = temperatures[index - 1], temperatures[index]
+        start, end = self._percentages[index - 1], self._percentages[index]
+        return round(start + (end - start) * (temperature - low) / (high - low), 1)
+
+    def target(self, temperature: float) -> float | None:
+        """Return the new speed for a temperature, or None to keep the current."""
+        up = self.speed(temperature)
+        if self.percentage is None or up > self.percentage:
+            return up
+        down = self.speed(temperature + self.hysteresis)
+        if down < self.percentage:
+            return down
+        return None
+
+    def update(self, temperature: float, now: float) -> tuple[float | None, float]:
+        """
+        Feed a temperature and return the speed to output, if any.
+
+        The second value is the delay in seconds after which a held back
+        change may be retried, 0 when nothing is held back.
+        """
+        if (target := self.target(temperature)) is None:
+            return None, 0.0
+        if self._last_update is not None:
+            delay = self._last_update + self.min_interval - now
+            if delay > 0:
+                return None, delay
+        self.percentage = target
+        self._last_update = now
+        return target, 0.0
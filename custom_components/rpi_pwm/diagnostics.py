@@ -0,0 +1,40 @@
+"""Diagnostics support for rpi_pwm."""
+
+from __future__ import annotations
+
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.const import CONF_HOST, CONF_PASSWORD, CONF_PORT
+
+from .const import CONF_RPI, DATA_REMOTES, DATA_SIMULATOR, DOMAIN, RPI_UNKNOWN
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+    from . import RpiPwmConfigEntry
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: RpiPwmConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics of the PWM channel of a config entry."""
+    diagnostics: dict[str, Any] = {
+        "config": async_redact_data(entry.data, {CONF_PASSWORD}),
+        "metrics": entry.runtime_data.metrics.as_dict(),
+    }
+    data = hass.data.get(DOMAIN, {})
+    if CONF_HOST in entry.data:
+        agent = (entry.data[CONF_HOST], entry.data[CONF_PORT])
+        client = data.get(DATA_REMOTES, {}).get(agent)
+        profile = client.profile if client is not None else None
+        diagnostics["agent"] = {
+            "connected": client is not None and client.connected,
+            "hardware": asdict(profile) if profile is not None else None,
+        }
+        return diagnostics
+    simulator = data.get(DATA_SIMULATOR)
+    if entry.data[CONF_RPI] == RPI_UNKNOWN and simulator is not None:
+        diagnostics["simulation"] = simulator.timeline.summary()
+    return diagnostics
@@ -0,0 +1,75 @@
+"""Light effects, precomputed as one period of a waveform."""
+
+from __future__ import annotations
+
+import math
+import random
+
+from .transition import FramePlan
+
+EFFECT_BREATHE = "breathe"
+EFFECT_PULSE = "pulse"
+EFFECT_CANDLE = "candle"
+EFFECT_STROBE = "strobe"
+
+# Length of one period of each effect in seconds
+EFFECT_PERIODS = {
+    EFFECT_BREATHE: 4.0,
+    EFFECT_PULSE: 1.0,
+    EFFECT_CANDLE: 8.0,
+    EFFECT_STROBE: 0.2,
+}
+EFFECTS = list(EFFECT_PERIODS)
+
+PULSE_ATTACK = 0.1  # Part of the period in which a pulse rises
+PULSE_DECAY = 6.0
+CANDLE_SEED = 1  # Fixed, so every candle flickers the same way
+CANDLE_LEVEL = 0.8
+CANDLE_DEPTH = 0.2
+
+
+def _breathe(phase: float) -> float:
+    return 0.5 - 0.5 * math.cos(2 * math.pi * phase)
+
+
+def _pulse(phase: float) -> float:
+    if phase < PULSE_ATTACK:
+        return phase / PULSE_ATTACK
+    return math.exp(-PULSE_DECAY * (phase - PULSE_ATTACK))
+
+
+def build_effect_plan(effect: str, frame_rate: float) -> tuple[FramePlan, float]:
+    """
+    Return one period of an effect as levels of 0..1, and the period.
+
+    The levels are relative to the brightness of the light; the plan is meant
+    to be played repeatedly with the period as interval.
+    """
+    period = EFFECT_PERIODS[effect]
+    plan = FramePlan()
+    if effect == EFFECT_STROBE:
+        plan.append(0.0, 1.0)
+        plan.append(period / 2, 0.0)
+        return plan, period
+
+    samples = max(int(period * frame_rate), 2)
+    if effect == EFFECT_CANDLE:
+        # Low-pass filtered noise; the last samples fade back to the first
+        # one so the waveform has no jump where it repeats.
+        rng = random.Random(CANDLE_SEED)  # noqa: S311
+        noise = 0.0
+        levels = []
+        for _ in range(samples):
+            noise = 0.6 * noise + 0.4 * rng.uniform(-1.0, 1.0)
+            levels.append(CANDLE_LEVEL + CANDLE_DEPTH * noise)
+        fade = min(samples // 4, int(frame_rate))
+        for index in range(samples - fade, samples):
+            weight = (index - (samples - fade) + 1) / (fade + 1)
+            levels[index] += (levels[0] - levels[index]) * weight
+    else:
+        shape = _breathe if effect == EFFECT_BREATHE else _pulse
+        levels = [shape(index / samples) for index in range(samples)]
+
+    for index, level in enumerate(levels):
+        plan.append(period * index / samples, min(max(level, 0.0), 1.0))
+    return plan, period
@@ -0,0 +1,325 @@
+"""Base entity shared by the rpi_pwm platforms."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import CONF_HOST, CONF_NAME
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.entity import Entity
+
+from . import async_get_frame_clock, async_request_pwm_channel
+from .const import (
+    CONF_FREQUENCY,
+    CONF_RPI,
+    CONF_RPI_MODEL,
+    CONF_TIMING,
+    DATA_ENTITIES,
+    DEFAULT_TIMING,
+    DOMAIN,
+    RPI_UNKNOWN,
+    SIGNAL_RECONFIGURE,
+    TIMING_THREAD,
+)
+from .metrics import ChannelMetrics
+from .remote import RemoteTransitionRunner
+from .sysfs import NS_PER_SECOND, SysfsPwmError
+from .transition import ThreadedTransitionRunner, TransitionRunner
+from .writer import PwmWriter
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from types import MappingProxyType
+
+    from homeassistant.core import HomeAssistant
+
+    from .sysfs import SysfsPwmChannel
+    from .transition import FramePlan
+
+_LOGGER = logging.getLogger(__name__)
+
+# Delay before retrying to open a channel, doubling up to the maximum
+RETRY_DELAY_MIN = 1.0
+RETRY_DELAY_MAX = 60.0
+
+
+class RpiPwmEntity(Entity):
+    """Common handling of the PWM channel behind an entity."""
+
+    _pwm: SysfsPwmChannel
+    _writer: PwmWriter
+    _supports_output_transition = False
+    _attr_available = False
+
+    def __init__(
+        self,
+        config: MappingProxyType[str, Any],
+        unique_id: str | None,
+        hass: HomeAssistant,
+        metrics: ChannelMetrics | None = None,
+        pwm: asyncio.Future[SysfsPwmChannel] | None = None,
+    ) -> None:
+        """Initialize the shared entity attributes."""
+        self._hass = hass
+        self._pwm_future = pwm
+        self._bring_up: asyncio.Task[None] | None = None
+        self._metrics = metrics or ChannelMetrics()
+        self._simulate_rpi = False
+        if config[CONF_RPI] == RPI_UNKNOWN:
+            self._simulate_rpi = True
+
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "rpi_gpio")},
+            name=DOMAIN.upper(),
+            manufacturer="Raspberry Pi",
+            model=config[CONF_RPI_MODEL],
+        )
+        self._attr_unique_id = unique_id
+        self._apply_config(config)
+
+    @callback
+    def _apply_config(self, config: MappingProxyType[str, Any]) -> None:
+        """Take over the settings of a config entry that need no reload."""
+        self._config = config
+        self._attr_name = config[CONF_NAME]
+        self._period_ns = int(NS_PER_SECOND / config[CONF_FREQUENCY])
+        self._timing = config.get(CONF_TIMING, DEFAULT_TIMING)
+
+    @callback
+    def _reconfigured_output(self) -> int | None:
+        """Return the duty cycle (ns) to output after a reconfiguration, if any."""
+        return None
+
+    async def async_reconfigure(self, config: MappingProxyType[str, Any]) -> None:
+        """
+        Apply a changed config entry to the running entity.
+
+        A new frequency is programmed in place, keeping the relative duty
+        cycle; outputs that depend on the scaling are written once more. A
+        channel that is not open yet starts at the new frequency.
+        """
+        frequency = config[CONF_FREQUENCY]
+        frequency_changed = frequency != self._config[CONF_FREQUENCY]
+        self._apply_config(config)
+        try:
+            if frequency_changed and self._writer.ready:
+                await self._writer.async_change_frequency(frequency)
+            if (duty_ns := self._reconfigured_output()) is not None:
+                await self._writer.async_write(duty_ns)
+        except SysfsPwmError:
+            _LOGGER.exception("Could not reconfigure %s", self.entity_id)
+        self.async_write_ha_state()
+
+    async def async_added_to_hass(self) -> None:
+        """
+        Restore the state and open the PWM channel in the background.
+
+        The entity is unavailable until the channel is open; commands given
+        meanwhile are buffered by the writer, the latest one wins.
+        """
+        await super().async_added_to_hass()
+
+        self._writer = PwmWriter(
+            self._hass.loop,
+            self.entity_id,
+            self._metrics,
+            await self._async_restore_output(),
+        )
+        self._bring_up = self._hass.async_create_background_task(
+            self._async_open_channel(), f"{DOMAIN} open {self.entity_id}"
+        )
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self._hass,
+                SIGNAL_RECONFIGURE.format(self.unique_id),
+                self.async_reconfigure,
+            )
+        )
+        self._hass.data.setdefault(DOMAIN, {}).setdefault(DATA_ENTITIES, {})[
+            self.entity_id
+        ] = self
+
+    async def _async_open_channel(self) -> None:
+        """Open the channel and start the writer, retrying with backoff."""
+        delay = RETRY_DELAY_MIN
+        future = self._pwm_future
+        while True:
+            if future is None:
+                future = async_request_pwm_channel(self._hass, self._config)
+            start: asyncio.Future[None] | None = None
+            try:
+                pwm = await future
+                start = self._hass.async_add_executor_job(
+                    self._start_output,
+                    pwm,
+                    self._config[CONF_FREQUENCY],
+                    self._writer.requested_duty_ns,
+                )
+                # The job can not be stopped, it is waited for when cancelled.
+                await asyncio.shield(start)
+            except asyncio.CancelledError:
+                if start is not None:
+                    await self._async_close_started(pwm, start)
+                raise
+            except SysfsPwmError as err:
+                log = _LOGGER.warning if delay == RETRY_DELAY_MIN else _LOGGER.debug
+                log(
+                    "Could not open PWM output of %s, retrying in %.0f s: %s",
+                    self.entity_id,
+                    delay,
+                    err,
+                )
+            else:
+                break
+            future = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_DELAY_MAX)
+
+        if delay > RETRY_DELAY_MIN:
+            _LOGGER.info("PWM output of %s is open", self.entity_id)
+        self._pwm = pwm
+        self._bring_up = None
+        # Requests given while the channel was opened are written first.
+        self._writer.start(pwm)
+        self._attr_available = True
+        self.async_write_ha_state()
+
+    async def _async_close_started(
+        self, pwm: SysfsPwmChannel, start: asyncio.Future[None]
+    ) -> None:
+        """Close a channel whose bring-up was cancelled while it was started."""
+        try:
+            await start
+        except SysfsPwmError:
+            # The channel is closed already.
+            return
+        await self._hass.async_add_executor_job(pwm.close)
+
+    @staticmethod
+    def _start_output(
+        pwm: SysfsPwmChannel, frequency: float, duty_ns: int | None
+    ) -> None:
+        """Bring an open channel to the configured output, closing it on errors."""
+        try:
+            if pwm.frequency != frequency:
+                pwm.change_frequency(frequency)
+            pwm.start(duty_ns)
+        except SysfsPwmError:
+            pwm.close()
+            raise
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Flush the writer and release the PWM channel."""
+        self._hass.data[DOMAIN][DATA_ENTITIES].pop(self.entity_id, None)
+        if self._bring_up is not None:
+            self._bring_up.cancel()
+            self._bring_up = None
+        if hasattr(self, "_writer"):
+            await self._writer.async_stop()
+        if hasattr(self, "_pwm"):
+            await self._hass.async_add_executor_job(self._pwm.close)
+
+    async def _async_restore_output(self) -> int | None:
+        """
+        Restore the entity state and return the duty cycle (ns) to output.
+
+        None, the default, keeps whatever duty cycle the hardware already has
+        once the channel is open. The output is only written when it differs.
+        """
+        return None
+
+    @property
+    def supports_output_transition(self) -> bool:
+        """Return if set_outputs may pass a transition for this entity."""
+        return self._supports_output_transition
+
+    @callback
+    def async_prepare_output(
+        self, value: float, transition: float | None
+    ) -> int | None:
+        """
+        Update the entity state for a new output value, without writing it.
+
+        Returns the duty cycle in ns to write, or None when a transition has
+        been started that takes care of the output.
+        """
+        raise NotImplementedError
+
+    @callback
+    def _create_frame_runner(
+        self,
+        plan: FramePlan,
+        on_done: Callable[[], None],
+        period: float | None = None,
+    ) -> TransitionRunner | ThreadedTransitionRunner | RemoteTransitionRunner:
+        """
+        Return a runner writing plan in the configured timing mode.
+
+        Outputs on a remote Pi have the agent play the plan, whatever the
+        timing mode.
+        """
+        if self._is_remote:
+            return RemoteTransitionRunner(self._writer, plan, on_done, period)
+        if self._timing == TIMING_THREAD:
+            return ThreadedTransitionRunner(
+                async_get_frame_clock(self._hass),
+                plan,
+                self._write_duty_ns_nowait,
+                on_done,
+                self._metrics.frame_jitter,
+                period,
+            )
+        return TransitionRunner(
+            self._hass.loop,
+            plan,
+            self._write_duty_ns_nowait,
+            on_done,
+            self._metrics.frame_jitter,
+            period,
+        )
+
+    @callback
+    def async_prepare_scene(self, value: float) -> Callable[[float], int]:
+        """
+        Update the entity state for a scene and return its output curve.
+
+        The curve maps the eased progress of the scene (0..1) to the duty cycle
+        in ns to output, starting at the current one.
+        """
+        start = self._duty_ns
+        end = self.async_prepare_output(value, None)
+        if end is None:
+            end = start
+        delta = end - start
+        return lambda progress: round(start + delta * progress)
+
+    @property
+    def _is_remote(self) -> bool:
+        """Return if the channel is on another Pi, whose agent plays plans."""
+        return CONF_HOST in self._config
+
+    @property
+    def _duty_ns(self) -> int:
+        """Return the last requested duty cycle in nanoseconds."""
+        return self._writer.duty_ns
+
+    def _to_duty_ns(self, duty_cycle: float) -> int:
+        """Convert a duty cycle in percent to the nearest one in ns."""
+        return round(duty_cycle * self._period_ns / 100)
+
+    async def async_write_duty_ns(self, duty_ns: int) -> None:
+        """Write a duty cycle in ns and wait for the result, if the channel is open."""
+        try:
+            await self._writer.async_write(duty_ns)
+        except SysfsPwmError as err:
+            msg = f"Could not set PWM output of {self.entity_id}: {err}"
+            raise HomeAssistantError(msg) from err
+
+    def _write_duty_ns_nowait(self, duty_ns: float) -> None:
+        """Queue a duty cycle in ns without waiting, thread safe."""
+        self._writer.write_nowait(duty_ns)
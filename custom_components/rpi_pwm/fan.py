@@ -3,38 +3,68 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.fan import (
-    ATTR_PERCENTAGE,
     FanEntity,
     FanEntityFeature,
 )
 from homeassistant.const import (
-    CONF_NAME,
     CONF_TYPE,
     STATE_ON,
     Platform,
 )
-from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.core import callback
+from homeassistant.helpers.event import (
+    async_call_later,
+    async_track_state_change_event,
+)
 from homeassistant.helpers.restore_state import RestoreEntity
 
-from . import _make_pwm_device
 from .const import (
-    CONF_RPI,
-    CONF_RPI_MODEL,
+    ATTR_CONTROLLER_ENABLED,
+    ATTR_KICKSTART_TIME,
+    ATTR_RAMP_TIME,
+    CONF_HYSTERESIS,
+    CONF_KICKSTART_TIME,
+    CONF_MIN_INTERVAL,
+    CONF_RAMP_STEPS,
+    CONF_RAMP_TIME,
+    CONF_SOURCE_SENSOR,
+    CONF_TEMPERATURE_CURVE,
+    CONST_PWM_MAX,
     DEFAULT_FAN_PERCENTAGE,
-    DOMAIN,
-    RPI_UNKNOWN,
+    DEFAULT_HYSTERESIS,
+    DEFAULT_KICKSTART_TIME,
+    DEFAULT_MIN_INTERVAL,
+    DEFAULT_RAMP_STEPS,
+    DEFAULT_RAMP_TIME,
+    DEFAULT_TEMPERATURE_CURVE,
+)
+from .controller import FanCurveController, parse_temperature_curve
+from .entity import RpiPwmEntity
+from .transition import (
+    FramePlan,
+    ThreadedTransitionRunner,
+    TransitionRunner,
+    build_frame_plan,
 )
 
 if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Callable
+    from datetime import datetime
     from types import MappingProxyType
 
-    from homeassistant.config_entries import ConfigEntry
-    from homeassistant.core import HomeAssistant
+    from homeassistant.core import Event, EventStateChangedData, HomeAssistant, State
     from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+    from . import RpiPwmConfigEntry
+    from .metrics import ChannelMetrics
+    from .remote import RemoteTransitionRunner
+    from .sysfs import SysfsPwmChannel
+
 _LOGGER = logging.getLogger(__name__)
 
 SUPPORT_SIMPLE_FAN = (
@@ -44,7 +74,7 @@ SUPPORT_SIMPLE_FAN = (
 
 async def async_setup_entry(
     hass: HomeAssistant,
-    config_entry: ConfigEntry,
+    config_entry: RpiPwmConfigEntry,
     async_add_entities: AddConfigEntryEntitiesCallback,
 ) -> None:
     """Set up this platform for a specific ConfigEntry(==PCA9685 device)."""
@@ -54,55 +84,101 @@ async def async_setup_entry(
                 RpiPwmFan(
                     config=config_entry.data,
                     unique_id=config_entry.unique_id,
+                    metrics=config_entry.runtime_data.metrics,
+                    pwm=config_entry.runtime_data.pwm,
                     hass=hass,
                 )
             ]
         )
 
 
-class RpiPwmFan(FanEntity, RestoreEntity):
+class RpiPwmFan(RpiPwmEntity, FanEntity, RestoreEntity):
     """Representation of a simple PWM FAN."""
 
     _attr_should_poll = False
+    _supports_output_transition = True
 
     def __init__(
         self,
         config: MappingProxyType[str, Any],
         unique_id: str | None,
         hass: HomeAssistant,
+        metrics: ChannelMetrics | None = None,
+        pwm: asyncio.Future[SysfsPwmChannel] | None = None,
     ) -> None:
         """Initialize PWM FAN."""
-        self._hass = hass
-        self._config = config
-        self._simulate_rpi = False
-        if config[CONF_RPI] == RPI_UNKNOWN:
-            self._simulate_rpi = True
-
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, "rpi_gpio")},
-            name=DOMAIN.upper(),
-            manufacturer="Raspberry Pi",
-            model=config[CONF_RPI_MODEL],
+        super().__init__(
+            config=config, unique_id=unique_id, hass=hass, metrics=metrics, pwm=pwm
         )
-        self._attr_unique_id = unique_id
-        self._attr_name = config[CONF_NAME]
         self._attr_supported_features = SUPPORT_SIMPLE_FAN
         self._is_on = False
+        # Switched on: the temperature curve may run the fan, even from 0.
+        self._controller_enabled = False
         self._percentage = DEFAULT_FAN_PERCENTAGE
+        self._ramp: (
+            TransitionRunner | ThreadedTransitionRunner | RemoteTransitionRunner | None
+        ) = None
+        self._temperature: float | None = None
+        self._cancel_retry: Callable[[], None] | None = None
+
+    @callback
+    def _apply_config(self, config: MappingProxyType[str, Any]) -> None:
+        """Take over the ramp settings, they apply from the next change on."""
+        super()._apply_config(config)
+        self._ramp_time: float = config.get(CONF_RAMP_TIME, DEFAULT_RAMP_TIME)
+        self._ramp_steps: int = config.get(CONF_RAMP_STEPS, DEFAULT_RAMP_STEPS)
+        self._kickstart_time: float = config.get(
+            CONF_KICKSTART_TIME, DEFAULT_KICKSTART_TIME
+        )
+        # The source sensor itself only changes with a reload.
+        self._controller: FanCurveController | None = None
+        if config.get(CONF_SOURCE_SENSOR):
+            self._controller = FanCurveController(
+                parse_temperature_curve(
+                    config.get(CONF_TEMPERATURE_CURVE, DEFAULT_TEMPERATURE_CURVE)
+                ),
+                hysteresis=config.get(CONF_HYSTERESIS, DEFAULT_HYSTERESIS),
+                min_interval=config.get(CONF_MIN_INTERVAL, DEFAULT_MIN_INTERVAL),
+            )
+
+    @callback
+    def _reconfigured_output(self) -> int | None:
+        """Follow a changed temperature curve right away."""
+        self._async_evaluate_controller()
+        return None
+
+    async def _async_restore_output(self) -> int:
+        """Restore on state and percentage, the fan stays off when off."""
+        if (last_state := await self.async_get_last_state()) is None:
+            return 0
+        self._percentage = last_state.attributes.get(
+            "percentage", DEFAULT_FAN_PERCENTAGE
+        )
+        self._is_on = last_state.state == STATE_ON
+        self._controller_enabled = last_state.attributes.get(
+            ATTR_CONTROLLER_ENABLED, self._is_on
+        )
+        if not self._is_on or not self._percentage:
+            return 0
+        return self._to_duty_ns(self._percentage)
 
     async def async_added_to_hass(self) -> None:
-        """Handle entity about to be added to hass event."""
+        """Open the PWM channel and start following the source sensor."""
         await super().async_added_to_hass()
-
-        if not self._simulate_rpi:
-            self._pwm = await self._hass.async_add_executor_job(
-                _make_pwm_device, self._config
+        if (source := self._config.get(CONF_SOURCE_SENSOR)) is None:
+            return
+        self.async_on_remove(
+            async_track_state_change_event(
+                self._hass, source, self._async_source_changed
             )
-        if last_state := await self.async_get_last_state():
-            self._percentage = last_state.attributes.get(
-                "percentage", DEFAULT_FAN_PERCENTAGE
-            )
-            self._is_on = last_state.state == STATE_ON
+        )
+        self._async_control(self._hass.states.get(source))
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop ramps and release the PWM channel."""
+        self._cancel_ramp()
+        self._cancel_controller_retry()
+        await super().async_will_remove_from_hass()
 
     @property
     def is_on(self) -> bool:
@@ -114,28 +190,199 @@ class RpiPwmFan(FanEntity, RestoreEntity):
         """Return the percentage property."""
         return self._percentage
 
-    def turn_on(self, percentage: None, preset_mode: None, **kwargs) -> None:  # noqa: ANN003, ARG002
+    @property
+    def capability_attributes(self) -> dict[str, Any]:
+        """Return capability attributes."""
+        attr = super().capability_attributes or {}
+        attr[ATTR_RAMP_TIME] = self._ramp_time
+        attr[ATTR_KICKSTART_TIME] = self._kickstart_time
+        return attr
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return if the temperature curve runs the fan, when it has one."""
+        if self._controller is None:
+            return None
+        return {ATTR_CONTROLLER_ENABLED: self._controller_enabled}
+
+    @callback
+    def async_prepare_output(
+        self, value: float, transition: float | None
+    ) -> int | None:
+        """Update the state for a percentage of 0..100, 0 turns the fan off."""
+        self._override_controller()
+        percentage = min(max(value, 0.0), 100.0)
+        if percentage:
+            self._percentage = percentage
+        self._is_on = self._controller_enabled = percentage > 0
+        if self._async_start_ramp(percentage, transition):
+            return None
+        return self._to_duty_ns(percentage)
+
+    @callback
+    def async_prepare_scene(self, value: float) -> Callable[[float], int]:
+        """Update the state for a scene, the scene timeline replaces ramps."""
+        self._override_controller()
+        self._cancel_ramp()
+        percentage = min(max(value, 0.0), 100.0)
+        if percentage:
+            self._percentage = percentage
+        self._is_on = self._controller_enabled = percentage > 0
+        start = self._duty_ns
+        delta = self._to_duty_ns(percentage) - start
+        return lambda progress: round(start + delta * progress)
+
+    async def _async_set_output(self, percentage: float) -> None:
+        """Ramp or write the output for a command."""
+        self._override_controller()
+        if not self._async_start_ramp(percentage, None):
+            await self.async_write_duty_ns(self._to_duty_ns(percentage))
+
+    @callback
+    def _async_output(self, percentage: float) -> None:
+        """Ramp or write the output."""
+        if not self._async_start_ramp(percentage, None):
+            self._write_duty_ns_nowait(self._to_duty_ns(percentage))
+
+    @callback
+    def _async_start_ramp(self, percentage: float, duration: float | None) -> bool:
+        """Start ramping to percentage, return False if no ramp is needed."""
+        self._cancel_ramp()
+        plan = self._ramp_plan(percentage, duration)
+        if plan is None:
+            return False
+        self._ramp = self._create_frame_runner(plan, self._async_ramp_done)
+        self._ramp.start()
+        return True
+
+    def _ramp_plan(self, percentage: float, duration: float | None) -> FramePlan | None:
+        """
+        Plan the frames (in duty ns) to go from the current duty cycle to percentage.
+
+        A stopped fan that is started at less than full speed gets a kick-start
+        burst at full duty first. Otherwise the ramp takes ramp_time for a
+        change over the full range, in ramp_steps steps.
+        """
+        current = self._duty_ns
+        end = self._to_duty_ns(percentage)
+        if self._kickstart_time > 0 and current == 0 and 0 < percentage < CONST_PWM_MAX:
+            plan = FramePlan()
+            plan.append(0.0, self._period_ns)
+            plan.append(self._kickstart_time, end)
+            return plan
+        if duration is None:
+            duration = self._ramp_time * abs(end - current) / self._period_ns
+        if duration <= 0:
+            return None
+        return build_frame_plan(
+            start=current,
+            end=end,
+            duration=duration,
+            frame_rate=self._ramp_steps / (self._ramp_time or duration),
+            quantize=round,
+        )
+
+    def _cancel_ramp(self) -> None:
+        """Stop a running ramp."""
+        if self._ramp is not None:
+            self._ramp.cancel()
+            self._ramp = None
+
+    @callback
+    def _async_ramp_done(self) -> None:
+        """Forget the finished ramp."""
+        self._ramp = None
+
+    @callback
+    def _async_source_changed(self, event: Event[EventStateChangedData]) -> None:
+        """Follow a state change of the source sensor."""
+        self._async_control(event.data["new_state"])
+
+    @callback
+    def _async_control(self, state: State | None) -> None:
+        """Take over the temperature of the source sensor, if it has one."""
+        if state is None:
+            return
+        try:
+            self._temperature = float(state.state)
+        except ValueError:
+            return
+        self._async_evaluate_controller()
+
+    @callback
+    def _async_evaluate_controller(self, _now: datetime | None = None) -> None:
+        """
+        Set the speed the curve asks for, unless held back by the controller.
+
+        The curve runs the fan while it is switched on, it may stop the fan at
+        0 and start it again; is_on and percentage follow the speed written.
+        """
+        self._cancel_controller_retry()
+        if (
+            self._controller is None
+            or self._temperature is None
+            or not self._controller_enabled
+        ):
+            return
+        percentage, delay = self._controller.update(self._temperature, time.monotonic())
+        if delay:
+            # Try again with whatever temperature is the latest by then.
+            self._metrics.controller_held += 1
+            self._cancel_retry = async_call_later(
+                self._hass, delay, self._async_evaluate_controller
+            )
+            return
+        if percentage is None:
+            return
+        self._metrics.controller_updates += 1
+        self._percentage = percentage
+        self._is_on = percentage > 0
+        self._async_output(percentage)
+        self.async_write_ha_state()
+
+    def _override_controller(self) -> None:
+        """
+        Let a manual speed hold until the next temperature update.
+
+        The curve forgets its speed, so that update sets the speed of the
+        curve without the hysteresis; it is not a lasting manual override.
+        """
+        self._cancel_controller_retry()
+        if self._controller is not None:
+            self._controller.percentage = None
+
+    def _cancel_controller_retry(self) -> None:
+        """Cancel a held back controller update."""
+        if self._cancel_retry is not None:
+            self._cancel_retry()
+            self._cancel_retry = None
+
+    async def async_turn_on(
+        self,
+        percentage: int | None = None,
+        preset_mode: str | None = None,  # noqa: ARG002
+        **kwargs: Any,  # noqa: ARG002
+    ) -> None:
         """Turn on the fan."""
-        if percentage is not None:
+        if percentage:
             self._percentage = percentage
-        elif ATTR_PERCENTAGE in kwargs:
-            self._percentage = kwargs[ATTR_PERCENTAGE]
-        if not self._simulate_rpi:
-            self._pwm.change_duty_cycle(duty_cycle=self._percentage)
-        self._is_on = True
-        self.schedule_update_ha_state()
-
-    def turn_off(self) -> None:
+        elif not self._percentage:
+            # Stopped by the curve
+            self._percentage = DEFAULT_FAN_PERCENTAGE
+        await self._async_set_output(self._percentage)
+        self._is_on = self._controller_enabled = True
+        self.async_write_ha_state()
+
+    async def async_turn_off(self, **kwargs: Any) -> None:  # noqa: ARG002
         """Turn the fan off."""
-        if self.is_on and not self._simulate_rpi:
-            self._pwm.change_duty_cycle(duty_cycle=0)
-        self._is_on = False
-        self.schedule_update_ha_state()
+        if self.is_on:
+            await self._async_set_output(0)
+        self._is_on = self._controller_enabled = False
+        self.async_write_ha_state()
 
-    def set_percentage(self, percentage: int) -> None:
-        """Set the speed percentage of the fan."""
-        self._percentage = percentage
-        if not self._simulate_rpi:
-            self._pwm.change_duty_cycle(duty_cycle=self._percentage)
-        self._is_on = True
-        self.schedule_update_ha_state()
+    async def async_set_percentage(self, percentage: int) -> None:
+        """Set the speed percentage of the fan, 0 turns it off."""
+        if not percentage:
+            await self.async_turn_off()
+            return
+        await self.async_turn_on(percentage)
@@ -0,0 +1,212 @@
+"""Detection of the Raspberry Pi board and its PWM chips."""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from platform import uname
+
+from .const import (
+    GPIO12,
+    GPIO13,
+    GPIO18,
+    GPIO19,
+    KERNEL_VERSION_RPI5_CHIP_2,
+    RPI1_2_3,
+    RPI5,
+    RPI_UNKNOWN,
+)
+from .sysfs import SYSFS_PWM_ROOT
+
+_LOGGER = logging.getLogger(__name__)
+
+DEVICE_TREE_ROOT = Path("/proc/device-tree")
+BOARD_MODEL_PATH = DEVICE_TREE_ROOT / "model"
+
+# Channel of each pin within the PWM chip, per board generation
+PIN_CHANNELS = {
+    RPI5: {GPIO12: 0, GPIO13: 1, GPIO18: 2, GPIO19: 3},
+    RPI1_2_3: {GPIO12: 0, GPIO13: 1, GPIO18: 0, GPIO19: 1},
+}
+RPI5_NPWM = 4
+PIN_NAME = re.compile(r"gpio(\d+)$", re.IGNORECASE)
+
+
+def _parse_kernel_version(release: str) -> tuple[int, ...]:
+    """Return the numeric part of a kernel release, e.g. (6, 6, 51)."""
+    match = re.match(r"(\d+)\.(\d+)(?:\.(\d+))?", release)
+    if match is None:
+        return (0,)
+    return tuple(int(part) for part in match.groups() if part is not None)
+
+
+@dataclass(frozen=True)
+class HardwareProfile:
+    """The board and PWM chips found at startup."""
+
+    board_model: str = ""
+    kernel_release: str = ""
+    chips: dict[int, int] = field(default_factory=dict)  # pwmchip -> npwm
+    # Pins the device tree routes to a PWM controller -> its pwmchip
+    pin_chips: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rpi_version(self) -> str:
+        """Return the board generation (RPI5, RPI1_2_3 or RPI_UNKNOWN)."""
+        if self.board_model.find(RPI5) != -1:
+            return RPI5
+        if self.board_model.find(RPI1_2_3) != -1:
+            return RPI1_2_3
+        return RPI_UNKNOWN
+
+    @property
+    def kernel_version(self) -> tuple[int, ...]:
+        """Return the kernel version as a comparable tuple."""
+        return _parse_kernel_version(self.kernel_release)
+
+    def pwm_chip(self, rpi_version: str) -> int:
+        """
+        Return the pwmchip that drives the GPIO PWM pins.
+
+        The chip is taken from the probed channel counts: the RP1 of the Pi 5
+        has four channels, older boards two. Without a match (for example
+        when the overlay is not loaded yet) the historical numbering is used.
+        """
+        needed = RPI5_NPWM if rpi_version == RPI5 else 2
+        for chip, npwm in sorted(self.chips.items()):
+            if npwm >= needed:
+                return chip
+        if (
+            rpi_version == RPI5
+            and self.kernel_version[:2] <= KERNEL_VERSION_RPI5_CHIP_2
+        ):
+            return 2
+        return 0
+
+    def pwm_channel(self, pin: str, rpi_version: str) -> tuple[int, int]:
+        """Return the (pwmchip, channel) that drives a pin."""
+        channels = PIN_CHANNELS[RPI5 if rpi_version == RPI5 else RPI1_2_3]
+        if rpi_version != RPI_UNKNOWN and pin in self.pin_chips:
+            return self.pin_chips[pin], channels[pin]
+        return self.pwm_chip(rpi_version), channels[pin]
+
+    def pin_channels(self, rpi_version: str) -> dict[str, tuple[int, int]]:
+        """
+        Return the usable pins and the (pwmchip, channel) behind each.
+
+        When the device tree routes pins to a PWM controller only those pins
+        are usable, and a pin is dropped when its channel is beyond the npwm
+        of its chip. Pins sharing a channel (GPIO12 and GPIO18 on older
+        boards) can not be used at the same time.
+        """
+        routed = rpi_version != RPI_UNKNOWN and bool(self.pin_chips)
+        usable = {}
+        for pin in PIN_CHANNELS[RPI5 if rpi_version == RPI5 else RPI1_2_3]:
+            if routed and pin not in self.pin_chips:
+                continue
+            chip, channel = self.pwm_channel(pin, rpi_version)
+            if rpi_version == RPI_UNKNOWN or channel < self.chips.get(
+                chip, channel + 1
+            ):
+                usable[pin] = (chip, channel)
+        return usable
+
+
+def _read_cells(path: Path) -> list[int]:
+    """Return a device tree property as a list of 32-bit big-endian cells."""
+    data = path.read_bytes()
+    return [int.from_bytes(data[i : i + 4], "big") for i in range(0, len(data), 4)]
+
+
+def _node_pins(node: Path) -> set[str]:
+    """
+    Return the pins of a pin control node and its sub-nodes.
+
+    The RP1 of the Pi 5 lists pins by name ("gpio18"), the BCM283x/2711 of
+    older boards by number in "brcm,pins".
+    """
+    pins: set[str] = set()
+    for group in (node, *(child for child in node.iterdir() if child.is_dir())):
+        if (names := group / "pins").is_file():
+            for name in names.read_bytes().split(b"\x00"):
+                if match := PIN_NAME.match(name.decode(errors="replace")):
+                    pins.add(f"GPIO{match.group(1)}")
+        if (numbers := group / "brcm,pins").is_file():
+            pins.update(f"GPIO{number}" for number in _read_cells(numbers))
+    return pins
+
+
+def _probe_pin_chips(root: Path, device_tree: Path) -> dict[str, int]:
+    """
+    Map the pins routed to each PWM chip, following its device tree node.
+
+    Every pwmchip links to its device tree node; the pinctrl-0 property of
+    that node refers to the pin groups the controller drives.
+    """
+    nodes: dict[int, Path] = {}
+    for chip_path in root.glob("pwmchip*"):
+        try:
+            of_node = (chip_path / "device" / "of_node").resolve(strict=True)
+            chip = int(chip_path.name.removeprefix("pwmchip"))
+        except (OSError, ValueError):
+            continue
+        # of_node points into /sys/firmware/devicetree/base, the same tree
+        # as /proc/device-tree.
+        relative = of_node.as_posix().partition("/devicetree/base/")[2]
+        if relative and (device_tree / relative / "pinctrl-0").is_file():
+            nodes[chip] = device_tree / relative
+    if not nodes:
+        return {}
+
+    phandles: dict[int, Path] = {}
+    for path, _, files in os.walk(device_tree):
+        if "phandle" in files:
+            phandles[_read_cells(Path(path, "phandle"))[0]] = Path(path)
+
+    pin_chips: dict[str, int] = {}
+    for chip, node in sorted(nodes.items()):
+        for phandle in _read_cells(node / "pinctrl-0"):
+            if (group := phandles.get(phandle)) is not None:
+                for pin in _node_pins(group):
+                    pin_chips.setdefault(pin, chip)
+    return pin_chips
+
+
+def probe_hardware(
+    root: Path = SYSFS_PWM_ROOT,
+    model_path: Path = BOARD_MODEL_PATH,
+    device_tree: Path = DEVICE_TREE_ROOT,
+) -> HardwareProfile:
+    """Read the board model, kernel release, PWM chips and their pins, blocking."""
+    board_model = ""
+    try:
+        board_model = model_path.read_text().strip("\x00\n ")
+    except OSError:
+        _LOGGER.warning(
+            "Could not detect raspberry pi model, are you sure this is a pi?"
+            " rpi-pwm will continue in simlation mode."
+        )
+    chips: dict[int, int] = {}
+    for chip_path in root.glob("pwmchip*"):
+        try:
+            chips[int(chip_path.name.removeprefix("pwmchip"))] = int(
+                (chip_path / "npwm").read_text()
+            )
+        except (OSError, ValueError) as err:
+            _LOGGER.debug("Skipping %s: %s", chip_path, err)
+    try:
+        pin_chips = _probe_pin_chips(root, device_tree)
+    except OSError as err:
+        _LOGGER.debug("Could not read the PWM pins from the device tree: %s", err)
+        pin_chips = {}
+    profile = HardwareProfile(
+        board_model=board_model,
+        kernel_release=uname().release,
+        chips=chips,
+        pin_chips=pin_chips,
+    )
+    _LOGGER.debug("Detected hardware: %s", profile)
+    return profile
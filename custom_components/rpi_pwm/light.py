@@ -1,49 +1,69 @@
 """Support for LED lights that can be controlled using PWM."""
 
+import asyncio
 import logging
-from datetime import timedelta
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable
+from datetime import datetime, timedelta
 from types import MappingProxyType
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import homeassistant.util.dt as dt_util
 from homeassistant.components.light import (
     ATTR_BRIGHTNESS,
+    ATTR_EFFECT,
     ATTR_TRANSITION,
+    EFFECT_OFF,
     ColorMode,
     LightEntity,
     LightEntityFeature,
 )
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
-    CONF_NAME,
     CONF_TYPE,
     STATE_ON,
     Platform,
 )
-from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
-from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
-from homeassistant.helpers.event import (
-    async_track_time_interval,
-)
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.typing import ConfigType
 
-from . import _make_pwm_device
+from . import RpiPwmConfigEntry
+from .brightness import TRANSITION_TABLE_SIZE, build_brightness_table
 from .const import (
-    CONF_RPI,
-    CONF_RPI_MODEL,
+    CONF_BRIGHTNESS_CURVE,
+    CONF_EASING,
+    CONF_FRAME_RATE,
+    CONF_GAMMA,
+    CONF_STATE_UPDATE_RATE,
     DEFAULT_BRIGHTNESS,
-    DOMAIN,
-    RPI_UNKNOWN,
+    DEFAULT_BRIGHTNESS_CURVE,
+    DEFAULT_EASING,
+    DEFAULT_FRAME_RATE,
+    DEFAULT_GAMMA,
+    DEFAULT_STATE_UPDATE_RATE,
+)
+from .effects import EFFECTS, build_effect_plan
+from .entity import RpiPwmEntity
+from .metrics import ChannelMetrics
+from .sysfs import SysfsPwmChannel
+from .transition import (
+    FramePlan,
+    ThreadedTransitionRunner,
+    TransitionRunner,
+    build_frame_plan,
 )
 
+if TYPE_CHECKING:
+    from .remote import RemoteTransitionRunner
+
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
     hass: HomeAssistant,
-    config_entry: ConfigEntry,
+    config_entry: RpiPwmConfigEntry,
     async_add_entities: AddConfigEntryEntitiesCallback,
 ) -> None:
     """Set up this platform for a specific PWM pin."""
@@ -54,89 +74,138 @@ async def async_setup_entry(
                     hass=hass,
                     config=config_entry.data,
                     unique_id=config_entry.unique_id,
+                    metrics=config_entry.runtime_data.metrics,
+                    pwm=config_entry.runtime_data.pwm,
                 )
             ]
         )
 
 
-class RpiPwmLed(LightEntity, RestoreEntity):
+class RpiPwmLed(RpiPwmEntity, LightEntity, RestoreEntity):
     """Representation of a simple one-color PWM LED."""
 
     _attr_color_mode = ColorMode.BRIGHTNESS
+    _supports_output_transition = True
 
     def __init__(
         self,
         config: MappingProxyType[str, Any],
         unique_id: str | None,
         hass: HomeAssistant,
+        metrics: ChannelMetrics | None = None,
+        pwm: asyncio.Future[SysfsPwmChannel] | None = None,
     ) -> None:
         """Initialize one-color PWM LED."""
-        self._hass = hass
-        self._config = config
-        self._simulate_rpi = False
-        if config[CONF_RPI] == RPI_UNKNOWN:
-            self._simulate_rpi = True
-
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, "rpi_gpio")},
-            name=DOMAIN.upper(),
-            manufacturer="Raspberry Pi",
-            model=config[CONF_RPI_MODEL],
+        super().__init__(
+            config=config, unique_id=unique_id, hass=hass, metrics=metrics, pwm=pwm
         )
-        self._attr_unique_id = unique_id
         self._attr_is_on = False
         self._attr_brightness = DEFAULT_BRIGHTNESS
-        self._attr_supported_features |= LightEntityFeature.TRANSITION
-        self._attr_name = config[CONF_NAME]
-        self._transition_step_time = timedelta(
-            milliseconds=150
-        )  # Transition step time in ms
-        self._transition_lister: CALLBACK_TYPE | None = None
-        self._transition_start = dt_util.utcnow().replace(microsecond=0)
-        self._transition_end = self._transition_start
-        self._transition_begin_brightness: float = 0.0
-        self._transition_end_brightness: float = 0.0
+        self._attr_supported_features |= (
+            LightEntityFeature.TRANSITION | LightEntityFeature.EFFECT
+        )
+        self._attr_effect_list = EFFECTS
+        self._attr_effect: str | None = None
+        self._transition: (
+            TransitionRunner | ThreadedTransitionRunner | RemoteTransitionRunner | None
+        ) = None
+        self._cancel_state_updates: Callable[[], None] | None = None
         self._attr_supported_color_modes = {ColorMode.BRIGHTNESS}
 
-    async def async_added_to_hass(self) -> None:
-        """Handle entity about to be added to hass event."""
-        await super().async_added_to_hass()
+    @callback
+    def _apply_config(self, config: MappingProxyType[str, Any]) -> None:
+        """Take over the transition settings and compile the brightness curve."""
+        super()._apply_config(config)
+        self._frame_rate: float = config.get(CONF_FRAME_RATE, DEFAULT_FRAME_RATE)
+        self._easing: str = config.get(CONF_EASING, DEFAULT_EASING)
+        self._state_update_rate: float = config.get(
+            CONF_STATE_UPDATE_RATE, DEFAULT_STATE_UPDATE_RATE
+        )
+        # Compile the brightness curve once, straight to duty cycles in ns for
+        # the configured period: one entry per Home Assistant brightness level,
+        # and a finer one to interpolate transitions on.
+        curve = config.get(CONF_BRIGHTNESS_CURVE, DEFAULT_BRIGHTNESS_CURVE)
+        gamma = config.get(CONF_GAMMA, DEFAULT_GAMMA)
+        self._brightness_ns = array(
+            "q", map(self._to_duty_ns, build_brightness_table(curve, gamma))
+        )
+        self._transition_ns = array(
+            "q",
+            map(
+                self._to_duty_ns,
+                build_brightness_table(curve, gamma, TRANSITION_TABLE_SIZE),
+            ),
+        )
 
-        if not self._simulate_rpi:
-            self._pwm = await self._hass.async_add_executor_job(
-                _make_pwm_device, self._config
-            )
+    @callback
+    def _reconfigured_output(self) -> int | None:
+        """Output the current brightness through the new curve."""
+        self._cancel_transition()
+        if not self._attr_is_on or self._attr_brightness is None:
+            return None
+        if self._attr_effect is not None:
+            self._start_effect(self._attr_effect, self._attr_brightness)
+            return None
+        return self._from_hass_brightness(self._attr_brightness)
 
-        if last_state := await self.async_get_last_state():
-            self._attr_is_on = last_state.state == STATE_ON
-            self._attr_brightness = last_state.attributes.get(
-                "brightness", DEFAULT_BRIGHTNESS
-            )
-            if (self._attr_brightness is not None) and not self._simulate_rpi:
-                self._hass.async_add_executor_job(
-                    self._pwm.start, self._from_hass_brightness(self._attr_brightness)
-                )
+    async def _async_restore_output(self) -> int:
+        """Restore on state and brightness, the output stays dark when off."""
+        if (last_state := await self.async_get_last_state()) is None:
+            return 0
+        self._attr_is_on = last_state.state == STATE_ON
+        self._attr_brightness = last_state.attributes.get(
+            "brightness", DEFAULT_BRIGHTNESS
+        )
+        if not self._attr_is_on or self._attr_brightness is None:
+            return 0
+        return self._from_hass_brightness(self._attr_brightness)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop transitions and release the PWM channel."""
+        self._cancel_transition()
+        await super().async_will_remove_from_hass()
 
     @property
     def should_poll(self) -> bool:
         """No polling needed."""
         return False
 
+    @property
+    def is_on(self) -> bool:
+        """Return if the light is on, also while a published fade goes dark."""
+        if self._cancel_state_updates is not None and self._duty_ns:
+            return True
+        return bool(self._attr_is_on)
+
+    @property
+    def brightness(self) -> int | None:
+        """Return the brightness, the one of the output while publishing a fade."""
+        if self._cancel_state_updates is not None:
+            position = bisect_left(self._transition_ns, self._duty_ns)
+            return round(position * 255 / (TRANSITION_TABLE_SIZE - 1)) or 1
+        return self._attr_brightness
+
     async def async_turn_on(self, **kwargs: ConfigType) -> None:
         """Turn on a led."""
         if ATTR_BRIGHTNESS in kwargs:
             self._attr_brightness = kwargs[ATTR_BRIGHTNESS]
+        if ATTR_EFFECT in kwargs:
+            effect = kwargs[ATTR_EFFECT]
+            self._attr_effect = None if effect == EFFECT_OFF else effect
 
-        if ATTR_TRANSITION in kwargs:
+        if self._attr_effect is not None:
+            # The effect keeps running, now at the requested brightness.
+            self._start_effect(self._attr_effect, self._attr_brightness or 0)
+        elif ATTR_TRANSITION in kwargs:
             transition_time: float = kwargs[ATTR_TRANSITION]
-            await self._async_start_transition(
-                brightness=self._from_hass_brightness(self._attr_brightness),
-                duration=timedelta(seconds=transition_time),
+            self._start_transition(
+                brightness=self._attr_brightness or 0,
+                duration=transition_time,
             )
-        elif not self._simulate_rpi:
-            self._hass.async_add_executor_job(
-                self._pwm.change_duty_cycle,
-                self._from_hass_brightness(self._attr_brightness),
+        else:
+            self._cancel_transition()
+            await self.async_write_duty_ns(
+                self._from_hass_brightness(self._attr_brightness)
             )
         self._attr_is_on = True
         self.schedule_update_ha_state()
@@ -146,75 +215,109 @@ class RpiPwmLed(LightEntity, RestoreEntity):
         if self.is_on:
             if ATTR_TRANSITION in kwargs:
                 transition_time: float = kwargs[ATTR_TRANSITION]
-                await self._async_start_transition(
-                    brightness=0, duration=timedelta(seconds=transition_time)
-                )
-            elif not self._simulate_rpi:
-                self._hass.async_add_executor_job(self._pwm.change_duty_cycle, 0.0)
+                self._start_transition(brightness=0, duration=transition_time)
+            else:
+                self._cancel_transition()
+                await self.async_write_duty_ns(0)
 
         self._attr_is_on = False
         self.schedule_update_ha_state()
 
-    async def _async_start_transition(
-        self, brightness: float, duration: timedelta
-    ) -> None:
-        """Start light transitio."""
+    @callback
+    def async_prepare_output(
+        self, value: float, transition: float | None
+    ) -> int | None:
+        """Update the state for a brightness of 0..255, 0 turns the light off."""
+        brightness = min(max(round(value), 0), 255)
+        if brightness:
+            self._attr_brightness = brightness
+        self._attr_is_on = brightness > 0
+        self._attr_effect = None
+        if transition is not None:
+            self._start_transition(brightness=brightness, duration=transition)
+            return None
+        self._cancel_transition()
+        return self._from_hass_brightness(brightness)
+
+    @callback
+    def async_prepare_scene(self, value: float) -> Callable[[float], int]:
+        """Update the state for a scene, interpolating on the brightness curve."""
+        self.async_prepare_output(value, None)
+        brightness = self._attr_brightness if self._attr_is_on else 0
+        start = bisect_left(self._transition_ns, self._duty_ns)
+        delta = (brightness or 0) * (TRANSITION_TABLE_SIZE - 1) / 255 - start
+        return lambda progress: self._transition_duty_ns(start + delta * progress)
+
+    def _start_transition(self, brightness: int, duration: float) -> None:
+        """Start a transition from the current output to brightness (0..255)."""
         # First check if a transition was in progress; in that case stop it.
-        if self._transition_lister:
-            self._transition_lister()
-        # initialize relevant values
-        if not self._simulate_rpi:
-            self._transition_begin_brightness = self._pwm._duty_cycle  # noqa: SLF001
-        if self._transition_begin_brightness != brightness:
-            self._transition_start = dt_util.utcnow()
-            self._transition_end = self._transition_start + duration
-            self._transition_end_brightness = brightness
-            # Start transition cycles.
-            self._transition_lister = async_track_time_interval(
-                self.hass, self._async_step_transition, self._transition_step_time
+        self._cancel_transition()
+        # Interpolate on the perceptual scale: positions in the fine table.
+        last = TRANSITION_TABLE_SIZE - 1
+        plan = build_frame_plan(
+            start=bisect_left(self._transition_ns, self._duty_ns),
+            end=brightness * last / 255,
+            duration=duration,
+            frame_rate=self._frame_rate,
+            easing=self._easing,
+            quantize=self._transition_duty_ns,
+        )
+        self._transition = self._create_frame_runner(plan, self._async_transition_done)
+        self._transition.start()
+        if self._state_update_rate > 0:
+            # Publish the progress at a capped rate, whatever the frame rate.
+            self._cancel_state_updates = async_track_time_interval(
+                self._hass,
+                self._async_publish_progress,
+                timedelta(seconds=1 / self._state_update_rate),
             )
 
+    def _start_effect(self, effect: str, brightness: int) -> None:
+        """Play an effect at brightness (0..255) until the next command."""
+        self._cancel_transition()
+        levels, period = build_effect_plan(effect, self._frame_rate)
+        scale = brightness * (TRANSITION_TABLE_SIZE - 1) / 255
+        plan = FramePlan()
+        for offset, level in zip(levels.offsets, levels.values, strict=True):
+            plan.append(offset, self._transition_duty_ns(level * scale))
+        self._transition = self._create_frame_runner(
+            plan, self._async_transition_done, period
+        )
+        self._transition.start()
+
+    def _cancel_transition(self) -> None:
+        """Stop a running transition, so it can not overwrite a new value."""
+        if self._transition is not None:
+            self._transition.cancel()
+            self._transition = None
+        self._stop_state_updates()
+
+    def _stop_state_updates(self) -> bool:
+        """Stop publishing the progress of a transition, return if it was."""
+        if self._cancel_state_updates is None:
+            return False
+        self._cancel_state_updates()
+        self._cancel_state_updates = None
+        return True
+
     @callback
-    async def _async_step_transition(self, args: None = None) -> None:  # noqa: ARG002
-        """Cycle for transition of output."""
-        # Calculate switch off time, and if in the future, add a lister to hass
-        now = dt_util.utcnow()
-        if now > self._transition_end:
-            if not self._simulate_rpi:
-                self._hass.async_add_executor_job(
-                    self._pwm.change_duty_cycle,
-                    self._transition_end_brightness,
-                )
-            if self._transition_lister:
-                self._transition_lister()  # Stop cycling
-        else:
-            elapsed: float = (now - self._transition_start).total_seconds()
-            total_transition: float = (
-                self._transition_end - self._transition_start
-            ).total_seconds()
-            target_brightness = int(
-                self._transition_begin_brightness
-                + (
-                    (
-                        (
-                            self._transition_end_brightness
-                            - self._transition_begin_brightness
-                        )
-                        * elapsed
-                    )
-                    / total_transition
-                )
-            )
-            if not self._simulate_rpi:
-                self._hass.async_add_executor_job(
-                    self._pwm.change_duty_cycle, target_brightness
-                )
+    def _async_publish_progress(self, _now: datetime) -> None:
+        """Publish the brightness the transition has reached."""
+        self.async_write_ha_state()
 
-    def _from_hass_brightness(self, brightness: int | None) -> float:
-        """Convert Home Assistant  units (0..256) to 0.0..1000."""
-        if brightness:
-            r_val = (brightness * 100.0) / 255
-            r_val = min(r_val, 100.0)
-            return max(r_val, 0.0)
+    def _transition_duty_ns(self, position: float) -> int:
+        """Return the duty cycle in ns for a position in the transition table."""
+        return self._transition_ns[round(position)]
 
+    @callback
+    def _async_transition_done(self) -> None:
+        """Forget the finished transition."""
+        self._transition = None
+        if self._stop_state_updates():
+            self.async_write_ha_state()
+
+    def _from_hass_brightness(self, brightness: int | None) -> int:
+        """Convert Home Assistant units (0..255) to a duty cycle in ns."""
+        if brightness:
+            return self._brightness_ns[min(max(brightness, 0), 255)]
         return 0
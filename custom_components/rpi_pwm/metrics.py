@@ -0,0 +1,102 @@
+"""Cheap, always-on performance metrics of a PWM channel."""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any
+
+HISTOGRAM_BUCKETS = 24  # Bucket k counts samples of [2**(k-1), 2**k) microseconds
+
+
+class Histogram:
+    """
+    Latency histogram with fixed power-of-two buckets.
+
+    Recording a sample is one integer conversion and an increment in a
+    preallocated array, so it can stay enabled permanently.
+    """
+
+    __slots__ = ("buckets", "count", "max", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.buckets = array("Q", bytes(8 * HISTOGRAM_BUCKETS))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Add one sample, given in seconds."""
+        seconds = max(seconds, 0.0)
+        index = int(seconds * 1_000_000).bit_length()
+        self.buckets[min(index, HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return an upper bound of the given percentile in seconds."""
+        if not self.count:
+            return None
+        needed = fraction * self.count
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= needed:
+                return min((1 << index) / 1_000_000, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary in milliseconds, for diagnostics."""
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "p50_ms": p50 * 1000 if p50 is not None else None,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+            "max_ms": self.max * 1000,
+            "buckets": list(self.buckets),
+        }
+
+
+class ChannelMetrics:
+    """Counters and histograms of one PWM channel."""
+
+    __slots__ = (
+        "coalesced",
+        "controller_held",
+        "controller_updates",
+        "errors",
+        "frame_jitter",
+        "queue_delay",
+        "suppressed",
+        "write_latency",
+        "writes",
+    )
+
+    def __init__(self) -> None:
+        """Initialize all counters at zero."""
+        self.writes = 0
+        self.coalesced = 0
+        self.suppressed = 0
+        self.errors = 0
+        self.controller_updates = 0
+        self.controller_held = 0
+        self.write_latency = Histogram()
+        self.queue_delay = Histogram()
+        self.frame_jitter = Histogram()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics, for diagnostics."""
+        return {
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "suppressed": self.suppressed,
+            "errors": self.errors,
+            "controller_updates": self.controller_updates,
+            "controller_held": self.controller_held,
+            "write_latency": self.write_latency.as_dict(),
+            "queue_delay": self.queue_delay.as_dict(),
+            "frame_jitter": self.frame_jitter.as_dict(),
+        }
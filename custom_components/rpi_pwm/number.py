@@ -12,13 +12,11 @@ from homeassistant.const import (
     CONF_MAXIMUM,
     CONF_MINIMUM,
     CONF_MODE,
-    CONF_NAME,
     CONF_TYPE,
     Platform,
 )
-from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.core import callback
 
-from . import _make_pwm_device
 from .const import (
     ATTR_FREQUENCY,
     ATTR_INVERT,
@@ -26,27 +24,32 @@ from .const import (
     CONF_INVERT,
     CONF_NORMALIZE_LOWER,
     CONF_NORMALIZE_UPPER,
-    CONF_RPI,
-    CONF_RPI_MODEL,
+    CONF_SLEW_RATE,
+    CONF_SLEW_RESOLUTION,
     CONF_STEP,
-    CONST_PWM_MAX,
-    DOMAIN,
-    RPI_UNKNOWN,
+    DEFAULT_SLEW_RATE,
+    DEFAULT_SLEW_RESOLUTION,
 )
+from .entity import RpiPwmEntity
+from .transition import SlewRateLimiter
 
 if TYPE_CHECKING:
+    import asyncio
     from types import MappingProxyType
 
-    from homeassistant.config_entries import ConfigEntry
     from homeassistant.core import HomeAssistant
     from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
 
+    from . import RpiPwmConfigEntry
+    from .metrics import ChannelMetrics
+    from .sysfs import SysfsPwmChannel
+
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(
     hass: HomeAssistant,
-    config_entry: ConfigEntry,
+    config_entry: RpiPwmConfigEntry,
     async_add_entities: AddConfigEntryEntitiesCallback,
 ) -> None:
     """Set up this platform for a specific ConfigEntry(==PCA9685 device)."""
@@ -56,13 +59,15 @@ async def async_setup_entry(
                 RpiPwmNumber(
                     config=config_entry.data,
                     unique_id=config_entry.unique_id,
+                    metrics=config_entry.runtime_data.metrics,
+                    pwm=config_entry.runtime_data.pwm,
                     hass=hass,
                 )
             ]
         )
 
 
-class RpiPwmNumber(RestoreNumber):
+class RpiPwmNumber(RpiPwmEntity, RestoreNumber):
     """Representation of a simple  PWM output."""
 
     _attr_should_poll = False
@@ -72,56 +77,80 @@ class RpiPwmNumber(RestoreNumber):
         config: MappingProxyType[str, Any],
         unique_id: str | None,
         hass: HomeAssistant,
+        metrics: ChannelMetrics | None = None,
+        pwm: asyncio.Future[SysfsPwmChannel] | None = None,
     ) -> None:
         """Initialize one-color PWM LED."""
-        self._hass = hass
-        self._config = config
-        self._simulate_rpi = False
-        if config[CONF_RPI] == RPI_UNKNOWN:
-            self._simulate_rpi = True
-
-        self._attr_device_info = DeviceInfo(
-            identifiers={(DOMAIN, "rpi_gpio")},
-            name=DOMAIN.upper(),
-            manufacturer="Raspberry Pi",
-            model=config[CONF_RPI_MODEL],
+        super().__init__(
+            config=config, unique_id=unique_id, hass=hass, metrics=metrics, pwm=pwm
+        )
+        self._attr_native_value = config[CONF_MINIMUM]
+        # Value the output is at, behind the setpoint while slewing
+        self._output_value: float | None = None
+        self._slew = SlewRateLimiter(
+            hass.loop, self._write_output_value, self._metrics.frame_jitter
         )
-        self._attr_unique_id = unique_id
 
+    @callback
+    def _apply_config(self, config: MappingProxyType[str, Any]) -> None:
+        """Take over the limits, step, display mode, scaling and slew rate."""
+        super()._apply_config(config)
         self._attr_native_min_value = config[CONF_MINIMUM]
         self._attr_native_max_value = config[CONF_MAXIMUM]
         self._attr_native_step = config[CONF_STEP]
         self._attr_mode = config[CONF_MODE]
-        self._attr_native_value = config[CONF_MINIMUM]
-        self._attr_name = config[CONF_NAME]
-
-    async def async_added_to_hass(self) -> None:
-        """Handle entity about to be added to hass event."""
-        await super().async_added_to_hass()
-
-        if not self._simulate_rpi:
-            self._pwm = await self._hass.async_add_executor_job(
-                _make_pwm_device, self._config
+        self._slew_rate: float = config.get(CONF_SLEW_RATE, DEFAULT_SLEW_RATE)
+        self._slew_resolution: float = config.get(
+            CONF_SLEW_RESOLUTION, DEFAULT_SLEW_RESOLUTION
+        )
+        # Scale range from N_L..N_U to 0..period, once instead of per write
+        self._normalize_lower: float = config[CONF_NORMALIZE_LOWER]
+        self._ns_per_unit = self._period_ns / (
+            config[CONF_NORMALIZE_UPPER] - config[CONF_NORMALIZE_LOWER]
+        )
+        self._invert: bool = config[CONF_INVERT]
+
+    @callback
+    def _reconfigured_output(self) -> int | None:
+        """Output the current value with the new scaling, inversion and rate."""
+        if self._attr_native_value is None:
+            return None
+        if self._slew_rate > 0 and self._slew.running:
+            # Keep ramping, from where the output is now.
+            self._slew.move_to(
+                self._attr_native_value,
+                self._attr_native_value,
+                self._slew_rate,
+                self._slew_resolution,
             )
+            return self._value_to_ns(self._output_value or 0.0)
+        return self.async_prepare_output(self._attr_native_value, None)
 
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop ramping and release the PWM channel."""
+        self._slew.cancel()
+        await super().async_will_remove_from_hass()
+
+    async def _async_restore_output(self) -> int | None:
+        """Restore the native value and return the matching duty cycle."""
         if last_data := await self.async_get_last_number_data():
             try:
-                await self.async_set_native_value(float(last_data.native_value))
-            except ValueError:
+                return self.async_prepare_output(float(last_data.native_value), None)
+            except (TypeError, ValueError):
                 _LOGGER.warning(
                     "Could not read value %s from last state data for %s!",
                     last_data.native_value,
                     self.name,
                 )
-        else:
-            await self.async_set_native_value(self._config[CONF_MINIMUM])
+                return None
+        return self.async_prepare_output(self._config[CONF_MINIMUM], None)
 
     @property
     def frequency(self) -> float:
         """Return PWM frequency."""
         if not hasattr(self, "_pwm"):
             return self._config[CONF_FREQUENCY]
-        return self._pwm._hz  # noqa: SLF001
+        return self._pwm.frequency
 
     @property
     def invert(self) -> bool:
@@ -138,29 +167,47 @@ class RpiPwmNumber(RestoreNumber):
 
     async def async_set_native_value(self, value: float) -> None:
         """Set new value."""
-        # Clip value to limits (don't know if this is required?)
-        value = max(value, self._config[CONF_MINIMUM])
-        value = min(value, self._config[CONF_MAXIMUM])
-
-        # Scale range from N_L..N_U to 0..100%
-        range_pwm = CONST_PWM_MAX
-        range_normalized = (
-            self._config[CONF_NORMALIZE_UPPER] - self._config[CONF_NORMALIZE_LOWER]
-        )
-        scaled_to_pwm = (value - self._config[CONF_NORMALIZE_LOWER]) * (
-            range_pwm / range_normalized
-        )
+        duty_ns = self.async_prepare_output(value, None)
+        # Set value to driver, unless it is ramped there
+        if duty_ns is not None:
+            await self.async_write_duty_ns(duty_ns)
+        self.schedule_update_ha_state()
 
-        if self._config[CONF_INVERT]:
-            scaled_to_pwm = CONST_PWM_MAX - scaled_to_pwm
-        # Make sure it will fit in the 0..100 range
-        scaled_to_pwm = min(CONST_PWM_MAX, scaled_to_pwm)
-        scaled_to_pwm = max(0, scaled_to_pwm)
-        # Set value to driver
-        if not self._simulate_rpi:
-            self._hass.async_add_executor_job(
-                self._pwm.change_duty_cycle,
-                scaled_to_pwm,
-            )
+    @callback
+    def async_prepare_output(
+        self,
+        value: float,
+        transition: float | None,  # noqa: ARG002
+    ) -> int | None:
+        """
+        Update the native value and return the matching duty cycle in ns.
+
+        With a slew rate the output ramps to the new value on its own and
+        None is returned; a ramp in flight just takes over the new target.
+        """
+        # Clip value to limits (don't know if this is required?)
+        value = max(value, self._attr_native_min_value)
+        value = min(value, self._attr_native_max_value)
         self._attr_native_value = value
-        self.schedule_update_ha_state()
+        if self._slew_rate > 0 and self._output_value is not None:
+            self._slew.move_to(
+                value, self._output_value, self._slew_rate, self._slew_resolution
+            )
+            return None
+        self._slew.cancel()
+        self._output_value = value
+        return self._value_to_ns(value)
+
+    def _value_to_ns(self, value: float) -> int:
+        """Scale a native value to a duty cycle in ns, inverted if configured."""
+        duty_ns = (value - self._normalize_lower) * self._ns_per_unit
+        if self._invert:
+            duty_ns = self._period_ns - duty_ns
+        # Make sure it will fit in the 0..period range
+        return round(min(max(duty_ns, 0), self._period_ns))
+
+    @callback
+    def _write_output_value(self, value: float) -> None:
+        """Write one step of a ramp."""
+        self._output_value = value
+        self._write_duty_ns_nowait(self._value_to_ns(value))
@@ -0,0 +1,663 @@
+"""
+Binary protocol to a PWM agent on another Pi, and the client side of it.
+
+Every message starts with a fixed header: the operation, the channel handle
+(chosen by the client, per connection), a request id and the payload length.
+Requests are pipelined: the client sends without waiting, the agent answers
+each request in order with the same request id. Frame plans are sent as a
+whole and played by the agent, which reports the end of a plan with a
+separate event.
+
+The agent answers OP_HELLO with a random challenge. The client proves that it
+knows the shared secret of the agent by signing the challenge with it
+(HMAC-SHA256) in OP_AUTH; only then does the agent accept other requests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from dataclasses import asdict
+from typing import TYPE_CHECKING, Any
+
+from .const import DEFAULT_AGENT_PORT
+from .hardware import HardwareProfile
+from .sysfs import NS_PER_SECOND, SysfsPwmError
+from .transition import FramePlan
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine
+
+    from .writer import PwmWriter
+
+_LOGGER = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 2
+
+# op (u8), channel handle (u8), request id (u32), payload length (u32)
+HEADER = struct.Struct("!BBII")
+MAX_PAYLOAD = 1 << 20
+
+OP_HELLO = 0x01  # u16 version -> challenge
+OP_OPEN = 0x02  # f64 frequency, pin name -> STATE
+OP_START = 0x03  # i64 duty ns, -1 keeps the current one -> STATE
+OP_STOP = 0x04  # -> STATE
+OP_SET = 0x05  # i64 duty ns -> u8 written
+OP_FREQUENCY = 0x06  # f64 frequency -> STATE
+OP_PLAY = 0x07  # u32 play id, f64 period (0 plays once), u32 n, n f64 offsets,
+# n i64 values -> nothing
+OP_CANCEL = 0x08  # -> STATE
+OP_CLOSE = 0x09  # -> nothing
+OP_AUTH = 0x0A  # HMAC of the challenge, empty without secret -> JSON hardware
+# profile of the agent
+OP_DONE = 0x40  # Event with the play id as request id, STATE
+OP_ERROR = 0x7F  # Reply with an UTF-8 message
+FLAG_REPLY = 0x80
+
+# Reply to the channel operations: period ns, duty ns, enabled
+STATE = struct.Struct("!qq?")
+VERSION = struct.Struct("!H")
+DUTY = struct.Struct("!q")
+FREQUENCY = struct.Struct("!d")
+WRITTEN = struct.Struct("!?")
+PLAY = struct.Struct("!IdI")
+
+CHALLENGE_SIZE = 32
+CONNECT_TIMEOUT = 5.0
+REQUEST_TIMEOUT = 10.0
+MAX_HANDLES = 255
+
+
+def _to_network(values: array) -> bytes:
+    """Return the items of an array in network byte order."""
+    if sys.byteorder == "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_network(typecode: str, data: bytes) -> array:
+    """Return an array from items in network byte order."""
+    values = array(typecode, data)
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values
+
+
+def encode_plan(play_id: int, plan: FramePlan, period: float | None) -> bytes:
+    """Encode a frame plan (values in duty ns) for OP_PLAY."""
+    return (
+        PLAY.pack(play_id, period or 0.0, len(plan))
+        + _to_network(plan.offsets)
+        + _to_network(array("q", map(int, plan.values)))
+    )
+
+
+def decode_plan(payload: bytes) -> tuple[int, FramePlan, float | None]:
+    """Decode the payload of OP_PLAY, raises ValueError when malformed."""
+    play_id, period, count = PLAY.unpack_from(payload)
+    if len(payload) != PLAY.size + 16 * count:
+        msg = f"Plan of {count} frames does not fit {len(payload)} bytes"
+        raise ValueError(msg)
+    split = PLAY.size + 8 * count
+    plan = FramePlan()
+    plan.offsets = _from_network("d", payload[PLAY.size : split])
+    plan.values = array("d", _from_network("q", payload[split:]))
+    return play_id, plan, period or None
+
+
+class AgentError(SysfsPwmError):
+    """Error reported by the PWM agent in reply to a request."""
+
+
+class AgentAuthError(AgentError):
+    """Error raised when the PWM agent does not accept the secret."""
+
+
+def sign_challenge(secret: bytes, challenge: bytes) -> bytes:
+    """Return the answer to the challenge of the agent for OP_AUTH."""
+    return hmac.new(secret, challenge, hashlib.sha256).digest()
+
+
+def encode_profile(profile: HardwareProfile) -> bytes:
+    """Encode the hardware profile of the agent for the reply to OP_HELLO."""
+    return json.dumps(asdict(profile)).encode()
+
+
+def decode_profile(payload: bytes) -> HardwareProfile:
+    """Decode the hardware profile of the agent."""
+    data = json.loads(payload)
+    return HardwareProfile(
+        board_model=data["board_model"],
+        kernel_release=data["kernel_release"],
+        chips={int(chip): npwm for chip, npwm in data["chips"].items()},
+        pin_chips=data["pin_chips"],
+    )
+
+
+class RemotePwmClient:
+    """
+    Connection to one PWM agent, shared by all channels on that Pi.
+
+    The connection is made on first use and made again after it was lost;
+    channels that were open are then opened again, and the agent adopts the
+    output they kept. Requests are made on the event loop; the blocking
+    request() is for the writer and executor threads.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        host: str,
+        port: int = DEFAULT_AGENT_PORT,
+        secret: str | None = None,
+    ) -> None:
+        """Initialize the client, nothing is connected yet."""
+        self._loop = loop
+        self.host = host
+        self.port = port
+        # Used from the next connection on
+        self.secret = secret
+        self.profile: HardwareProfile | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+        self._connect_lock = asyncio.Lock()
+        self._pending: dict[int, asyncio.Future[bytes]] = {}
+        self._channels: dict[int, RemotePwmChannel] = {}
+        self._next_id = 0
+        self._connected = False
+        self._closing = False
+
+    def __repr__(self) -> str:
+        """Return the address of the agent."""
+        return f"{self.host}:{self.port}"
+
+    @property
+    def connected(self) -> bool:
+        """Return if the connection to the agent is up."""
+        return self._connected
+
+    async def async_info(self) -> HardwareProfile:
+        """Connect if needed and return the hardware profile of the agent."""
+        await self._async_ensure_connected()
+        if self.profile is None:
+            msg = f"PWM agent {self} did not describe its hardware"
+            raise SysfsPwmError(msg)
+        return self.profile
+
+    async def async_open_channel(self, pin: str, hz: float) -> RemotePwmChannel:
+        """Open the PWM channel behind a pin of the remote Pi."""
+        handle = next(
+            (h for h in range(1, MAX_HANDLES + 1) if h not in self._channels), None
+        )
+        if handle is None:
+            msg = f"Too many channels open on PWM agent {self}"
+            raise SysfsPwmError(msg)
+        channel = RemotePwmChannel(self, handle, pin, hz)
+        self._channels[handle] = channel
+        try:
+            await channel.async_open()
+        except BaseException:
+            del self._channels[handle]
+            raise
+        return channel
+
+    async def async_request(self, op: int, handle: int, payload: bytes = b"") -> bytes:
+        """Send a request and wait for its reply payload."""
+        await self._async_ensure_connected()
+        return await self._async_send(op, handle, payload)
+
+    def request(self, op: int, handle: int, payload: bytes = b"") -> bytes:
+        """Send a request from another thread and wait for the reply."""
+        return self.run(self.async_request(op, handle, payload))
+
+    def run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine of the client from another thread and wait for it."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            coro.close()
+            msg = "Blocking PWM agent request made in the event loop"
+            raise RuntimeError(msg)
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(REQUEST_TIMEOUT)
+        except TimeoutError as err:
+            future.cancel()
+            msg = f"PWM agent {self} did not answer in time"
+            raise SysfsPwmError(msg) from err
+
+    def forget(self, handle: int) -> None:
+        """Forget a closed channel, thread safe."""
+        self._loop.call_soon_threadsafe(self._channels.pop, handle, None)
+
+    async def async_close(self) -> None:
+        """Close the connection, the outputs keep their current state."""
+        self._closing = True
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+    async def _async_ensure_connected(self) -> None:
+        """Connect and open the known channels again, unless connected."""
+        if self._connected:
+            return
+        async with self._connect_lock:
+            if self._connected:
+                return
+            if self._closing:
+                msg = f"Connection to PWM agent {self} is closed"
+                raise SysfsPwmError(msg)
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), CONNECT_TIMEOUT
+                )
+            except (OSError, TimeoutError) as err:
+                msg = f"Could not connect to PWM agent {self}: {err}"
+                raise SysfsPwmError(msg) from err
+            self._writer = writer
+            self._reader_task = self._loop.create_task(
+                self._async_read(reader, writer), name=f"rpi_pwm agent {self}"
+            )
+            try:
+                challenge = await self._async_send(
+                    OP_HELLO, 0, VERSION.pack(PROTOCOL_VERSION)
+                )
+                self.profile = decode_profile(await self._async_authenticate(challenge))
+                for channel in list(self._channels.values()):
+                    if channel.is_open:
+                        await channel.async_reopen()
+            except BaseException:
+                writer.close()
+                raise
+            self._connected = True
+            _LOGGER.debug("Connected to PWM agent %s", self)
+
+    async def _async_authenticate(self, challenge: bytes) -> bytes:
+        """Answer the challenge of the agent, return its reply."""
+        answer = b""
+        if self.secret:
+            answer = sign_challenge(self.secret.encode(), challenge)
+        try:
+            return await self._async_send(OP_AUTH, 0, answer)
+        except AgentError as err:
+            msg = f"PWM agent {self} did not accept the secret: {err}"
+            raise AgentAuthError(msg) from err
+
+    async def _async_send(self, op: int, handle: int, payload: bytes) -> bytes:
+        """Send a request on the current connection and wait for the reply."""
+        writer = self._writer
+        if writer is None:
+            msg = f"Connection to PWM agent {self} was lost"
+            raise SysfsPwmError(msg)
+        self._next_id = request_id = (self._next_id + 1) & 0xFFFFFFFF
+        future = self._pending[request_id] = self._loop.create_future()
+        writer.write(HEADER.pack(op, handle, request_id, len(payload)) + payload)
+        try:
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _async_read(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Read replies and events until the connection is lost.
+
+        Any error ends the connection, a malformed message as well: the
+        requests waiting for a reply then fail instead of waiting forever.
+        """
+        error: Exception | None = None
+        try:
+            while True:
+                op, handle, request_id, length = HEADER.unpack(
+                    await reader.readexactly(HEADER.size)
+                )
+                payload = await reader.readexactly(length) if length else b""
+                if op == OP_DONE:
+                    if (channel := self._channels.get(handle)) is not None:
+                        channel.play_done(request_id, payload)
+                    continue
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if op == OP_ERROR:
+                    future.set_exception(AgentError(payload.decode(errors="replace")))
+                else:
+                    future.set_result(payload)
+        except (OSError, asyncio.IncompleteReadError) as err:
+            error = err
+        except Exception as err:
+            _LOGGER.exception("Invalid message from PWM agent %s", self)
+            error = err
+        finally:
+            writer.close()
+            self._connection_lost(error)
+
+    def _connection_lost(self, error: Exception | None) -> None:
+        """Fail the waiting requests and the plans of a lost connection."""
+        self._writer = None
+        self._connected = False
+        if not self._closing:
+            _LOGGER.warning("Connection to PWM agent %s lost: %s", self, error)
+        lost = SysfsPwmError(f"Connection to PWM agent {self} was lost: {error}")
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(lost)
+        self._pending.clear()
+        # The agent stops the plans of a lost connection.
+        for channel in self._channels.values():
+            channel.connection_lost()
+        if any(channel.play_lost for channel in self._channels.values()):
+            self._loop.create_task(
+                self._async_recover(), name=f"rpi_pwm agent {self} recover"
+            )
+
+    async def _async_recover(self) -> None:
+        """
+        Connect again to end the plans that were lost with the connection.
+
+        Opening the channels again reports the output the plans left; the
+        plans of channels that can not be opened end with the output unknown.
+        """
+        if not self._closing:
+            try:
+                await self._async_ensure_connected()
+            except SysfsPwmError as err:
+                _LOGGER.debug("Could not connect to PWM agent %s again: %s", self, err)
+        for channel in list(self._channels.values()):
+            channel.end_lost_play(None)
+
+
+class RemotePwmChannel:
+    """
+    A PWM channel of a remote Pi, with the interface of SysfsPwmChannel.
+
+    The channel methods block until the agent answered, so like the sysfs
+    ones they are called from the writer and executor threads. The last
+    written duty cycle is cached and not sent again.
+    """
+
+    def __init__(
+        self, client: RemotePwmClient, handle: int, pin: str, hz: float
+    ) -> None:
+        """Initialize the channel, it is opened by the client."""
+        self._client = client
+        self._handle = handle
+        self._pin = pin
+        self._hz = float(hz)
+        self._period_ns = int(NS_PER_SECOND / self._hz)
+        self._duty_ns = 0
+        self._enabled = False
+        self._open = False
+        self._play_id = 0
+        self._plays = 0
+        self._on_play_done: Callable[[int | None], None] | None = None
+        self._on_lost_play: Callable[[int | None], None] | None = None
+
+    @property
+    def path(self) -> str:
+        """Return the agent and pin of this channel."""
+        return f"{self._client}/{self._pin}"
+
+    @property
+    def frequency(self) -> float:
+        """Return the PWM frequency in Hz."""
+        return self._hz
+
+    @property
+    def period_ns(self) -> int:
+        """Return the PWM period in nanoseconds."""
+        return self._period_ns
+
+    @property
+    def duty_cycle(self) -> float:
+        """Return the last written duty cycle in percent."""
+        return self.duty_ns * 100 / self._period_ns
+
+    @property
+    def duty_ns(self) -> int:
+        """Return the last written duty cycle in nanoseconds."""
+        return max(self._duty_ns, 0)
+
+    @property
+    def is_enabled(self) -> bool:
+        """Return if the output is enabled."""
+        return self._enabled
+
+    @property
+    def is_open(self) -> bool:
+        """Return if the channel is open on the agent."""
+        return self._open
+
+    @property
+    def play_lost(self) -> bool:
+        """Return if a plan was lost with the connection and has not ended yet."""
+        return self._on_lost_play is not None
+
+    async def async_open(self) -> None:
+        """Open the channel, adopting the output state it already has."""
+        self._adopt(
+            await self._client.async_request(
+                OP_OPEN, self._handle, FREQUENCY.pack(self._hz) + self._pin.encode()
+            )
+        )
+        self._open = True
+
+    async def async_reopen(self) -> None:
+        """Open the channel on a new connection, ending a plan that was lost."""
+        self.connection_lost()
+        self._adopt(
+            await self._client._async_send(  # noqa: SLF001
+                OP_OPEN, self._handle, FREQUENCY.pack(self._hz) + self._pin.encode()
+            )
+        )
+        self.end_lost_play(self._duty_ns)
+
+    def connection_lost(self) -> None:
+        """Keep the plan the lost connection played, to end it, in the loop."""
+        if self._play_id:
+            self._play_id = 0
+            self._on_lost_play = self._on_play_done
+
+    def end_lost_play(self, duty_ns: int | None) -> None:
+        """Report the end of a lost plan with the output it left, in the loop."""
+        if (on_done := self._on_lost_play) is not None:
+            self._on_lost_play = None
+            on_done(duty_ns)
+
+    def _adopt(self, reply: bytes) -> None:
+        """Take over the output state the agent reported."""
+        period_ns, self._duty_ns, self._enabled = STATE.unpack(reply)
+        if period_ns != self._period_ns:
+            self._period_ns = period_ns
+            self._hz = NS_PER_SECOND / period_ns
+
+    def _request(self, op: int, payload: bytes = b"") -> bytes:
+        """Make a blocking request for this channel."""
+        return self._client.request(op, self._handle, payload)
+
+    def start(self, duty_ns: int | None = None) -> None:
+        """Set the duty cycle in nanoseconds, if given, and enable the output."""
+        if duty_ns is not None and not 0 <= duty_ns <= self._period_ns:
+            msg = f"Duty cycle must be between 0 and {self._period_ns}ns, got {duty_ns}"
+            raise SysfsPwmError(msg)
+        self._play_id = 0
+        self._adopt(
+            self._request(OP_START, DUTY.pack(-1 if duty_ns is None else duty_ns))
+        )
+
+    def stop(self) -> None:
+        """Clear the duty cycle and disable the output."""
+        self._play_id = 0
+        self._adopt(self._request(OP_STOP))
+
+    def change_duty_cycle(self, duty_cycle: float) -> bool:
+        """Change the duty cycle, given in percent (0..100)."""
+        if not 0 <= duty_cycle <= 100:  # noqa: PLR2004
+            msg = f"Duty cycle must be between 0 and 100, got {duty_cycle}"
+            raise SysfsPwmError(msg)
+        return self.change_duty_ns(int(self._period_ns * duty_cycle / 100))
+
+    def change_duty_ns(self, duty_ns: int) -> bool:
+        """
+        Change the duty cycle, given in nanoseconds (0..period).
+
+        This also stops a plan the agent plays. Returns if the agent wrote
+        the hardware.
+        """
+        if duty_ns == self._duty_ns:
+            return False
+        if not 0 <= duty_ns <= self._period_ns:
+            msg = f"Duty cycle must be between 0 and {self._period_ns}ns, got {duty_ns}"
+            raise SysfsPwmError(msg)
+        self._play_id = 0
+        (written,) = WRITTEN.unpack(self._request(OP_SET, DUTY.pack(duty_ns)))
+        self._duty_ns = duty_ns
+        return written
+
+    def change_frequency(self, hz: float) -> None:
+        """Change the frequency while keeping the relative duty cycle."""
+        self._play_id = 0
+        self._adopt(self._request(OP_FREQUENCY, FREQUENCY.pack(hz)))
+        self._hz = float(hz)
+
+    def play(
+        self,
+        plan: FramePlan,
+        period: float | None,
+        on_done: Callable[[int | None], None],
+    ) -> None:
+        """
+        Have the agent play a frame plan (in duty ns), replacing any other.
+
+        on_done is called in the event loop with the duty cycle the plan left
+        when the agent reports its end, when the connection was lost while it
+        played or when it could not be sent; the duty cycle is None when it is
+        not known. A plan that is replaced or cancelled does not report it.
+        """
+        self._plays = play_id = (self._plays + 1) & 0xFFFFFFFF or 1
+        self._client.run(
+            self._async_play(play_id, encode_plan(play_id, plan, period), on_done)
+        )
+
+    async def _async_play(
+        self, play_id: int, payload: bytes, on_done: Callable[[int | None], None]
+    ) -> None:
+        """Send a plan, it plays from when it is sent on the current connection."""
+        client = self._client
+        try:
+            await client._async_ensure_connected()  # noqa: SLF001
+        except SysfsPwmError:
+            # Never sent, the output is the one before.
+            on_done(self._duty_ns if self._duty_ns >= 0 else None)
+            raise
+        self._play_id = play_id
+        self._on_play_done = on_done
+        # The agent writes the frames, so the cached duty cycle is unknown.
+        self._duty_ns = -1
+        await client._async_send(OP_PLAY, self._handle, payload)  # noqa: SLF001
+
+    def cancel_play(self) -> int:
+        """Stop the plan the agent plays, return the duty cycle it reached."""
+        self._play_id = 0
+        self._adopt(self._request(OP_CANCEL))
+        return self._duty_ns
+
+    def play_done(self, play_id: int, payload: bytes) -> None:
+        """Handle the end of a plan reported by the agent, in the event loop."""
+        if play_id != self._play_id or self._on_play_done is None:
+            return
+        self._play_id = 0
+        self._adopt(payload)
+        self._on_play_done(self._duty_ns)
+
+    def close(self) -> None:
+        """Close the channel, the output keeps its current state."""
+        if not self._open:
+            return
+        self._open = False
+        self._play_id = 0
+        self._on_lost_play = None
+        try:
+            self._request(OP_CLOSE)
+        except SysfsPwmError as err:
+            _LOGGER.debug("Error closing %s: %s", self.path, err)
+        self._client.forget(self._handle)
+
+
+class RemoteTransitionRunner:
+    """
+    Play a frame plan on the agent, the network carries only the plan.
+
+    The plan is handed to the writer, so it takes its place among the duty
+    cycle writes of the channel. While it plays, the output is estimated
+    from the plan and the time since the start.
+    """
+
+    def __init__(
+        self,
+        writer: PwmWriter,
+        plan: FramePlan,
+        on_done: Callable[[], None] | None = None,
+        period: float | None = None,
+    ) -> None:
+        """Initialize the runner, call start() to begin; repeat every period."""
+        self._writer = writer
+        self.plan = plan
+        self.period = period
+        self._on_done = on_done
+        self._initial = 0
+        self._start = 0.0
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        """Return if the plan is still playing."""
+        return self._running
+
+    @property
+    def duty_ns(self) -> int:
+        """Return the duty cycle the plan has reached by now."""
+        elapsed = time.monotonic() - self._start
+        if self.period:
+            elapsed %= self.period
+        index = bisect_right(self.plan.offsets, elapsed) - 1
+        if index < 0:
+            return self._initial
+        return int(self.plan.values[index])
+
+    def start(self) -> None:
+        """Start playing the plan now."""
+        self._initial = self._writer.duty_ns
+        self._start = time.monotonic()
+        self._running = True
+        if not len(self.plan):
+            self.finish()
+            return
+        self._writer.play_nowait(self)
+
+    def cancel(self) -> None:
+        """Stop playing, the output keeps the value it reached."""
+        if self._running:
+            self._running = False
+            self._writer.stop_play(self)
+
+    def finish(self) -> None:
+        """Report the end of the plan, in the event loop."""
+        if not self._running:
+            return
+        self._running = False
+        if self._on_done is not None:
+            self._on_done()
@@ -0,0 +1,155 @@
+"""Several PWM channels following one shared transition timeline."""
+
+from __future__ import annotations
+
+from array import array
+from functools import partial
+from typing import TYPE_CHECKING
+
+from .transition import EASING_LINEAR, EASINGS, FramePlan, TransitionRunner
+
+if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Callable
+
+    from .entity import RpiPwmEntity
+    from .remote import RemoteTransitionRunner
+    from .transition import ThreadedTransitionRunner
+
+
+def build_scene_plan(
+    curves: list[Callable[[float], int]],
+    duration: float,
+    frame_rate: float,
+    easing: str = EASING_LINEAR,
+) -> tuple[FramePlan, list[array]]:
+    """
+    Calculate the frames of all channels of a scene on one time grid.
+
+    Returns a plan whose values are row numbers, and per channel the duty
+    cycle in ns of every row. A row is only emitted when at least one channel
+    changes, so a row always has the outputs of all channels at that time.
+    """
+    plan = FramePlan()
+    rows = [array("q") for _ in curves]
+    frames = max(int(duration * frame_rate), 1)
+    ease = EASINGS.get(easing, EASINGS[EASING_LINEAR])
+    last = [curve(0.0) for curve in curves]
+    for frame in range(1, frames + 1):
+        progress = ease(frame / frames)
+        row = [curve(progress) for curve in curves]
+        if row != last or frame == frames:
+            plan.append(duration * frame / frames, float(len(plan)))
+            for values, value in zip(rows, row, strict=True):
+                values.append(value)
+            last = row
+    return plan, rows
+
+
+def channel_plan(plan: FramePlan, values: array) -> FramePlan:
+    """Return the frames of one channel of a scene plan, in duty cycle ns."""
+    channel = FramePlan()
+    for offset, row in zip(plan.offsets, plan.values, strict=True):
+        channel.append(offset, values[int(row)])
+    return channel
+
+
+class _Member:
+    """One channel of a running scene."""
+
+    __slots__ = ("entity", "last", "values")
+
+    def __init__(self, entity: RpiPwmEntity, values: array) -> None:
+        self.entity = entity
+        self.values = values
+        self.last: int | None = None
+
+
+class SceneRunner:
+    """
+    Play a scene plan, writing all channels back-to-back in each frame.
+
+    A channel leaves the scene as soon as anything else writes it, so a newer
+    command or scene always wins over the remaining frames. Channels on a
+    remote Pi get their own frames as one plan, which their agent plays on
+    the same timeline; a newer write replaces that plan in their writer.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        members: list[tuple[RpiPwmEntity, array]],
+        plan: FramePlan,
+        on_done: Callable[[SceneRunner], None] | None = None,
+    ) -> None:
+        """Initialize the runner, call start() to begin."""
+        self._members: dict[str, _Member] = {}
+        self._remote: dict[
+            str, TransitionRunner | ThreadedTransitionRunner | RemoteTransitionRunner
+        ] = {}
+        for entity, values in members:
+            if entity._is_remote:  # noqa: SLF001
+                # The agent of the channel plays its frames.
+                self._remote[entity.entity_id] = entity._create_frame_runner(  # noqa: SLF001
+                    channel_plan(plan, values),
+                    partial(self._remote_done, entity.entity_id),
+                )
+            else:
+                self._members[entity.entity_id] = _Member(entity, values)
+        self.entity_ids = (*self._members, *self._remote)
+        self._on_done = on_done
+        self._runner = TransitionRunner(loop, plan, self._write_frame, self._finish)
+
+    def start(self) -> None:
+        """Start playing the scene now."""
+        for runner in list(self._remote.values()):
+            runner.start()
+        self._runner.start()
+
+    def cancel(self) -> None:
+        """Stop the scene for all channels."""
+        for runner in self._remote.values():
+            runner.cancel()
+        self._remote.clear()
+        self._finish()
+
+    def remove(self, entity_id: str) -> None:
+        """Stop the scene for one channel."""
+        self._members.pop(entity_id, None)
+        if (runner := self._remote.pop(entity_id, None)) is not None:
+            runner.cancel()
+        if not self._members and not self._remote:
+            self._finish()
+
+    def _remote_done(self, entity_id: str) -> None:
+        """Forget a remote channel whose agent has played its frames."""
+        self._remote.pop(entity_id, None)
+
+    def _write_frame(self, row: float) -> None:
+        """Queue the values of one row on every channel writer."""
+        index = int(row)
+        for entity_id, member in list(self._members.items()):
+            entity = member.entity
+            duty_ns = entity._duty_ns  # noqa: SLF001
+            if member.last is not None and duty_ns != member.last:
+                del self._members[entity_id]
+                continue
+            value = member.values[index]
+            if value != duty_ns:
+                entity._write_duty_ns_nowait(value)  # noqa: SLF001
+            member.last = value
+        if not self._members and not self._remote:
+            self._finish()
+
+    def _finish(self) -> None:
+        """
+        End the scene once, when done or when no channel follows it.
+
+        Plans still playing on remote channels run to their end.
+        """
+        self._runner.cancel()
+        self._members.clear()
+        self._remote.clear()
+        if (on_done := self._on_done) is not None:
+            self._on_done = None
+            on_done(self)
@@ -0,0 +1,131 @@
+"""Diagnostic sensors with the runtime metrics of a PWM channel."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from homeassistant.components.sensor import (
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.const import CONF_NAME, EntityCategory, UnitOfTime
+from homeassistant.helpers.device_registry import DeviceInfo
+
+from .const import CONF_RPI_MODEL, DOMAIN
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from homeassistant.core import HomeAssistant
+    from homeassistant.helpers.entity_platform import AddConfigEntryEntitiesCallback
+    from homeassistant.helpers.typing import StateType
+
+    from . import RpiPwmConfigEntry
+    from .metrics import ChannelMetrics, Histogram
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+def _p95_ms(histogram: Histogram) -> float | None:
+    """Return the 95th percentile of a histogram in milliseconds."""
+    p95 = histogram.percentile(0.95)
+    return None if p95 is None else round(p95 * 1000, 3)
+
+
+@dataclass(frozen=True, kw_only=True)
+class RpiPwmMetricSensorEntityDescription(SensorEntityDescription):
+    """Describes a metric sensor of a PWM channel."""
+
+    value_fn: Callable[[ChannelMetrics], StateType]
+
+
+METRIC_SENSORS: tuple[RpiPwmMetricSensorEntityDescription, ...] = (
+    RpiPwmMetricSensorEntityDescription(
+        key="writes",
+        entity_registry_enabled_default=False,
+        name="hardware writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.writes,
+    ),
+    RpiPwmMetricSensorEntityDescription(
+        key="coalesced",
+        entity_registry_enabled_default=False,
+        name="coalesced writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.coalesced,
+    ),
+    RpiPwmMetricSensorEntityDescription(
+        key="suppressed",
+        entity_registry_enabled_default=False,
+        name="suppressed writes",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics: metrics.suppressed,
+    ),
+    RpiPwmMetricSensorEntityDescription(
+        key="write_latency",
+        entity_registry_enabled_default=False,
+        name="write latency p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: _p95_ms(metrics.write_latency),
+    ),
+    RpiPwmMetricSensorEntityDescription(
+        key="queue_delay",
+        entity_registry_enabled_default=False,
+        name="queue delay p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: _p95_ms(metrics.queue_delay),
+    ),
+    RpiPwmMetricSensorEntityDescription(
+        key="frame_jitter",
+        entity_registry_enabled_default=False,
+        name="frame jitter p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics: _p95_ms(metrics.frame_jitter),
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,  # noqa: ARG001
+    config_entry: RpiPwmConfigEntry,
+    async_add_entities: AddConfigEntryEntitiesCallback,
+) -> None:
+    """Set up the metric sensors of the PWM channel of a config entry."""
+    async_add_entities(
+        RpiPwmMetricSensor(config_entry, description) for description in METRIC_SENSORS
+    )
+
+
+class RpiPwmMetricSensor(SensorEntity):
+    """Diagnostic sensor showing one metric of a PWM channel."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    entity_description: RpiPwmMetricSensorEntityDescription
+
+    def __init__(
+        self,
+        config_entry: RpiPwmConfigEntry,
+        description: RpiPwmMetricSensorEntityDescription,
+    ) -> None:
+        """Initialize the metric sensor."""
+        self.entity_description = description
+        self._metrics = config_entry.runtime_data.metrics
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, "rpi_gpio")},
+            name=DOMAIN.upper(),
+            manufacturer="Raspberry Pi",
+            model=config_entry.data[CONF_RPI_MODEL],
+        )
+        self._attr_unique_id = f"{config_entry.unique_id}_{description.key}"
+        self._attr_name = f"{config_entry.data[CONF_NAME]} {description.name}"
+
+    @property
+    def native_value(self) -> StateType:
+        """Return the current value of the metric."""
+        return self.entity_description.value_fn(self._metrics)
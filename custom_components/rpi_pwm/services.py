@@ -0,0 +1,200 @@
+"""Services of the rpi_pwm integration."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+import voluptuous as vol
+from homeassistant.const import ATTR_ENTITY_ID
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+
+from .const import (
+    ATTR_EASING,
+    ATTR_FRAME_RATE,
+    ATTR_OUTPUTS,
+    ATTR_TRANSITION,
+    ATTR_VALUE,
+    CONST_FRAME_RATE_MAX,
+    CONST_FRAME_RATE_MIN,
+    DATA_ENTITIES,
+    DATA_SCENES,
+    DEFAULT_EASING,
+    DEFAULT_FRAME_RATE,
+    DOMAIN,
+    SERVICE_APPLY_SCENE,
+    SERVICE_SET_OUTPUTS,
+)
+from .scene import SceneRunner, build_scene_plan
+from .transition import EASINGS
+
+if TYPE_CHECKING:
+    from .entity import RpiPwmEntity
+
+OUTPUT_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Required(ATTR_VALUE): vol.Coerce(float),
+        vol.Optional(ATTR_TRANSITION): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    }
+)
+
+SET_OUTPUTS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_OUTPUTS): vol.All(
+            cv.ensure_list, [OUTPUT_SCHEMA], vol.Length(min=1)
+        ),
+    }
+)
+
+SCENE_OUTPUT_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Required(ATTR_VALUE): vol.Coerce(float),
+    }
+)
+
+APPLY_SCENE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_OUTPUTS): vol.All(
+            cv.ensure_list, [SCENE_OUTPUT_SCHEMA], vol.Length(min=1)
+        ),
+        vol.Optional(ATTR_TRANSITION, default=0): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(ATTR_FRAME_RATE, default=DEFAULT_FRAME_RATE): vol.All(
+            vol.Coerce(float),
+            vol.Range(min=CONST_FRAME_RATE_MIN, max=CONST_FRAME_RATE_MAX),
+        ),
+        vol.Optional(ATTR_EASING, default=DEFAULT_EASING): vol.In(list(EASINGS)),
+    }
+)
+
+
+def _resolve_outputs(
+    hass: HomeAssistant, outputs: list[dict]
+) -> list[tuple[RpiPwmEntity, float, float | None]]:
+    """Look up and validate all requested outputs before touching any of them."""
+    entities: dict[str, RpiPwmEntity] = hass.data.get(DOMAIN, {}).get(DATA_ENTITIES, {})
+    resolved = []
+    for output in outputs:
+        entity = entities.get(output[ATTR_ENTITY_ID])
+        if entity is None:
+            msg = f"{output[ATTR_ENTITY_ID]} is not a {DOMAIN} entity"
+            raise ServiceValidationError(msg)
+        transition = output.get(ATTR_TRANSITION)
+        if transition is not None and not entity.supports_output_transition:
+            msg = f"{entity.entity_id} does not support transitions"
+            raise ServiceValidationError(msg)
+        resolved.append((entity, output[ATTR_VALUE], transition))
+    return resolved
+
+
+async def _async_set_outputs(call: ServiceCall) -> ServiceResponse:
+    """Set the output of several PWM entities at once."""
+    start = time.perf_counter()
+    resolved = _resolve_outputs(call.hass, call.data[ATTR_OUTPUTS])
+
+    # Convert everything to duty cycles first, then queue all hardware writes
+    # back-to-back on the channel writers and wait for them together.
+    writes = []
+    for entity, value, transition in resolved:
+        duty_ns = entity.async_prepare_output(value, transition)
+        if duty_ns is not None:
+            writes.append(entity.async_write_duty_ns(duty_ns))
+    results = await asyncio.gather(*writes, return_exceptions=True)
+
+    # Publish each entity once, also when some of the writes failed.
+    published: set[str] = set()
+    for entity, _, _ in resolved:
+        if entity.entity_id not in published:
+            published.add(entity.entity_id)
+            entity.async_write_ha_state()
+
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+
+    return {
+        "outputs": len(resolved),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+async def _async_apply_scene(call: ServiceCall) -> ServiceResponse:
+    """Move several PWM entities to new values on one shared timeline."""
+    start = time.perf_counter()
+    hass = call.hass
+    resolved = _resolve_outputs(hass, call.data[ATTR_OUTPUTS])
+    entities = [entity for entity, _, _ in resolved]
+    if len({entity.entity_id for entity in entities}) != len(entities):
+        msg = "Each entity can only be used once in a scene"
+        raise ServiceValidationError(msg)
+
+    # A new scene takes its channels over from the scenes they were in.
+    scenes: dict[str, SceneRunner] = hass.data.setdefault(DOMAIN, {}).setdefault(
+        DATA_SCENES, {}
+    )
+    for entity in entities:
+        if (previous := scenes.pop(entity.entity_id, None)) is not None:
+            previous.remove(entity.entity_id)
+
+    curves = [entity.async_prepare_scene(value) for entity, value, _ in resolved]
+    plan, rows = build_scene_plan(
+        curves,
+        call.data[ATTR_TRANSITION],
+        call.data[ATTR_FRAME_RATE],
+        call.data[ATTR_EASING],
+    )
+    scene = SceneRunner(
+        hass.loop,
+        list(zip(entities, rows, strict=True)),
+        plan,
+        partial(_async_scene_done, scenes),
+    )
+    for entity_id in scene.entity_ids:
+        scenes[entity_id] = scene
+    scene.start()
+
+    for entity in entities:
+        entity.async_write_ha_state()
+
+    return {
+        "outputs": len(entities),
+        "frames": len(plan),
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def _async_scene_done(scenes: dict[str, SceneRunner], scene: SceneRunner) -> None:
+    """Forget a finished scene."""
+    for entity_id in scene.entity_ids:
+        if scenes.get(entity_id) is scene:
+            del scenes[entity_id]
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the rpi_pwm services."""
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_OUTPUTS,
+        _async_set_outputs,
+        schema=SET_OUTPUTS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_APPLY_SCENE,
+        _async_apply_scene,
+        schema=APPLY_SCENE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,217 @@
+"""Simulated sysfs PWM backend that records every write."""
+
+from __future__ import annotations
+
+import errno
+import threading
+import time
+from array import array
+from typing import Any
+
+from .sysfs import SYSFS_PWM_ROOT, SysfsPwmChannel, SysfsPwmError
+
+ATTR_EXPORT = 0
+ATTR_PERIOD = 1
+ATTR_DUTY_CYCLE = 2
+ATTR_ENABLE = 3
+
+ATTRIBUTE_NAMES = {
+    "export": ATTR_EXPORT,
+    "period": ATTR_PERIOD,
+    "duty_cycle": ATTR_DUTY_CYCLE,
+    "enable": ATTR_ENABLE,
+}
+
+DEFAULT_TIMELINE_SIZE = 65536
+SIMULATED_NPWM = 4
+
+
+def _channel_key(chip: int, channel: int) -> int:
+    """Pack a chip and channel number into one small integer."""
+    return chip << 8 | channel
+
+
+class WriteTimeline:
+    """
+    Ring buffer of the most recent sysfs writes.
+
+    Every write is stored in preallocated parallel arrays (monotonic time in
+    ns, channel, attribute and value), so recording never allocates objects.
+    """
+
+    def __init__(self, size: int = DEFAULT_TIMELINE_SIZE) -> None:
+        """Initialize an empty timeline that holds up to size writes."""
+        self._size = size
+        self._times = array("q", bytes(8 * size))
+        self._channels = array("H", bytes(2 * size))
+        self._attributes = array("B", bytes(size))
+        self._values = array("q", bytes(8 * size))
+        self._next = 0
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of writes held in the timeline."""
+        return min(self.total, self._size)
+
+    def record(self, chip: int, channel: int, attribute: int, value: int) -> None:
+        """Record one write."""
+        with self._lock:
+            index = self._next
+            self._times[index] = time.monotonic_ns()
+            self._channels[index] = _channel_key(chip, channel)
+            self._attributes[index] = attribute
+            self._values[index] = value
+            self._next = (index + 1) % self._size
+            self.total += 1
+
+    def clear(self) -> None:
+        """Forget all recorded writes."""
+        with self._lock:
+            self._next = 0
+            self.total = 0
+
+    def writes(
+        self,
+        chip: int | None = None,
+        channel: int | None = None,
+        attribute: int | None = None,
+    ) -> list[tuple[int, int, int, int, int]]:
+        """
+        Return recorded writes, oldest first, optionally filtered.
+
+        Each write is a tuple of (monotonic time in ns, chip, channel,
+        attribute, value).
+        """
+        with self._lock:
+            count = len(self)
+            first = (self._next - count) % self._size
+            result = []
+            for offset in range(count):
+                index = (first + offset) % self._size
+                key = self._channels[index]
+                if chip is not None and key >> 8 != chip:
+                    continue
+                if channel is not None and key & 0xFF != channel:
+                    continue
+                if attribute is not None and self._attributes[index] != attribute:
+                    continue
+                result.append(
+                    (
+                        self._times[index],
+                        key >> 8,
+                        key & 0xFF,
+                        self._attributes[index],
+                        self._values[index],
+                    )
+                )
+        return result
+
+    def summary(self) -> dict[str, Any]:
+        """Return write counts and duty cycle write rates per channel."""
+        channels: dict[str, dict[str, Any]] = {}
+        for stamp, chip, channel, attribute, _ in self.writes():
+            info = channels.setdefault(
+                f"pwmchip{chip}/pwm{channel}",
+                {"writes": 0, "duty_cycle_writes": 0, "first": stamp, "last": stamp},
+            )
+            info["writes"] += 1
+            info["last"] = stamp
+            if attribute == ATTR_DUTY_CYCLE:
+                info["duty_cycle_writes"] += 1
+        for info in channels.values():
+            span = (info.pop("last") - info.pop("first")) / 1e9
+            info["duty_cycle_writes_per_second"] = (
+                round(info["duty_cycle_writes"] / span, 1) if span > 0 else None
+            )
+        return {"total_writes": self.total, "channels": channels}
+
+
+class PwmSimulator:
+    """
+    In-memory model of /sys/class/pwm.
+
+    Holds the exported channels and their attribute values, and mimics the
+    kernel checks of the sysfs protocol, such as rejecting a duty cycle that
+    is longer than the period.
+    """
+
+    def __init__(self, timeline_size: int = DEFAULT_TIMELINE_SIZE) -> None:
+        """Initialize a simulator without exported channels."""
+        self.timeline = WriteTimeline(timeline_size)
+        self._channels: dict[tuple[int, int], list[int]] = {}
+        self._lock = threading.Lock()
+
+    def export(self, chip: int, channel: int) -> None:
+        """Export a channel, like writing to pwmchipN/export."""
+        if not 0 <= channel < SIMULATED_NPWM:
+            raise OSError(errno.EINVAL, "Invalid argument")
+        with self._lock:
+            self._channels.setdefault((chip, channel), [0, 0, 0, 0])
+        self.timeline.record(chip, channel, ATTR_EXPORT, channel)
+
+    def is_exported(self, chip: int, channel: int) -> bool:
+        """Return if a channel has been exported."""
+        return (chip, channel) in self._channels
+
+    def read(self, chip: int, channel: int, attribute: int) -> int:
+        """Return the current value of an attribute."""
+        return self._channels[(chip, channel)][attribute]
+
+    def write(self, chip: int, channel: int, attribute: int, value: int) -> None:
+        """Write an attribute, like the kernel would accept or refuse it."""
+        with self._lock:
+            state = self._channels[(chip, channel)]
+            if value < 0 or (
+                (attribute == ATTR_DUTY_CYCLE and value > state[ATTR_PERIOD])
+                or (attribute == ATTR_PERIOD and value < state[ATTR_DUTY_CYCLE])
+            ):
+                raise OSError(errno.EINVAL, "Invalid argument")
+            state[attribute] = value
+        self.timeline.record(chip, channel, attribute, value)
+
+
+class SimulatedPwmChannel(SysfsPwmChannel):
+    """A SysfsPwmChannel that talks to a PwmSimulator instead of sysfs."""
+
+    def __init__(
+        self,
+        simulator: PwmSimulator,
+        channel: int,
+        hz: float,
+        chip: int = 0,
+    ) -> None:
+        """Initialize the simulated channel, call open() before use."""
+        super().__init__(channel=channel, hz=hz, chip=chip, root=SYSFS_PWM_ROOT)
+        self._simulator = simulator
+        self._chip = chip
+
+    def _chip_exists(self) -> bool:
+        return True
+
+    def _is_exported(self) -> bool:
+        return self._simulator.is_exported(self._chip, self._channel)
+
+    def _export(self) -> None:
+        try:
+            self._simulator.export(self._chip, self._channel)
+        except OSError as err:
+            msg = f"Could not export PWM channel {self._pwm_path}: {err}"
+            raise SysfsPwmError(msg) from err
+
+    def _open_attribute(self, name: str) -> int:
+        # The attribute number doubles as file descriptor.
+        return ATTRIBUTE_NAMES[name]
+
+    def _read(self, fd: int) -> int:
+        return self._simulator.read(self._chip, self._channel, fd)
+
+    def _write(self, fd: int, value: int) -> None:
+        try:
+            self._simulator.write(self._chip, self._channel, fd, value)
+        except OSError as err:
+            msg = f"Could not write {value} to {self._pwm_path}: {err}"
+            raise SysfsPwmError(msg) from err
+
+    def _close_attribute(self, fd: int) -> None:
+        pass
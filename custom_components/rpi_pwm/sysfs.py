@@ -0,0 +1,316 @@
+"""Sysfs PWM backend that keeps the channel attribute files open."""
+
+from __future__ import annotations
+
+import logging
+import os
+import stat
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+_LOGGER = logging.getLogger(__name__)
+
+SYSFS_PWM_ROOT = Path("/sys/class/pwm")
+
+NS_PER_SECOND = 1_000_000_000
+EXPORT_TIMEOUT = 5.0  # Seconds to wait for udev to release a new channel
+EXPORT_POLL_INTERVAL = 0.01
+
+
+class SysfsPwmError(Exception):
+    """Error raised when a sysfs PWM channel can not be opened or written."""
+
+
+def _encode(value: int) -> bytes:
+    """Encode an integer the way sysfs attributes expect it."""
+    return b"%d\n" % value
+
+
+class SysfsPwmChannel:
+    """
+    One exported PWM channel with persistent file descriptors.
+
+    The channel is exported once in open(), which adopts the period and duty
+    cycle the hardware already has; afterwards every update is a single
+    os.pwrite() of a pre-encoded integer on an already open file descriptor.
+    """
+
+    def __init__(
+        self,
+        channel: int,
+        hz: float,
+        chip: int = 0,
+        root: Path = SYSFS_PWM_ROOT,
+    ) -> None:
+        """Initialize the channel, call open() before use."""
+        self._chip_path = root / f"pwmchip{chip}"
+        self._pwm_path = self._chip_path / f"pwm{channel}"
+        self._channel = channel
+        self._hz = float(hz)
+        self._period_ns = self._hz_to_ns(self._hz)
+        self._duty_cycle = 0.0
+        self._duty_ns = 0
+        self._fd_period = -1
+        self._fd_duty = -1
+        self._fd_enable = -1
+        self._truncate = False
+        self._enabled = False
+
+    @property
+    def path(self) -> Path:
+        """Return the sysfs directory of this channel."""
+        return self._pwm_path
+
+    @property
+    def frequency(self) -> float:
+        """Return the PWM frequency in Hz."""
+        return self._hz
+
+    @property
+    def period_ns(self) -> int:
+        """Return the PWM period in nanoseconds."""
+        return self._period_ns
+
+    @property
+    def duty_cycle(self) -> float:
+        """Return the last written duty cycle in percent."""
+        return self._duty_cycle
+
+    @property
+    def duty_ns(self) -> int:
+        """Return the last written duty cycle in nanoseconds."""
+        return self._duty_ns
+
+    @property
+    def is_enabled(self) -> bool:
+        """Return if the output is enabled."""
+        return self._enabled
+
+    @property
+    def is_open(self) -> bool:
+        """Return if the file descriptors of the channel are open."""
+        return self._fd_duty >= 0
+
+    @staticmethod
+    def _hz_to_ns(hz: float) -> int:
+        """Convert a frequency to a period in nanoseconds."""
+        if hz <= 0:
+            msg = f"Invalid PWM frequency: {hz}"
+            raise SysfsPwmError(msg)
+        return int(NS_PER_SECOND / hz)
+
+    def open(self, timeout: float = EXPORT_TIMEOUT) -> None:
+        """Export the channel if needed and open its attribute files."""
+        error = open_channels([self], timeout)[0]
+        if error is not None:
+            raise error
+
+    def export(self) -> None:
+        """Export the channel, unless it has been exported already."""
+        if not self._chip_exists():
+            msg = (
+                f"{self._chip_path} does not exist, is the PWM overlay enabled"
+                " in /boot/config.txt?"
+            )
+            raise SysfsPwmError(msg)
+        if not self._is_exported():
+            self._export()
+
+    def _chip_exists(self) -> bool:
+        """Return if the pwmchip directory exists."""
+        return self._chip_path.is_dir()
+
+    def _is_exported(self) -> bool:
+        """Return if the channel has been exported already."""
+        return self._pwm_path.is_dir()
+
+    def _export(self) -> None:
+        """Ask the kernel to create the pwmN directory for the channel."""
+        try:
+            (self._chip_path / "export").write_bytes(_encode(self._channel))
+        except OSError as err:
+            msg = f"Could not export PWM channel {self._pwm_path}: {err}"
+            raise SysfsPwmError(msg) from err
+
+    def _try_open(self) -> OSError | None:
+        """
+        Open the attribute files that are not open yet, without waiting.
+
+        Right after an export the files exist but are still owned by root.
+        Returns the error while udev has not granted access yet, else None.
+        """
+        try:
+            if self._fd_duty < 0:
+                self._fd_duty = self._open_attribute("duty_cycle")
+            if self._fd_period < 0:
+                self._fd_period = self._open_attribute("period")
+            if self._fd_enable < 0:
+                self._fd_enable = self._open_attribute("enable")
+        except (PermissionError, FileNotFoundError) as err:
+            return err
+        return None
+
+    def _open_attribute(self, name: str) -> int:
+        """Open one attribute file for reading and writing."""
+        fd = os.open(self._pwm_path / name, os.O_RDWR | os.O_CLOEXEC)
+        # A fake tree of regular files keeps the tail of a longer value,
+        # unlike sysfs attributes, so writes to it are truncated.
+        self._truncate = stat.S_ISREG(os.fstat(fd).st_mode)
+        return fd
+
+    def _adopt(self) -> None:
+        """
+        Take over the output state a freshly opened channel already has.
+
+        A channel that is still running from before a restart keeps its duty
+        cycle; only a differing period (such as 0 after a new export) is
+        programmed.
+        """
+        period_ns = self._read(self._fd_period)
+        duty_ns = self._read(self._fd_duty)
+        self._enabled = self._read(self._fd_enable) == 1
+        if period_ns != self._period_ns:
+            if duty_ns > self._period_ns:
+                # The kernel refuses a period shorter than the active duty
+                # cycle, so clear the duty cycle before programming the period.
+                self._write(self._fd_duty, 0)
+                duty_ns = 0
+            self._write(self._fd_period, self._period_ns)
+        self._duty_ns = duty_ns
+        self._duty_cycle = duty_ns * 100 / self._period_ns
+
+    def _read(self, fd: int) -> int:
+        """Read one integer from an open attribute file."""
+        try:
+            return int(os.pread(fd, 32, 0))
+        except (OSError, ValueError) as err:
+            msg = f"Could not read {self._pwm_path}: {err}"
+            raise SysfsPwmError(msg) from err
+
+    def _write(self, fd: int, value: int) -> None:
+        """Write one integer to an open attribute file."""
+        data = _encode(value)
+        try:
+            os.pwrite(fd, data, 0)
+            if self._truncate:
+                os.ftruncate(fd, len(data))
+        except OSError as err:
+            msg = f"Could not write {value} to {self._pwm_path}: {err}"
+            raise SysfsPwmError(msg) from err
+
+    def start(self, duty_ns: int | None = None) -> None:
+        """
+        Set the duty cycle in nanoseconds and enable the output.
+
+        Nothing is written when the channel already outputs this duty cycle,
+        so adopting a running channel does not make it flicker. Without a duty
+        cycle the adopted one is kept.
+        """
+        if duty_ns is not None:
+            self.change_duty_ns(duty_ns)
+        if not self._enabled:
+            self._write(self._fd_enable, 1)
+            self._enabled = True
+
+    def stop(self) -> None:
+        """Clear the duty cycle and disable the output."""
+        self.change_duty_ns(0)
+        self._write(self._fd_enable, 0)
+        self._enabled = False
+
+    def change_duty_cycle(self, duty_cycle: float) -> bool:
+        """Change the duty cycle, given in percent (0..100)."""
+        if not 0 <= duty_cycle <= 100:  # noqa: PLR2004
+            msg = f"Duty cycle must be between 0 and 100, got {duty_cycle}"
+            raise SysfsPwmError(msg)
+        return self.change_duty_ns(int(self._period_ns * duty_cycle / 100))
+
+    def change_duty_ns(self, duty_ns: int) -> bool:
+        """
+        Change the duty cycle, given in nanoseconds (0..period).
+
+        The last written value is cached: writing it again does not reach
+        sysfs. Returns if the hardware was written.
+        """
+        if duty_ns == self._duty_ns:
+            return False
+        if not 0 <= duty_ns <= self._period_ns:
+            msg = f"Duty cycle must be between 0 and {self._period_ns}ns, got {duty_ns}"
+            raise SysfsPwmError(msg)
+        self._write(self._fd_duty, duty_ns)
+        self._duty_ns = duty_ns
+        self._duty_cycle = duty_ns * 100 / self._period_ns
+        return True
+
+    def change_frequency(self, hz: float) -> None:
+        """Change the frequency while keeping the relative duty cycle."""
+        period_ns = self._hz_to_ns(hz)
+        duty_ns = int(period_ns * self._duty_cycle / 100)
+        if period_ns < self._period_ns:
+            # Shrinking: the duty cycle has to fit in the new period first.
+            self._write(self._fd_duty, duty_ns)
+            self._write(self._fd_period, period_ns)
+        else:
+            self._write(self._fd_period, period_ns)
+            self._write(self._fd_duty, duty_ns)
+        self._hz = float(hz)
+        self._period_ns = period_ns
+        self._duty_ns = duty_ns
+
+    def close(self) -> None:
+        """Close the file descriptors, the output keeps its current state."""
+        for fd in (self._fd_duty, self._fd_period, self._fd_enable):
+            if fd >= 0:
+                self._close_attribute(fd)
+        self._fd_duty = self._fd_period = self._fd_enable = -1
+
+    def _close_attribute(self, fd: int) -> None:
+        """Close one attribute file."""
+        try:
+            os.close(fd)
+        except OSError as err:
+            _LOGGER.debug("Error closing %s: %s", self._pwm_path, err)
+
+
+def open_channels(
+    channels: Sequence[SysfsPwmChannel], timeout: float = EXPORT_TIMEOUT
+) -> list[SysfsPwmError | None]:
+    """
+    Export and open several channels, waiting for udev only once.
+
+    All channels are exported first, so udev handles the new pwmN directories
+    in parallel; a single bounded poll then waits until every channel is
+    accessible. Returns one error (or None) per channel, in order.
+    """
+    errors: list[SysfsPwmError | None] = [None] * len(channels)
+    pending: dict[int, SysfsPwmChannel] = {}
+    for index, channel in enumerate(channels):
+        try:
+            channel.export()
+        except SysfsPwmError as err:
+            errors[index] = err
+        else:
+            pending[index] = channel
+
+    deadline = time.monotonic() + timeout
+    while pending:
+        for index, channel in list(pending.items()):
+            if (err := channel._try_open()) is None:  # noqa: SLF001
+                del pending[index]
+                try:
+                    channel._adopt()  # noqa: SLF001
+                except SysfsPwmError as adopt_err:
+                    channel.close()
+                    errors[index] = adopt_err
+            elif time.monotonic() >= deadline:
+                del pending[index]
+                channel.close()
+                msg = f"Timeout waiting for access to {channel.path}: {err}"
+                errors[index] = SysfsPwmError(msg)
+        if pending:
+            time.sleep(EXPORT_POLL_INTERVAL)
+    return errors
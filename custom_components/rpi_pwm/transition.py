@@ -0,0 +1,422 @@
+"""Monotonic-clock transition engine with precomputed frame plans."""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+    from collections.abc import Callable
+
+    from .metrics import Histogram
+
+EASING_LINEAR = "linear"
+EASING_EASE_IN = "ease_in"
+EASING_EASE_OUT = "ease_out"
+EASING_EASE_IN_OUT = "ease_in_out"
+
+
+def _linear(t: float) -> float:
+    return t
+
+
+def _ease_in(t: float) -> float:
+    return t * t
+
+
+def _ease_out(t: float) -> float:
+    return t * (2.0 - t)
+
+
+def _ease_in_out(t: float) -> float:
+    return 0.5 - 0.5 * math.cos(math.pi * t)
+
+
+EASINGS: dict[str, Callable[[float], float]] = {
+    EASING_LINEAR: _linear,
+    EASING_EASE_IN: _ease_in,
+    EASING_EASE_OUT: _ease_out,
+    EASING_EASE_IN_OUT: _ease_in_out,
+}
+
+
+class FramePlan:
+    """
+    Precomputed frames of one transition.
+
+    offsets holds the time of each frame in seconds relative to the start of
+    the transition, values the output at that time. Consecutive frames always
+    have a different value.
+    """
+
+    __slots__ = ("offsets", "values")
+
+    def __init__(self) -> None:
+        """Initialize an empty plan."""
+        self.offsets = array("d")
+        self.values = array("d")
+
+    def __len__(self) -> int:
+        """Return the number of frames."""
+        return len(self.values)
+
+    def append(self, offset: float, value: float) -> None:
+        """Add a frame, unless it repeats the value of the previous frame."""
+        if self.values and self.values[-1] == value:
+            return
+        self.offsets.append(offset)
+        self.values.append(value)
+
+
+def build_frame_plan(  # noqa: PLR0913
+    start: float,
+    end: float,
+    duration: float,
+    frame_rate: float,
+    easing: str = EASING_LINEAR,
+    quantize: Callable[[float], float] = round,
+) -> FramePlan:
+    """
+    Calculate the frames to go from start to end in duration seconds.
+
+    Frames are laid on a fixed grid of frame_rate frames per second, and only
+    emitted when the quantized output differs from the previous frame.
+    """
+    plan = FramePlan()
+    frames = int(duration * frame_rate)
+    if frames <= 1:
+        plan.append(max(duration, 0.0), quantize(end))
+        return plan
+
+    ease = EASINGS.get(easing, _linear)
+    last = quantize(start)
+    delta = end - start
+    for frame in range(1, frames + 1):
+        value = quantize(start + delta * ease(frame / frames))
+        if value != last:
+            plan.append(frame / frame_rate, value)
+            last = value
+    # Land exactly on the end value, also when rounding kept it out of reach.
+    if not plan.values or plan.values[-1] != quantize(end):
+        plan.append(duration, quantize(end))
+    return plan
+
+
+def _next_period(start: float, period: float, now: float) -> float:
+    """Return the start of the next repetition, skipping the ones missed."""
+    start += period
+    if now - start > period:
+        start += (now - start) // period * period
+    return start
+
+
+class TransitionRunner:
+    """
+    Play a frame plan on the event loop.
+
+    Frames are scheduled on absolute deadlines of the monotonic loop clock, so
+    a late frame does not shift the ones after it. When the loop is behind,
+    overdue frames are skipped and only the most recent one is written. With
+    a period, the plan is played again and again, like a waveform.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        loop: asyncio.AbstractEventLoop,
+        plan: FramePlan,
+        write: Callable[[float], None],
+        on_done: Callable[[], None] | None = None,
+        jitter: Histogram | None = None,
+        period: float | None = None,
+    ) -> None:
+        """Initialize the runner, call start() to begin; repeat every period."""
+        self._loop = loop
+        self._plan = plan
+        self._write = write
+        self._on_done = on_done
+        self._jitter = jitter
+        self._period = period
+        self._index = 0
+        self._start = 0.0
+        self._handle: asyncio.TimerHandle | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return if frames are still scheduled."""
+        return self._handle is not None
+
+    def start(self) -> None:
+        """Start playing the plan now."""
+        self._start = self._loop.time()
+        self._index = 0
+        self._schedule()
+
+    def cancel(self) -> None:
+        """Stop playing, the output keeps the last written value."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self) -> None:
+        """Schedule the next frame, or finish."""
+        if self._index >= len(self._plan) and self._period and len(self._plan):
+            self._start = _next_period(self._start, self._period, self._loop.time())
+            self._index = 0
+        if self._index >= len(self._plan):
+            self._handle = None
+            if self._on_done is not None:
+                self._on_done()
+            return
+        self._handle = self._loop.call_at(
+            self._start + self._plan.offsets[self._index], self._step
+        )
+
+    def _step(self) -> None:
+        """Write the most recent frame that is due."""
+        offsets = self._plan.offsets
+        elapsed = self._loop.time() - self._start
+        index = self._index
+        if self._jitter is not None:
+            self._jitter.record(elapsed - offsets[index])
+        last = len(offsets) - 1
+        while index < last and offsets[index + 1] <= elapsed:
+            index += 1
+        self._write(self._plan.values[index])
+        if self._handle is None:
+            # The write callback cancelled the transition.
+            return
+        self._index = index + 1
+        self._schedule()
+
+
+class FrameClock:
+    """
+    One background thread playing the frame plans of threaded transitions.
+
+    The thread sleeps until the earliest frame deadline of all active
+    transitions on the monotonic clock, so frames are written on time however
+    busy the event loop is. New transitions wake it up early.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Initialize the clock, its thread starts with the first transition."""
+        self.loop = loop
+        self._cond = threading.Condition()
+        self._deadlines: list[tuple[float, int, ThreadedTransitionRunner]] = []
+        self._sequence = itertools.count()
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+
+    def schedule(self, runner: ThreadedTransitionRunner, deadline: float) -> None:
+        """Play the next frame of runner at a time.monotonic() deadline."""
+        with self._cond:
+            heapq.heappush(self._deadlines, (deadline, next(self._sequence), runner))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="rpi_pwm frame clock", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self, runner: ThreadedTransitionRunner) -> None:
+        """Stop a runner; once this returns, it writes no further frames."""
+        with self._cond:
+            runner.cancelled = True
+
+    def stop(self) -> None:
+        """Stop the thread, without waiting for it."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def _run(self) -> None:
+        """Thread main loop: play every frame when it is due."""
+        deadlines = self._deadlines
+        with self._cond:
+            while not self._stopping:
+                if not deadlines:
+                    self._cond.wait()
+                    continue
+                timeout = deadlines[0][0] - time.monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                _, _, runner = heapq.heappop(deadlines)
+                if runner.cancelled:
+                    continue
+                # Frames are written with the lock held, so a cancelled
+                # transition can never overwrite a newer value.
+                deadline = runner.step(time.monotonic())
+                if deadline is not None:
+                    heapq.heappush(deadlines, (deadline, next(self._sequence), runner))
+
+
+class ThreadedTransitionRunner:
+    """
+    Play a frame plan on the FrameClock thread instead of the event loop.
+
+    write is called from the clock thread and must be thread safe. Only the
+    end of the transition is posted back to the loop, to call on_done.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        clock: FrameClock,
+        plan: FramePlan,
+        write: Callable[[float], None],
+        on_done: Callable[[], None] | None = None,
+        jitter: Histogram | None = None,
+        period: float | None = None,
+    ) -> None:
+        """Initialize the runner, call start() to begin; repeat every period."""
+        self._clock = clock
+        self._plan = plan
+        self._write = write
+        self._on_done = on_done
+        self._jitter = jitter
+        self._period = period
+        self._index = 0
+        self._start = 0.0
+        self._done = False
+        self.cancelled = False
+
+    @property
+    def running(self) -> bool:
+        """Return if frames are still scheduled."""
+        return not self._done and not self.cancelled
+
+    def start(self) -> None:
+        """Start playing the plan now."""
+        self._start = time.monotonic()
+        self._index = 0
+        if not len(self._plan):
+            self._finish()
+            return
+        self._clock.schedule(self, self._start + self._plan.offsets[0])
+
+    def cancel(self) -> None:
+        """Stop playing, the output keeps the last written value."""
+        self._clock.cancel(self)
+
+    def step(self, now: float) -> float | None:
+        """Write the most recent due frame, return the next deadline if any."""
+        offsets = self._plan.offsets
+        elapsed = now - self._start
+        index = self._index
+        if self._jitter is not None:
+            self._jitter.record(elapsed - offsets[index])
+        last = len(offsets) - 1
+        while index < last and offsets[index + 1] <= elapsed:
+            index += 1
+        self._write(self._plan.values[index])
+        self._index = index + 1
+        if self._index >= len(offsets) and self._period:
+            self._start = _next_period(self._start, self._period, now)
+            self._index = 0
+        if self._index < len(offsets):
+            return self._start + offsets[self._index]
+        self._clock.loop.call_soon_threadsafe(self._finish)
+        return None
+
+    def _finish(self) -> None:
+        """Report the end of the plan, in the event loop."""
+        if self.cancelled:
+            return
+        self._done = True
+        if self._on_done is not None:
+            self._on_done()
+
+
+class SlewRateLimiter:
+    """
+    Move a value toward a target at a maximum rate, on the event loop.
+
+    Steps are scheduled on absolute deadlines at a fixed frame rate; each step
+    covers the time since the previous one, so a late step catches up instead
+    of slowing the ramp down. A new target takes effect from the position the
+    ramp has reached, without restarting it.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        write: Callable[[float], None],
+        jitter: Histogram | None = None,
+    ) -> None:
+        """Initialize an idle limiter."""
+        self._loop = loop
+        self._write = write
+        self._jitter = jitter
+        self._rate = 0.0
+        self._interval = 0.0
+        self._position = 0.0
+        self._target = 0.0
+        self._last = 0.0
+        self._deadline = 0.0
+        self._handle: asyncio.TimerHandle | None = None
+
+    @property
+    def running(self) -> bool:
+        """Return if the value is still moving."""
+        return self._handle is not None
+
+    def move_to(
+        self, target: float, position: float, rate: float, frame_rate: float
+    ) -> None:
+        """
+        Ramp to target at rate units per second, in frame_rate steps a second.
+
+        The position is where an idle limiter starts from; a running one keeps
+        its own position and only takes over the new target and rate.
+        """
+        self._target = target
+        self._rate = rate
+        self._interval = 1 / frame_rate
+        if self._handle is not None:
+            return
+        if position == target:
+            return
+        self._position = position
+        self._last = self._deadline = self._loop.time()
+        self._schedule()
+
+    def cancel(self) -> None:
+        """Stop moving, the output keeps the last written value."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self) -> None:
+        """Schedule the next step on the next deadline that is still ahead."""
+        now = self._loop.time()
+        self._deadline += self._interval
+        if self._deadline < now:
+            self._deadline = now + self._interval
+        self._handle = self._loop.call_at(self._deadline, self._step)
+
+    def _step(self) -> None:
+        """Move as far as the rate allows since the previous step."""
+        now = self._loop.time()
+        if self._jitter is not None:
+            self._jitter.record(now - self._deadline)
+        step = self._rate * (now - self._last)
+        self._last = now
+        delta = self._target - self._position
+        if abs(delta) <= step:
+            self._position = self._target
+        else:
+            self._position += math.copysign(step, delta)
+        self._write(self._position)
+        if self._handle is None:
+            # The write callback cancelled the ramp.
+            return
+        if self._position == self._target:
+            self._handle = None
+            return
+        self._schedule()
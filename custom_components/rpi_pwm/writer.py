@@ -0,0 +1,297 @@
+"""Single-writer, latest-wins command queue for one PWM channel."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from functools import partial
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from .metrics import ChannelMetrics
+    from .remote import RemotePwmChannel, RemoteTransitionRunner
+    from .sysfs import SysfsPwmChannel
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PwmWriter:
+    """
+    Dedicated writer thread for one PWM channel.
+
+    Only one duty cycle is pending at any time: a new request replaces the
+    pending one (which is counted as coalesced), so the hardware always ends up
+    at the last requested value and writes can never complete out of order.
+    Until the channel is open and start() is called, requests are only
+    buffered this way. Frame plans that a remote channel plays itself take
+    their place in the same queue.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        name: str,
+        metrics: ChannelMetrics,
+        duty_ns: int | None = None,
+    ) -> None:
+        """Initialize the writer with the duty cycle to start the channel at."""
+        self._loop = loop
+        self._pwm: SysfsPwmChannel | None = None
+        self._name = name
+        self._cond = threading.Condition()
+        self._pending: int | None = None
+        self._pending_frequency: float | None = None
+        self._pending_play: RemoteTransitionRunner | None = None
+        self._pending_cancel = False
+        self._play: RemoteTransitionRunner | None = None
+        self._frequency_waiters: list[asyncio.Future[None]] = []
+        self._queued_at = 0.0
+        self._waiters: list[asyncio.Future[None]] = []
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+        self._duty_ns = duty_ns
+        self.metrics = metrics
+        self.last_error: Exception | None = None
+
+    @property
+    def duty_ns(self) -> int:
+        """Return the last requested duty cycle, or the one a plan has reached."""
+        if self._play is not None:
+            return self._play.duty_ns
+        return self._duty_ns or 0
+
+    @property
+    def requested_duty_ns(self) -> int | None:
+        """Return the last requested duty cycle, None when nothing is known."""
+        return self._duty_ns
+
+    @property
+    def ready(self) -> bool:
+        """Return if the channel is open and writes reach the hardware."""
+        return self._pwm is not None
+
+    def start(self, pwm: SysfsPwmChannel) -> None:
+        """Start writing to an open channel, beginning with buffered requests."""
+        with self._cond:
+            self._pwm = pwm
+            if self._duty_ns is None:
+                self._duty_ns = pwm.duty_ns
+        self._thread = threading.Thread(
+            target=self._run, name=f"rpi_pwm writer {self._name}", daemon=True
+        )
+        self._thread.start()
+
+    async def async_stop(self) -> None:
+        """Write the pending value and stop the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            await self._loop.run_in_executor(None, self._thread.join)
+            self._thread = None
+
+    def write_nowait(self, duty_ns: float) -> None:
+        """Queue a duty cycle in ns without waiting, errors are only logged."""
+        self._queue(int(duty_ns), None)
+
+    async def async_write(self, duty_ns: int) -> None:
+        """
+        Queue a duty cycle in ns and wait until it (or a newer one) is written.
+
+        Before the channel is open the request is only buffered.
+        """
+        if self._pwm is None:
+            self._queue(int(duty_ns), None)
+            return
+        waiter = self._loop.create_future()
+        self._queue(int(duty_ns), waiter)
+        await waiter
+
+    async def async_change_frequency(self, frequency: float) -> None:
+        """Change the frequency ahead of any pending duty cycle and wait."""
+        waiter = self._loop.create_future()
+        with self._cond:
+            self._pending_frequency = frequency
+            self._frequency_waiters.append(waiter)
+            self._cond.notify()
+        await waiter
+
+    def play_nowait(self, play: RemoteTransitionRunner) -> None:
+        """Have the remote channel play a frame plan, replacing pending writes."""
+        with self._cond:
+            if self._pending is None and self._pending_play is None:
+                self._queued_at = time.perf_counter()
+            else:
+                self.metrics.coalesced += 1
+            # Waiters of a replaced duty cycle are resolved once it is sent.
+            self._pending = None
+            self._pending_play = self._play = play
+            self._pending_cancel = False
+            self._cond.notify()
+
+    def stop_play(self, play: RemoteTransitionRunner) -> None:
+        """Stop a plan, the duty cycle is the one it has reached."""
+        with self._cond:
+            if self._play is not play:
+                return
+            self._duty_ns = play.duty_ns
+            self._play = None
+            if self._pending_play is play:
+                # It never reached the channel.
+                self._pending_play = None
+            else:
+                self._pending_cancel = True
+                self._cond.notify()
+
+    def _play_done(self, play: RemoteTransitionRunner, duty_ns: int | None) -> None:
+        """
+        Handle the end of a plan the channel played or lost, in the loop.
+
+        duty_ns is the output the plan left, None when it is not known; the
+        output is then estimated from the plan.
+        """
+        with self._cond:
+            if self._play is not play:
+                return
+            self._duty_ns = play.duty_ns if duty_ns is None else duty_ns
+            self._play = None
+        play.finish()
+
+    def _queue(self, duty_ns: int, waiter: asyncio.Future[None] | None) -> None:
+        """Replace the pending duty cycle, thread safe."""
+        with self._cond:
+            if self._pending is None and self._pending_play is None:
+                self._queued_at = time.perf_counter()
+            else:
+                self.metrics.coalesced += 1
+            self._pending = duty_ns
+            self._duty_ns = duty_ns
+            # Writing a duty cycle also stops a plan the channel plays.
+            self._play = self._pending_play = None
+            self._pending_cancel = False
+            if waiter is not None:
+                self._waiters.append(waiter)
+            self._cond.notify()
+
+    def _run(self) -> None:
+        """Thread main loop: write the most recent pending values."""
+        pwm = self._pwm
+        if pwm is None:
+            return
+        while True:
+            with self._cond:
+                while not self._has_work() and not self._stopping:
+                    self._cond.wait()
+                if not self._has_work():
+                    return
+                frequency = self._pending_frequency
+                frequency_waiters = self._frequency_waiters
+                duty_ns = self._pending
+                play = self._pending_play
+                cancel = self._pending_cancel
+                waiters = self._waiters
+                queued_at = self._queued_at
+                self._pending = self._pending_frequency = self._pending_play = None
+                self._pending_cancel = False
+                self._waiters = []
+                self._frequency_waiters = []
+            if frequency is not None:
+                error = None
+                try:
+                    pwm.change_frequency(frequency)
+                except Exception as err:  # noqa: BLE001
+                    error = err
+                with self._cond:
+                    if self._pending is None:
+                        # The duty cycle in ns follows the new period.
+                        self._duty_ns = pwm.duty_ns
+                self._loop.call_soon_threadsafe(self._resolve, frequency_waiters, error)
+            if duty_ns is not None:
+                self._write(pwm, duty_ns, waiters, queued_at)
+            elif play is not None:
+                self._send_play(pwm, play, waiters)  # type: ignore[arg-type]
+            elif cancel:
+                self._cancel_play(pwm)  # type: ignore[arg-type]
+
+    def _has_work(self) -> bool:
+        """Return if anything is pending, with the lock held."""
+        return (
+            self._pending is not None
+            or self._pending_frequency is not None
+            or self._pending_play is not None
+            or self._pending_cancel
+        )
+
+    def _send_play(
+        self,
+        pwm: RemotePwmChannel,
+        play: RemoteTransitionRunner,
+        waiters: list[asyncio.Future[None]],
+    ) -> None:
+        """Hand a plan to the channel, in the writer thread."""
+        error: Exception | None = None
+        try:
+            pwm.play(play.plan, play.period, partial(self._play_done, play))
+        except Exception as err:  # noqa: BLE001
+            error = err
+            self.metrics.errors += 1
+        else:
+            self.metrics.writes += 1
+        self._loop.call_soon_threadsafe(self._resolve, waiters, error)
+
+    def _cancel_play(self, pwm: RemotePwmChannel) -> None:
+        """Stop the plan the channel plays, in the writer thread."""
+        try:
+            duty_ns = pwm.cancel_play()
+        except Exception as err:  # noqa: BLE001
+            self._loop.call_soon_threadsafe(self._resolve, [], err)
+            return
+        with self._cond:
+            if self._pending is None and self._play is None:
+                self._duty_ns = duty_ns
+
+    def _write(
+        self,
+        pwm: SysfsPwmChannel,
+        duty_ns: int,
+        waiters: list[asyncio.Future[None]],
+        queued_at: float,
+    ) -> None:
+        """Write one duty cycle and report the result, in the writer thread."""
+        metrics = self.metrics
+        start = time.perf_counter()
+        metrics.queue_delay.record(start - queued_at)
+        error: Exception | None = None
+        try:
+            written = pwm.change_duty_ns(duty_ns)
+        except Exception as err:  # noqa: BLE001
+            error = err
+            metrics.errors += 1
+        else:
+            if written:
+                metrics.writes += 1
+            else:
+                metrics.suppressed += 1
+        metrics.write_latency.record(time.perf_counter() - start)
+        self._loop.call_soon_threadsafe(self._resolve, waiters, error)
+
+    def _resolve(
+        self, waiters: list[asyncio.Future[None]], error: Exception | None
+    ) -> None:
+        """Report the result of a write to the waiting callers, in the loop."""
+        if error is None:
+            self.last_error = None
+        else:
+            if not waiters and self.last_error is None:
+                _LOGGER.error("Writing to PWM %s failed: %s", self._name, error)
+            self.last_error = error
+        for waiter in waiters:
+            if waiter.done():
+                continue
+            if error is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(error)
@@ -0,0 +1,27 @@
+"""
+Run the PWM agent, serving the PWM outputs of this Pi to Home Assistant.
+
+    scripts/agent                         # listen on localhost, port 7878
+    scripts/agent --port 7000 --simulate  # simulated outputs, for testing
+    scripts/agent --host 0.0.0.0 --secret-file /etc/rpi-pwm-secret
+
+The agent needs only the standard library: the modules it shares with the
+integration are loaded without the integration package itself, which would
+import Home Assistant.
+"""
+
+from __future__ import annotations
+
+import importlib
+import sys
+import types
+from pathlib import Path
+
+PACKAGE = Path(__file__).resolve().parent.parent / "custom_components" / "rpi_pwm"
+
+package = types.ModuleType("rpi_pwm")
+package.__path__ = [str(PACKAGE)]
+sys.modules["rpi_pwm"] = package
+
+if __name__ == "__main__":
+    importlib.import_module("rpi_pwm.agent").main()
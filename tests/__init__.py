@@ -0,0 +1 @@
+"""Tests of the rpi_pwm integration."""
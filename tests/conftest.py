@@ -0,0 +1,30 @@
+"""Fixtures shared by the rpi_pwm tests."""
+
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations: None) -> None:
+    """Let Home Assistant load the integration from custom_components."""
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the options of the soak test, short by default; see scripts/soak."""
+    group = parser.getgroup("soak", "rpi_pwm soak test")
+    group.addoption("--soak-channels", type=int, default=10)
+    group.addoption("--soak-commands", type=int, default=500)
+    group.addoption("--soak-concurrency", type=int, default=8)
+    group.addoption(
+        "--soak-max-lag",
+        type=float,
+        default=0.1,
+        help="longest allowed event loop blocking in seconds",
+    )
+    group.addoption("--soak-seed", type=int, default=1)
+    group.addoption(
+        "--soak-remote",
+        action="store_true",
+        help="drive all outputs through PWM agents",
+    )
@@ -0,0 +1,183 @@
+"""
+Micro-benchmarks of the command to duty cycle hot paths.
+
+The outputs are set up from config entries on the simulated PWM backend, and
+every command goes through the entity into the writer, with the state
+written to the state machine. The default test run only calls each
+benchmark once; scripts/benchmark times them.
+"""
+
+from __future__ import annotations
+
+from itertools import count
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from homeassistant.const import (
+    CONF_MAXIMUM,
+    CONF_MINIMUM,
+    CONF_MODE,
+    CONF_NAME,
+    CONF_PIN,
+    CONF_TYPE,
+    Platform,
+)
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.rpi_pwm import _make_pwm_devices, async_get_simulator
+from custom_components.rpi_pwm.const import (
+    CONF_FREQUENCY,
+    CONF_INVERT,
+    CONF_NORMALIZE_LOWER,
+    CONF_NORMALIZE_UPPER,
+    CONF_RPI,
+    CONF_RPI_MODEL,
+    CONF_STEP,
+    DATA_ENTITIES,
+    DOMAIN,
+    GPIO12,
+    GPIO13,
+    RPI_UNKNOWN,
+)
+from custom_components.rpi_pwm.hardware import HardwareProfile
+from custom_components.rpi_pwm.simulate import ATTR_DUTY_CYCLE, PwmSimulator
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Coroutine, Generator
+
+    from homeassistant.core import HomeAssistant
+    from pytest_benchmark.fixture import BenchmarkFixture
+
+    from custom_components.rpi_pwm.entity import RpiPwmEntity
+
+
+def _config(platform: Platform, pin: str = GPIO12, **extra: Any) -> dict[str, Any]:
+    """Return the config entry data of a simulated output."""
+    return {
+        CONF_NAME: "bench",
+        CONF_PIN: pin,
+        CONF_TYPE: platform,
+        CONF_RPI: RPI_UNKNOWN,
+        CONF_RPI_MODEL: "",
+        CONF_FREQUENCY: 1000,
+        **extra,
+    }
+
+
+@pytest.fixture
+def setup_output(
+    hass: HomeAssistant,
+) -> Generator[Callable[[dict[str, Any]], RpiPwmEntity]]:
+    """Return a function setting up an output, unloaded after the test."""
+    entries = []
+
+    def _setup(data: dict[str, Any]) -> RpiPwmEntity:
+        entry = MockConfigEntry(domain=DOMAIN, data=data, unique_id=data[CONF_NAME])
+        entry.add_to_hass(hass)
+        entries.append(entry)
+        hass.loop.run_until_complete(_async_setup(hass))
+        return hass.data[DOMAIN][DATA_ENTITIES][f"{data[CONF_TYPE]}.bench"]
+
+    yield _setup
+    for entry in entries:
+        hass.loop.run_until_complete(hass.config_entries.async_unload(entry.entry_id))
+    hass.loop.run_until_complete(hass.async_block_till_done())
+
+
+async def _async_setup(hass: HomeAssistant) -> None:
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+
+def _bench_async(
+    benchmark: BenchmarkFixture,
+    hass: HomeAssistant,
+    command: Callable[[int], Coroutine[Any, Any, Any]],
+) -> None:
+    """Time command(i) run on the event loop, and count the writes it made."""
+    simulator = async_get_simulator(hass)
+    simulator.timeline.clear()
+    rounds = count()
+    benchmark(lambda: hass.loop.run_until_complete(command(next(rounds))))
+    # Let the writer thread finish, so all writes are counted.
+    hass.loop.run_until_complete(hass.async_block_till_done())
+    benchmark.extra_info["writes"] = len(
+        simulator.timeline.writes(attribute=ATTR_DUTY_CYCLE)
+    )
+
+
+def test_light_turn_on(
+    benchmark: BenchmarkFixture, hass: HomeAssistant, setup_output: Callable
+) -> None:
+    """Benchmark switching the brightness of a light."""
+    light = setup_output(_config(Platform.LIGHT))
+    _bench_async(benchmark, hass, lambda i: light.async_turn_on(brightness=1 + i % 255))
+
+
+def test_light_turn_on_transition(
+    benchmark: BenchmarkFixture, hass: HomeAssistant, setup_output: Callable
+) -> None:
+    """Benchmark starting a transition, each one replacing the last."""
+    light = setup_output(_config(Platform.LIGHT))
+    _bench_async(
+        benchmark,
+        hass,
+        lambda i: light.async_turn_on(brightness=1 + i % 255, transition=2.0),
+    )
+    hass.loop.run_until_complete(light.async_turn_off())
+
+
+def test_light_transition_frame(
+    benchmark: BenchmarkFixture, setup_output: Callable
+) -> None:
+    """Benchmark queueing one frame of a transition."""
+    light = setup_output(_config(Platform.LIGHT))
+    period_ns = light._period_ns  # noqa: SLF001
+    rounds = count()
+    benchmark(
+        lambda: light._write_duty_ns_nowait(  # noqa: SLF001
+            next(rounds) % 100 * period_ns // 100
+        )
+    )
+
+
+def test_number_set_native_value(
+    benchmark: BenchmarkFixture, hass: HomeAssistant, setup_output: Callable
+) -> None:
+    """Benchmark setting a normalized, inverted number."""
+    number = setup_output(
+        _config(
+            Platform.NUMBER,
+            GPIO13,
+            **{
+                CONF_MINIMUM: 0,
+                CONF_MAXIMUM: 1000,
+                CONF_STEP: 1,
+                CONF_MODE: "box",
+                CONF_INVERT: True,
+                CONF_NORMALIZE_LOWER: 100,
+                CONF_NORMALIZE_UPPER: 900,
+            },
+        )
+    )
+    _bench_async(
+        benchmark, hass, lambda i: number.async_set_native_value(float(i % 1000))
+    )
+
+
+def test_fan_set_percentage(
+    benchmark: BenchmarkFixture, hass: HomeAssistant, setup_output: Callable
+) -> None:
+    """Benchmark setting the speed of a fan."""
+    fan = setup_output(_config(Platform.FAN))
+    _bench_async(benchmark, hass, lambda i: fan.async_set_percentage(i % 101))
+
+
+def test_make_pwm_device(benchmark: BenchmarkFixture) -> None:
+    """Benchmark opening a simulated channel."""
+    config = MappingProxyType(_config(Platform.NUMBER))
+    simulator = PwmSimulator()
+    profile = HardwareProfile()
+    benchmark(lambda: _make_pwm_devices([config], profile, simulator)[0].close())
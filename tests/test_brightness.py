@@ -0,0 +1,46 @@
+"""Tests of the brightness curves and their lookup tables."""
+
+from __future__ import annotations
+
+from itertools import pairwise
+
+import pytest
+
+from custom_components.rpi_pwm.brightness import (
+    CURVES,
+    HASS_BRIGHTNESS_TABLE_SIZE,
+    TRANSITION_TABLE_SIZE,
+    build_brightness_table,
+)
+from custom_components.rpi_pwm.const import CONST_PWM_MAX
+
+PERIOD_NS = 40_000  # 25 kHz
+
+
+@pytest.mark.parametrize("curve", CURVES)
+@pytest.mark.parametrize("size", [HASS_BRIGHTNESS_TABLE_SIZE, TRANSITION_TABLE_SIZE])
+def test_table(curve: str, size: int) -> None:
+    """Test that a table has one entry per level and rises from 0 to 100%."""
+    table = build_brightness_table(curve, size=size)
+    assert len(table) == size
+    assert table[0] == 0
+    assert table[-1] == CONST_PWM_MAX
+    assert all(low < high for low, high in pairwise(table))
+
+    # Compiled to a period, as the lights do, the ends are off and full on.
+    duty_ns = [round(value * PERIOD_NS / 100) for value in table]
+    assert duty_ns[0] == 0
+    assert duty_ns[-1] == PERIOD_NS
+    assert all(low <= high for low, high in pairwise(duty_ns))
+
+
+def test_curves_differ() -> None:
+    """Test that the perceptual curves stay below the linear one in between."""
+    linear = build_brightness_table("linear")
+    gamma = build_brightness_table("gamma", gamma=2.2)
+    cie = build_brightness_table("cie1931")
+    middle = HASS_BRIGHTNESS_TABLE_SIZE // 2
+    assert linear[middle] == pytest.approx(middle * CONST_PWM_MAX / 255)
+    assert gamma[middle] == pytest.approx((middle / 255) ** 2.2 * CONST_PWM_MAX)
+    assert gamma[middle] < linear[middle]
+    assert cie[middle] < linear[middle]
@@ -0,0 +1,73 @@
+"""Tests of the config flow and its strings."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from homeassistant.config_entries import SOURCE_USER
+from homeassistant.const import CONF_NAME, CONF_PIN
+from homeassistant.data_entry_flow import FlowResultType
+
+from custom_components.rpi_pwm.const import (
+    CONF_SOURCE_SENSOR,
+    CONF_TEMPERATURE_CURVE,
+    DOMAIN,
+    GPIO12,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+COMPONENT = Path(__file__).parent.parent / "custom_components" / DOMAIN
+
+
+def _strings(path: str) -> dict:
+    return json.loads((COMPONENT / path).read_text(encoding="utf-8"))
+
+
+def test_translations_match_strings() -> None:
+    """Test that the English translations are the strings of the integration."""
+    strings = _strings("strings.json")
+    assert _strings("translations/en.json") == strings
+    config = strings["config"]
+    assert {"cannot_connect", "invalid_auth", "invalid_temperature_curve"} <= set(
+        config["error"]
+    )
+    assert {"cannot_connect", "no_free_channels"} <= set(config["abort"])
+    assert {
+        "user",
+        "remote",
+        "remote_output",
+        "light",
+        "fan",
+        "number",
+        "reconfigure",
+    } <= set(config["step"])
+
+
+async def test_fan_with_a_bad_temperature_curve(hass: HomeAssistant) -> None:
+    """Test that a malformed curve is shown on its field with a known string."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": SOURCE_USER}
+    )
+    assert result["type"] is FlowResultType.MENU
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"], {"next_step_id": "fan"}
+    )
+    assert result["type"] is FlowResultType.FORM
+    for field in result["data_schema"].schema:
+        assert str(field) in _strings("strings.json")["config"]["step"]["fan"]["data"]
+
+    result = await hass.config_entries.flow.async_configure(
+        result["flow_id"],
+        {
+            CONF_NAME: "fan",
+            CONF_PIN: GPIO12,
+            CONF_SOURCE_SENSOR: "sensor.temperature",
+            CONF_TEMPERATURE_CURVE: "30:0, 30:50",
+        },
+    )
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {CONF_TEMPERATURE_CURVE: "invalid_temperature_curve"}
@@ -0,0 +1,67 @@
+"""Tests of the temperature curve controller of the fan."""
+
+from __future__ import annotations
+
+import pytest
+
+from custom_components.rpi_pwm.controller import (
+    FanCurveController,
+    parse_temperature_curve,
+)
+
+CURVE = "30:0, 45:40, 60:100"
+
+
+def _controller(
+    hysteresis: float = 2.0, min_interval: float = 0.0
+) -> FanCurveController:
+    return FanCurveController(parse_temperature_curve(CURVE), hysteresis, min_interval)
+
+
+def test_parse_curve() -> None:
+    """Test that a curve is parsed into sorted points and checked."""
+    assert parse_temperature_curve("60:100; 30:0,45:40,") == [
+        (30.0, 0.0),
+        (45.0, 40.0),
+        (60.0, 100.0),
+    ]
+    for text in ("", "30", "30:101", "30:0, 30:50", "warm:50"):
+        with pytest.raises(ValueError, match=r"."):
+            parse_temperature_curve(text)
+
+
+def test_speed() -> None:
+    """Test that the speed is interpolated and constant beyond the ends."""
+    controller = _controller()
+    assert controller.speed(20) == 0
+    assert controller.speed(37.5) == 20
+    assert controller.speed(50) == 60
+    assert controller.speed(70) == 100
+
+
+def test_hysteresis() -> None:
+    """Test that the speed rises at once but drops only below the band."""
+    controller = _controller(hysteresis=2.0)
+    assert controller.update(50, 0) == (60, 0)
+    # Up right away.
+    assert controller.update(51, 1) == (64, 0)
+    # Down within the band: the speed holds.
+    assert controller.update(50, 2) == (None, 0)
+    assert controller.update(49.1, 3) == (None, 0)
+    assert controller.percentage == 64
+    # Down below the band: the speed of the temperature plus the band.
+    assert controller.update(48, 4) == (60, 0)
+    assert controller.update(20, 5) == (0, 0)
+
+
+def test_min_interval() -> None:
+    """Test that changes are held back for min_interval after the last one."""
+    controller = _controller(min_interval=10)
+    assert controller.update(45, 100) == (40, 0)
+    # A change is held back, with the delay after which it may be retried.
+    assert controller.update(50, 104) == (None, 6)
+    assert controller.percentage == 40
+    # No change needed: nothing is held back.
+    assert controller.update(45, 105) == (None, 0)
+    assert controller.update(55, 110) == (80, 0)
+    assert controller.update(60, 115) == (None, 5)
@@ -0,0 +1,87 @@
+"""Tests of the fan following a temperature sensor."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from homeassistant.const import CONF_NAME, CONF_PIN, CONF_TYPE, STATE_ON, Platform
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.rpi_pwm.const import (
+    CONF_FREQUENCY,
+    CONF_HYSTERESIS,
+    CONF_MIN_INTERVAL,
+    CONF_RPI,
+    CONF_RPI_MODEL,
+    CONF_SOURCE_SENSOR,
+    CONF_TEMPERATURE_CURVE,
+    DOMAIN,
+    GPIO12,
+    RPI_UNKNOWN,
+)
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+SOURCE = "sensor.temperature"
+
+
+async def _async_set_temperature(hass: HomeAssistant, temperature: float) -> None:
+    hass.states.async_set(SOURCE, str(temperature))
+    await hass.async_block_till_done()
+
+
+def _percentage(hass: HomeAssistant) -> float:
+    return hass.states.get("fan.fan").attributes["percentage"]
+
+
+async def test_manual_speed_holds_until_the_next_temperature(
+    hass: HomeAssistant,
+) -> None:
+    """Test that a speed set by hand lasts until the sensor reports again."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        unique_id="fan",
+        data={
+            CONF_NAME: "fan",
+            CONF_PIN: GPIO12,
+            CONF_TYPE: Platform.FAN,
+            CONF_RPI: RPI_UNKNOWN,
+            CONF_RPI_MODEL: "",
+            CONF_FREQUENCY: 25000,
+            CONF_SOURCE_SENSOR: SOURCE,
+            CONF_TEMPERATURE_CURVE: "30:0, 45:40, 60:100",
+            CONF_HYSTERESIS: 2.0,
+            CONF_MIN_INTERVAL: 0,
+        },
+    )
+    entry.add_to_hass(hass)
+    await _async_set_temperature(hass, 50)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+    await hass.services.async_call(
+        "fan", "turn_on", {"entity_id": "fan.fan"}, blocking=True
+    )
+    await _async_set_temperature(hass, 50.5)
+    assert _percentage(hass) == 62
+
+    # Within the hysteresis band the curve keeps the speed.
+    await _async_set_temperature(hass, 49)
+    assert _percentage(hass) == 62
+
+    await hass.services.async_call(
+        "fan",
+        "set_percentage",
+        {"entity_id": "fan.fan", "percentage": 90},
+        blocking=True,
+    )
+    assert _percentage(hass) == 90
+    # The next temperature update sets the speed of the curve again, even
+    # within the hysteresis band of the speed set by hand.
+    await _async_set_temperature(hass, 49.5)
+    assert _percentage(hass) == 58
+    assert hass.states.get("fan.fan").state == STATE_ON
+
+    assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
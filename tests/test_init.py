@@ -0,0 +1,101 @@
+"""Tests of setting up config entries and bringing up their channels."""
+
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import (
+    CONF_NAME,
+    CONF_PIN,
+    CONF_TYPE,
+    STATE_UNAVAILABLE,
+    Platform,
+)
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.rpi_pwm import _make_pwm_devices, async_get_simulator
+from custom_components.rpi_pwm.const import (
+    CONF_FREQUENCY,
+    CONF_RPI,
+    CONF_RPI_MODEL,
+    DOMAIN,
+    GPIO12,
+    RPI_UNKNOWN,
+)
+from custom_components.rpi_pwm.hardware import HardwareProfile
+from custom_components.rpi_pwm.simulate import (
+    ATTR_DUTY_CYCLE,
+    PwmSimulator,
+    SimulatedPwmChannel,
+)
+from custom_components.rpi_pwm.sysfs import SysfsPwmError
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+BAD_PIN = "GPIO4"
+
+
+def _light(name: str, pin: str) -> dict[str, Any]:
+    """Return the config entry data of a simulated light."""
+    return {
+        CONF_NAME: name,
+        CONF_PIN: pin,
+        CONF_TYPE: Platform.LIGHT,
+        CONF_RPI: RPI_UNKNOWN,
+        CONF_RPI_MODEL: "",
+        CONF_FREQUENCY: 1000,
+    }
+
+
+def test_bad_pin_fails_only_its_channel() -> None:
+    """Test that a config with an unknown pin does not fail the batch."""
+    simulator = PwmSimulator()
+    results = _make_pwm_devices(
+        [
+            MappingProxyType(_light("bad", BAD_PIN)),
+            MappingProxyType(_light("good", GPIO12)),
+        ],
+        HardwareProfile(),
+        simulator,
+    )
+    assert isinstance(results[0], SysfsPwmError)
+    assert BAD_PIN in str(results[0])
+    assert isinstance(results[1], SimulatedPwmChannel)
+    assert results[1].is_open
+    results[1].close()
+
+    results = _make_pwm_devices(
+        [MappingProxyType(_light("good", GPIO12))], HardwareProfile()
+    )
+    assert isinstance(results[0], SysfsPwmError)
+
+
+async def test_setup_with_a_bad_pin(hass: HomeAssistant) -> None:
+    """Test that the entries set up with a bad one still get their channel."""
+    entries = [
+        MockConfigEntry(domain=DOMAIN, data=_light(name, pin), unique_id=name)
+        for name, pin in (("good", GPIO12), ("bad", BAD_PIN))
+    ]
+    for entry in entries:
+        entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+    assert hass.states.get("light.bad").state == STATE_UNAVAILABLE
+    assert hass.states.get("light.good").state != STATE_UNAVAILABLE
+    await hass.services.async_call(
+        "light",
+        "turn_on",
+        {"entity_id": "light.good", "brightness": 255},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+    # GPIO12 is channel 0 of the simulated chip, 1000 Hz has a 1 ms period.
+    assert async_get_simulator(hass).read(0, 0, ATTR_DUTY_CYCLE) == 1_000_000
+
+    for entry in entries:
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
@@ -0,0 +1,170 @@
+"""Tests of the remote backend against a PWM agent on localhost."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+
+import pytest
+
+from custom_components.rpi_pwm.agent import SIMULATED_PROFILE, PwmAgent
+from custom_components.rpi_pwm.const import GPIO12
+from custom_components.rpi_pwm.metrics import ChannelMetrics
+from custom_components.rpi_pwm.remote import (
+    HEADER,
+    OP_ERROR,
+    OP_OPEN,
+    AgentAuthError,
+    RemotePwmChannel,
+    RemotePwmClient,
+    RemoteTransitionRunner,
+)
+from custom_components.rpi_pwm.simulate import ATTR_DUTY_CYCLE, PwmSimulator
+from custom_components.rpi_pwm.transition import build_frame_plan
+from custom_components.rpi_pwm.writer import PwmWriter
+
+PERIOD_NS = 10_000_000  # 100 Hz
+
+# The agent and the client talk over TCP on localhost.
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+
+class Proxy:
+    """TCP proxy in front of the agent, to drop the connection at will."""
+
+    def __init__(self, port: int) -> None:
+        """Initialize the proxy to the agent on port."""
+        self._port = port
+        self.refuse = False
+        self._streams: list[asyncio.StreamWriter] = []
+
+    async def async_start(self) -> int:
+        """Start listening, return the port of the proxy."""
+        server = await asyncio.start_server(self._async_connected, "127.0.0.1", 0)
+        return server.sockets[0].getsockname()[1]
+
+    def drop(self) -> None:
+        """Drop the connections, as when the network fails."""
+        for stream in self._streams:
+            stream.transport.abort()
+        self._streams.clear()
+
+    async def _async_connected(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        if self.refuse:
+            writer.transport.abort()
+            return
+        agent_reader, agent_writer = await asyncio.open_connection(
+            "127.0.0.1", self._port
+        )
+        self._streams += [writer, agent_writer]
+        await asyncio.gather(
+            self._async_pipe(reader, agent_writer),
+            self._async_pipe(agent_reader, writer),
+        )
+
+    @staticmethod
+    async def _async_pipe(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        with contextlib.suppress(OSError):
+            while data := await reader.read(65536):
+                writer.write(data)
+        writer.transport.abort()
+
+
+async def _async_play_and_drop(
+    *, refuse: bool
+) -> tuple[PwmSimulator, RemotePwmChannel, PwmWriter, RemoteTransitionRunner]:
+    """Play a plan on an agent behind a proxy and drop the connection."""
+    loop = asyncio.get_running_loop()
+    simulator = PwmSimulator()
+    server = await PwmAgent(SIMULATED_PROFILE, simulator).async_start("127.0.0.1", 0)
+    proxy = Proxy(server.sockets[0].getsockname()[1])
+    client = RemotePwmClient(loop, "127.0.0.1", await proxy.async_start())
+    pwm = await client.async_open_channel(GPIO12, 100)
+    await loop.run_in_executor(None, pwm.start, 0)
+    writer = PwmWriter(loop, "test", ChannelMetrics())
+    writer.start(pwm)
+
+    done = asyncio.Event()
+    plan = build_frame_plan(start=0, end=0.9 * PERIOD_NS, duration=2.0, frame_rate=50)
+    runner = RemoteTransitionRunner(writer, plan, done.set)
+    runner.start()
+    await asyncio.sleep(0.5)
+    proxy.refuse = refuse
+    proxy.drop()
+    await asyncio.wait_for(done.wait(), 5)
+    proxy.refuse = False
+    return simulator, pwm, writer, runner
+
+
+async def _async_drop_mid_plan() -> None:
+    simulator, pwm, writer, runner = await _async_play_and_drop(refuse=False)
+
+    # The agent stopped the plan where it was, the writer knows that value.
+    duty_ns = simulator.read(0, 0, ATTR_DUTY_CYCLE)
+    assert not runner.running
+    assert 0 < duty_ns < 0.9 * PERIOD_NS
+    assert writer.duty_ns == duty_ns
+    assert pwm.duty_ns == duty_ns
+
+    # The channel works on the new connection.
+    await writer.async_write(PERIOD_NS // 2)
+    assert simulator.read(0, 0, ATTR_DUTY_CYCLE) == PERIOD_NS // 2
+
+    await writer.async_stop()
+
+
+async def _async_drop_mid_plan_unreachable() -> None:
+    simulator, pwm, writer, runner = await _async_play_and_drop(refuse=True)
+
+    # Without the agent the output is estimated from the plan.
+    assert not runner.running
+    assert 0 < writer.duty_ns < 0.9 * PERIOD_NS
+
+    # The channel is opened again on the next write.
+    await writer.async_write(PERIOD_NS // 2)
+    assert simulator.read(0, 0, ATTR_DUTY_CYCLE) == PERIOD_NS // 2
+    assert pwm.duty_ns == PERIOD_NS // 2
+    await writer.async_stop()
+
+
+def test_connection_lost_mid_plan() -> None:
+    """Test that a plan lost with the connection ends at the output it left."""
+    asyncio.run(_async_drop_mid_plan())
+
+
+def test_connection_lost_mid_plan_unreachable() -> None:
+    """Test that a lost plan ends when the agent can not be reached again."""
+    asyncio.run(_async_drop_mid_plan_unreachable())
+
+
+async def _async_authenticate() -> None:
+    loop = asyncio.get_running_loop()
+    agent = PwmAgent(SIMULATED_PROFILE, PwmSimulator(), b"secret")
+    port = (await agent.async_start("127.0.0.1", 0)).sockets[0].getsockname()[1]
+
+    client = RemotePwmClient(loop, "127.0.0.1", port, "secret")
+    assert await client.async_info() == SIMULATED_PROFILE
+    await client.async_close()
+
+    for secret in ("wrong", None):
+        client = RemotePwmClient(loop, "127.0.0.1", port, secret)
+        with pytest.raises(AgentAuthError):
+            await client.async_info()
+        await client.async_close()
+
+    # A request before the handshake is refused.
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(HEADER.pack(OP_OPEN, 0, 1, 0))
+    op, _, request_id, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+    assert (op, request_id) == (OP_ERROR, 1)
+    assert await reader.readexactly(length) == b"Not authenticated"
+    writer.close()
+
+
+def test_authentication() -> None:
+    """Test that the agent serves only clients that know its secret."""
+    asyncio.run(_async_authenticate())
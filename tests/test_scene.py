@@ -0,0 +1,114 @@
+"""Tests of scenes spanning outputs of this Pi and of a remote Pi."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_NAME,
+    CONF_PIN,
+    CONF_PORT,
+    CONF_TYPE,
+    Platform,
+)
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.rpi_pwm import async_get_remote_client, async_get_simulator
+from custom_components.rpi_pwm.agent import SIMULATED_PROFILE, PwmAgent
+from custom_components.rpi_pwm.const import (
+    ATTR_FRAME_RATE,
+    ATTR_OUTPUTS,
+    ATTR_TRANSITION,
+    ATTR_VALUE,
+    CONF_FREQUENCY,
+    CONF_RPI,
+    CONF_RPI_MODEL,
+    DOMAIN,
+    GPIO12,
+    RPI_UNKNOWN,
+    SERVICE_APPLY_SCENE,
+)
+from custom_components.rpi_pwm.simulate import ATTR_DUTY_CYCLE, PwmSimulator
+
+if TYPE_CHECKING:
+    from homeassistant.core import HomeAssistant
+
+PERIOD_NS = 1_000_000  # 1 kHz
+
+# The agent and the client talk over TCP on localhost.
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+
+def _light(name: str, rpi: str, **extra: Any) -> dict[str, Any]:
+    """Return the config entry data of a light on GPIO12."""
+    return {
+        CONF_NAME: name,
+        CONF_PIN: GPIO12,
+        CONF_TYPE: Platform.LIGHT,
+        CONF_RPI: rpi,
+        CONF_RPI_MODEL: "",
+        CONF_FREQUENCY: 1000,
+        **extra,
+    }
+
+
+async def test_scene_plays_remote_frames_on_the_agent(hass: HomeAssistant) -> None:
+    """Test that a remote member gets its frames as one plan, not frame by frame."""
+    simulator = PwmSimulator()
+    server = await PwmAgent(SIMULATED_PROFILE, simulator).async_start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    local = MockConfigEntry(
+        domain=DOMAIN, data=_light("local", RPI_UNKNOWN), unique_id="local"
+    )
+    remote = MockConfigEntry(
+        domain=DOMAIN,
+        data=_light(
+            "remote",
+            SIMULATED_PROFILE.rpi_version,
+            **{CONF_HOST: "127.0.0.1", CONF_PORT: port},
+        ),
+        unique_id="remote",
+    )
+    for entry in (local, remote):
+        entry.add_to_hass(hass)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+    remote_writes = remote.runtime_data.metrics.writes
+
+    response = await hass.services.async_call(
+        DOMAIN,
+        SERVICE_APPLY_SCENE,
+        {
+            ATTR_OUTPUTS: [
+                {"entity_id": "light.local", ATTR_VALUE: 255},
+                {"entity_id": "light.remote", ATTR_VALUE: 255},
+            ],
+            ATTR_TRANSITION: 0.3,
+            ATTR_FRAME_RATE: 50,
+        },
+        blocking=True,
+        return_response=True,
+    )
+    assert response["frames"] > 10
+    await asyncio.sleep(0.5)
+    await hass.async_block_till_done()
+
+    chip, channel = SIMULATED_PROFILE.pwm_channel(GPIO12, SIMULATED_PROFILE.rpi_version)
+    assert simulator.read(chip, channel, ATTR_DUTY_CYCLE) == PERIOD_NS
+    assert len(simulator.timeline.writes(attribute=ATTR_DUTY_CYCLE)) > 10
+    # One plan crossed the network for the remote light.
+    assert remote.runtime_data.metrics.writes == remote_writes + 1
+    local_pwm = async_get_simulator(hass)
+    assert local_pwm.read(0, 0, ATTR_DUTY_CYCLE) == PERIOD_NS
+    assert local.runtime_data.metrics.writes > 10
+
+    for entry in (local, remote):
+        assert await hass.config_entries.async_unload(entry.entry_id)
+    await hass.async_block_till_done()
+    await async_get_remote_client(hass, "127.0.0.1", port).async_close()
+    server.close()
+    await server.wait_closed()
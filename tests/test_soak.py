@@ -0,0 +1,517 @@
+"""
+Soak and stress test of rpi_pwm with many channels and concurrent commands.
+
+Lights, fans and numbers are set up from config entries, each on its own
+channel, and bombarded with interleaved turn_on, turn_off, transition and
+set_value commands from concurrent workers. Afterwards every channel gets a
+final command and the run checks that:
+
+- the duty cycle in the simulated hardware matches the final state of
+  every entity,
+- no channel was ever written a value older than one already written
+  (out-of-order writes),
+- the event loop was never blocked longer than allowed.
+
+Simulation on this Pi offers two channels, which take the first outputs and
+are brought up in one batch. The other outputs are on PWM agents on
+localhost, four per agent, each agent simulating a Pi 5 with a chip of its
+own; the agents run in a thread with their own event loop, as if they were
+separate processes. With --soak-remote all outputs are on agents.
+
+The default test run is short; scripts/soak runs the full load:
+
+    scripts/soak                          # default load
+    scripts/soak --soak-channels 64 --soak-commands 50000 --soak-concurrency 32
+    scripts/soak --soak-remote            # only through the agent protocol
+
+To log every requested duty cycle for the out-of-order check, the writer
+queue and play_nowait of every channel are wrapped; the writes themselves
+go through the real writer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, TextIO
+
+import pytest
+from homeassistant.const import (
+    CONF_HOST,
+    CONF_MAXIMUM,
+    CONF_MINIMUM,
+    CONF_MODE,
+    CONF_NAME,
+    CONF_PIN,
+    CONF_PORT,
+    CONF_TYPE,
+    Platform,
+)
+from homeassistant.helpers import entity_registry as er
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.rpi_pwm import (
+    async_get_hardware_profile,
+    async_get_remote_client,
+    async_get_simulator,
+)
+from custom_components.rpi_pwm.agent import SIMULATED_PROFILE, PwmAgent
+from custom_components.rpi_pwm.const import (
+    CONF_FREQUENCY,
+    CONF_INVERT,
+    CONF_NORMALIZE_LOWER,
+    CONF_NORMALIZE_UPPER,
+    CONF_RAMP_TIME,
+    CONF_RPI,
+    CONF_RPI_MODEL,
+    CONF_SLEW_RATE,
+    CONF_STATE_UPDATE_RATE,
+    CONF_STEP,
+    CONF_TIMING,
+    DATA_ENTITIES,
+    DOMAIN,
+    GPIO12,
+    GPIO13,
+    GPIO18,
+    GPIO19,
+    RPI5,
+    RPI_UNKNOWN,
+    TIMING_EVENT_LOOP,
+    TIMING_THREAD,
+)
+from custom_components.rpi_pwm.fan import RpiPwmFan
+from custom_components.rpi_pwm.light import RpiPwmLed
+from custom_components.rpi_pwm.simulate import ATTR_DUTY_CYCLE, PwmSimulator
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+    from homeassistant.core import HomeAssistant
+
+    from custom_components.rpi_pwm.entity import RpiPwmEntity
+    from custom_components.rpi_pwm.remote import RemoteTransitionRunner
+
+# Where the duty cycle of an output ends up: simulator, chip and channel
+Output = tuple[PwmSimulator, int, int]
+
+LAG_PROBE_INTERVAL = 0.005
+SETTLE_TIMEOUT = 30.0
+TIMELINE_SIZE = 1 << 21
+
+LOCAL_PINS = (GPIO12, GPIO13)
+AGENT_PINS = (GPIO12, GPIO13, GPIO18, GPIO19)
+
+# The agents and their clients talk over TCP on localhost.
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+
+@dataclass
+class SoakOptions:
+    """The load of a soak run, see pytest_addoption in conftest.py."""
+
+    channels: int
+    commands: int
+    concurrency: int
+    max_lag: float
+    seed: int
+    remote: bool
+
+
+def _config(index: int, backend: dict[str, Any]) -> dict[str, Any]:
+    """Return the entry data of channel index, cycling through platforms and modes."""
+    kind = index % 3
+    timing = TIMING_THREAD if index % 2 else TIMING_EVENT_LOOP
+    config = {
+        CONF_NAME: f"soak {index}",
+        CONF_RPI_MODEL: "",
+        CONF_FREQUENCY: 1000,
+        **backend,
+    }
+    if kind == 0:
+        return {
+            **config,
+            CONF_TYPE: Platform.LIGHT,
+            CONF_TIMING: timing,
+            CONF_STATE_UPDATE_RATE: 2.0 if index % 4 == 0 else 0.0,
+        }
+    if kind == 1:
+        return {
+            **config,
+            CONF_TYPE: Platform.FAN,
+            CONF_TIMING: timing,
+            CONF_RAMP_TIME: 0.5 if index % 4 == 1 else 0.0,
+        }
+    return {
+        **config,
+        CONF_TYPE: Platform.NUMBER,
+        CONF_MINIMUM: 0,
+        CONF_MAXIMUM: 1000,
+        CONF_STEP: 1,
+        CONF_MODE: "box",
+        CONF_INVERT: bool(index // 3 % 2),
+        CONF_NORMALIZE_LOWER: 0,
+        CONF_NORMALIZE_UPPER: 1000,
+        CONF_SLEW_RATE: 2000.0 if index % 4 == 0 else 0.0,
+    }
+
+
+class RequestLog:
+    """Every duty cycle queued on the writer of one channel, in order."""
+
+    def __init__(self, entity: RpiPwmEntity) -> None:
+        """Start logging the requests queued on the writer of entity."""
+        self.values: list[int] = []
+        writer = entity._writer  # noqa: SLF001
+        queue = writer._queue  # noqa: SLF001
+
+        def _logged_queue(duty_ns: int, waiter: Any) -> None:
+            # Called from the loop and the frame clock thread; the append is
+            # done under the writer lock, in the same order as the queue.
+            with writer._cond:  # noqa: SLF001
+                self.values.append(duty_ns)
+                queue(duty_ns, waiter)
+
+        writer._queue = _logged_queue  # type: ignore[method-assign]  # noqa: SLF001
+        play_nowait = writer.play_nowait
+
+        def _logged_play(play: RemoteTransitionRunner) -> None:
+            # The agent writes the frames of a plan in order.
+            with writer._cond:  # noqa: SLF001
+                self.values.extend(map(int, play.plan.values))
+                play_nowait(play)
+
+        writer.play_nowait = _logged_play  # type: ignore[method-assign]
+
+    def out_of_order(self, written: list[int]) -> int:
+        """
+        Count hardware writes of a value older than one written before.
+
+        Coalescing may skip requests, but every write has to match a request
+        at or after the one matched by the previous write.
+        """
+        count = 0
+        position = 0
+        for value in written:
+            try:
+                position = self.values.index(value, position)
+            except ValueError:
+                count += 1
+        return count
+
+
+class LagProbe:
+    """Measure how late a periodic callback runs, i.e. event loop blocking."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Initialize the probe, call start() to begin."""
+        self._loop = loop
+        self._handle: asyncio.TimerHandle | None = None
+        self._deadline = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+
+    def start(self) -> None:
+        """Start probing."""
+        self._deadline = self._loop.time() + LAG_PROBE_INTERVAL
+        self._handle = self._loop.call_at(self._deadline, self._probe)
+
+    def stop(self) -> None:
+        """Stop probing."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _probe(self) -> None:
+        now = self._loop.time()
+        self.max_lag = max(self.max_lag, now - self._deadline)
+        self.samples += 1
+        self._deadline = now + LAG_PROBE_INTERVAL
+        self._handle = self._loop.call_at(self._deadline, self._probe)
+
+
+class AgentThread:
+    """PWM agents on localhost, in a thread with their own event loop."""
+
+    def __init__(self, count: int) -> None:
+        """Initialize count agents, each with its own simulated tree."""
+        self.loop = asyncio.new_event_loop()
+        self.simulators = [PwmSimulator(TIMELINE_SIZE) for _ in range(count)]
+        self.ports: list[int] = []
+        self._servers: list[asyncio.Server] = []
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="soak agents", daemon=True
+        )
+
+    def start(self) -> None:
+        """Start the agents and wait until they listen, blocking."""
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._async_start(), self.loop).result()
+
+    def stop(self) -> None:
+        """Stop the agents, blocking."""
+        asyncio.run_coroutine_threadsafe(self._async_stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    async def _async_start(self) -> None:
+        for simulator in self.simulators:
+            server = await PwmAgent(SIMULATED_PROFILE, simulator).async_start(
+                "127.0.0.1", 0
+            )
+            self._servers.append(server)
+            self.ports.append(server.sockets[0].getsockname()[1])
+
+    async def _async_stop(self) -> None:
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+
+def _random_command(
+    rng: random.Random, entity: RpiPwmEntity
+) -> Callable[[], Awaitable[Any]]:
+    """Return a random command for entity."""
+    roll = rng.random()
+    if isinstance(entity, RpiPwmLed):
+        if roll < 0.2:
+            return entity.async_turn_off
+        brightness = rng.randint(1, 255)
+        if roll < 0.5:
+            transition = rng.uniform(0.05, 0.5)
+            return lambda: entity.async_turn_on(
+                brightness=brightness, transition=transition
+            )
+        return lambda: entity.async_turn_on(brightness=brightness)
+    if isinstance(entity, RpiPwmFan):
+        if roll < 0.2:
+            return entity.async_turn_off
+        percentage = rng.randint(0, 100)
+        return lambda: entity.async_set_percentage(percentage)
+    value = float(rng.randint(0, 1000))
+    return lambda: entity.async_set_native_value(value)
+
+
+def _final_command(entity: RpiPwmEntity, index: int) -> Awaitable[Any]:
+    """Return a final command without transition, the state to verify."""
+    if isinstance(entity, RpiPwmLed):
+        if index % 5 == 0:
+            return entity.async_turn_off()
+        return entity.async_turn_on(brightness=1 + index * 37 % 255)
+    if isinstance(entity, RpiPwmFan):
+        return entity.async_set_percentage(index * 13 % 101)
+    return entity.async_set_native_value(float(index * 97 % 1001))
+
+
+def _expected_duty_ns(entity: RpiPwmEntity) -> int:
+    """Return the duty cycle the final state of entity asks for."""
+    if isinstance(entity, RpiPwmLed):
+        if not entity._attr_is_on:  # noqa: SLF001
+            return 0
+        return entity._from_hass_brightness(entity._attr_brightness)  # noqa: SLF001
+    if isinstance(entity, RpiPwmFan):
+        if not entity.is_on:
+            return 0
+        return entity._to_duty_ns(entity.percentage)  # noqa: SLF001
+    return entity._value_to_ns(entity.native_value)  # noqa: SLF001
+
+
+def _settled(entity: RpiPwmEntity) -> bool:
+    """Return if no transition, ramp or slew is running on entity anymore."""
+    if isinstance(entity, RpiPwmLed):
+        return entity._transition is None  # noqa: SLF001
+    if isinstance(entity, RpiPwmFan):
+        return entity._ramp is None  # noqa: SLF001
+    return not entity._slew.running  # noqa: SLF001
+
+
+async def _async_load(
+    entities: list[RpiPwmEntity], options: SoakOptions, out: TextIO
+) -> int:
+    """Fire the random commands from concurrent workers, return the errors."""
+    rng = random.Random(options.seed)  # noqa: S311
+    remaining = options.commands
+    failures = 0
+
+    async def _worker() -> None:
+        nonlocal remaining, failures
+        while remaining > 0:
+            remaining -= 1
+            entity = rng.choice(entities)
+            try:
+                await _random_command(rng, entity)()
+            except Exception as err:  # noqa: BLE001
+                failures += 1
+                out.write(f"{entity.entity_id}: {err!r}\n")
+
+    await asyncio.gather(*(_worker() for _ in range(options.concurrency)))
+    return failures
+
+
+async def _async_settle(entities: list[RpiPwmEntity], out: TextIO) -> int:
+    """Give every channel its final command and wait until it is written."""
+    await asyncio.gather(
+        *(_final_command(entity, i) for i, entity in enumerate(entities))
+    )
+    failures = 0
+    deadline = time.monotonic() + SETTLE_TIMEOUT
+    while not all(_settled(entity) for entity in entities):
+        if time.monotonic() > deadline:
+            out.write("Transitions did not settle\n")
+            failures += 1
+            break
+        await asyncio.sleep(0.05)
+    for entity in entities:
+        # Stopping the writer flushes whatever is still pending.
+        await entity._writer.async_stop()  # noqa: SLF001
+    return failures
+
+
+def _verify(
+    entities: list[RpiPwmEntity],
+    outputs: list[Output],
+    logs: list[RequestLog],
+    out: TextIO,
+) -> tuple[int, int]:
+    """Compare the hardware with the entity states, return the differences."""
+    mismatches = 0
+    out_of_order = 0
+    for entity, (simulator, chip, channel), log in zip(
+        entities, outputs, logs, strict=True
+    ):
+        actual = simulator.read(chip, channel, ATTR_DUTY_CYCLE)
+        expected = _expected_duty_ns(entity)
+        if actual != expected:
+            mismatches += 1
+            out.write(
+                f"{entity.entity_id}: hardware {actual} ns, "
+                f"state asks for {expected} ns\n"
+            )
+        written = [
+            value
+            for *_, value in simulator.timeline.writes(chip, channel, ATTR_DUTY_CYCLE)
+        ]
+        out_of_order += log.out_of_order(written)
+    return mismatches, out_of_order
+
+
+async def _async_setup_outputs(
+    hass: HomeAssistant, options: SoakOptions, agents: AgentThread
+) -> tuple[list[MockConfigEntry], list[RpiPwmEntity], list[Output]]:
+    """Set up the config entries of all channels at once, like at startup."""
+    local = 0 if options.remote else min(options.channels, len(LOCAL_PINS))
+    profile = await async_get_hardware_profile(hass)
+    entries = []
+    outputs = []
+    for index in range(options.channels):
+        if index < local:
+            pin = LOCAL_PINS[index]
+            backend = {CONF_PIN: pin, CONF_RPI: RPI_UNKNOWN}
+            outputs.append(
+                (async_get_simulator(hass), *profile.pwm_channel(pin, RPI_UNKNOWN))
+            )
+        else:
+            agent, channel = divmod(index - local, len(AGENT_PINS))
+            pin = AGENT_PINS[channel]
+            backend = {
+                CONF_PIN: pin,
+                CONF_RPI: RPI5,
+                CONF_HOST: "127.0.0.1",
+                CONF_PORT: agents.ports[agent],
+            }
+            outputs.append(
+                (agents.simulators[agent], *SIMULATED_PROFILE.pwm_channel(pin, RPI5))
+            )
+        entry = MockConfigEntry(
+            domain=DOMAIN, data=_config(index, backend), unique_id=f"soak_{index}"
+        )
+        entry.add_to_hass(hass)
+        entries.append(entry)
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+    registry = er.async_get(hass)
+    entities: list[RpiPwmEntity] = []
+    for entry in entries:
+        entity_id = registry.async_get_entity_id(
+            entry.data[CONF_TYPE], DOMAIN, entry.unique_id
+        )
+        entity = hass.data[DOMAIN][DATA_ENTITIES][entity_id]
+        # The channel opens in the background, load it once it is ready.
+        if entity._bring_up is not None:  # noqa: SLF001
+            await entity._bring_up  # noqa: SLF001
+        entities.append(entity)
+    return entries, entities, outputs
+
+
+@pytest.fixture
+def soak_options(request: pytest.FixtureRequest) -> SoakOptions:
+    """Return the load of the soak run from the command line."""
+    config = request.config
+    return SoakOptions(
+        channels=config.getoption("soak_channels"),
+        commands=config.getoption("soak_commands"),
+        concurrency=config.getoption("soak_concurrency"),
+        max_lag=config.getoption("soak_max_lag"),
+        seed=config.getoption("soak_seed"),
+        remote=config.getoption("soak_remote"),
+    )
+
+
+async def test_soak(hass: HomeAssistant, soak_options: SoakOptions) -> None:
+    """Test many channels under concurrent commands, see the module docstring."""
+    options = soak_options
+    out = sys.stdout
+    local = 0 if options.remote else len(LOCAL_PINS)
+    agents = AgentThread(-(-max(options.channels - local, 0) // len(AGENT_PINS)))
+    await hass.async_add_executor_job(agents.start)
+    try:
+        entries, entities, outputs = await _async_setup_outputs(hass, options, agents)
+        logs = [RequestLog(entity) for entity in entities]
+        simulators = {simulator for simulator, _, _ in outputs}
+        for simulator in simulators:
+            simulator.timeline.clear()
+
+        probe = LagProbe(hass.loop)
+        probe.start()
+        start = time.perf_counter()
+        failures = await _async_load(entities, options, out)
+        elapsed = time.perf_counter() - start
+        failures += await _async_settle(entities, out)
+        probe.stop()
+        mismatches, out_of_order = _verify(entities, outputs, logs, out)
+
+        for entry in entries:
+            assert await hass.config_entries.async_unload(entry.entry_id)
+        await hass.async_block_till_done()
+    finally:
+        for port in agents.ports:
+            await async_get_remote_client(hass, "127.0.0.1", port).async_close()
+        await hass.async_add_executor_job(agents.stop)
+
+    writes = sum(simulator.timeline.total for simulator in simulators)
+    if any(
+        simulator.timeline.total > len(simulator.timeline) for simulator in simulators
+    ):
+        out.write("Timeline overflowed, out-of-order check is incomplete\n")
+    out.write(
+        f"channels            {options.channels} ({len(agents.ports)} agents)\n"
+        f"commands            {options.commands}\n"
+        f"concurrency         {options.concurrency}\n"
+        f"throughput          {options.commands / elapsed:.0f} commands/s\n"
+        f"hardware writes     {writes}\n"
+        f"max loop blocking   {probe.max_lag * 1000:.1f} ms"
+        f" ({probe.samples} probes)\n"
+        f"command errors      {failures}\n"
+        f"final mismatches    {mismatches}\n"
+        f"out-of-order writes {out_of_order}\n"
+    )
+    assert failures == 0
+    assert mismatches == 0
+    assert out_of_order == 0
+    assert probe.max_lag <= options.max_lag
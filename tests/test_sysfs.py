@@ -0,0 +1,61 @@
+"""Tests of the sysfs PWM backend against a fake sysfs tree."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from custom_components.rpi_pwm.sysfs import SysfsPwmChannel
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    """Return a fake sysfs tree with pwmchip0 and exported channel pwm0."""
+    chip = tmp_path / "pwmchip0"
+    pwm = chip / "pwm0"
+    pwm.mkdir(parents=True)
+    (chip / "export").write_bytes(b"")
+    (pwm / "period").write_bytes(b"0\n")
+    (pwm / "duty_cycle").write_bytes(b"0\n")
+    (pwm / "enable").write_bytes(b"0\n")
+    return tmp_path
+
+
+def test_round_trip(tree: Path) -> None:
+    """Test that values written by one channel are adopted by the next."""
+    pwm = tree / "pwmchip0" / "pwm0"
+    channel = SysfsPwmChannel(0, 1000, root=tree)
+    channel.open()
+    assert (pwm / "period").read_bytes() == b"1000000\n"
+
+    channel.start(123000)
+    channel.change_duty_ns(61000)
+    channel.change_duty_ns(7)
+    channel.close()
+    assert (pwm / "duty_cycle").read_bytes() == b"7\n"
+    assert (pwm / "enable").read_bytes() == b"1\n"
+
+    channel = SysfsPwmChannel(0, 1000, root=tree)
+    channel.open()
+    assert channel.duty_ns == 7
+    assert channel.is_enabled
+    channel.stop()
+    channel.close()
+    assert (pwm / "duty_cycle").read_bytes() == b"0\n"
+    assert (pwm / "enable").read_bytes() == b"0\n"
+
+
+def test_change_frequency(tree: Path) -> None:
+    """Test that a shorter period keeps the relative duty cycle."""
+    pwm = tree / "pwmchip0" / "pwm0"
+    channel = SysfsPwmChannel(0, 100, root=tree)
+    channel.open()
+    channel.start(5000000)
+    channel.change_frequency(25000)
+    channel.close()
+    assert (pwm / "period").read_bytes() == b"40000\n"
+    assert (pwm / "duty_cycle").read_bytes() == b"20000\n"
@@ -0,0 +1,147 @@
+"""Tests of the frame plans and the runners that play them."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from itertools import pairwise
+from typing import TYPE_CHECKING
+
+import pytest
+
+from custom_components.rpi_pwm.transition import (
+    EASINGS,
+    FrameClock,
+    SlewRateLimiter,
+    ThreadedTransitionRunner,
+    TransitionRunner,
+    build_frame_plan,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def test_frame_count_and_spacing() -> None:
+    """Test that frames lie on the frame rate grid, one per changed value."""
+    plan = build_frame_plan(start=0, end=100, duration=2.0, frame_rate=50)
+    assert len(plan) == 100
+    assert list(plan.offsets) == pytest.approx([i / 50 for i in range(1, 101)])
+    assert list(plan.values) == list(range(1, 101))
+
+    # Fewer steps than frames: frames that would repeat a value are left out.
+    plan = build_frame_plan(start=0, end=10, duration=2.0, frame_rate=50)
+    assert len(plan) == 10
+    assert list(plan.values) == list(range(1, 11))
+    for offset in plan.offsets:
+        assert offset * 50 == pytest.approx(round(offset * 50))
+
+
+@pytest.mark.parametrize("easing", list(EASINGS))
+@pytest.mark.parametrize("quantize", [round, math.floor, float])
+def test_last_frame_is_the_target(
+    easing: str, quantize: Callable[[float], float]
+) -> None:
+    """Test that the plan ends exactly on the target, in order."""
+    for start, end in ((0, 1000.4), (1000, 0), (3, 997.5)):
+        plan = build_frame_plan(
+            start, end, duration=0.73, frame_rate=30, easing=easing, quantize=quantize
+        )
+        assert plan.values[-1] == quantize(end)
+        assert plan.offsets[-1] <= 0.73
+        assert all(low < high for low, high in pairwise(plan.offsets))
+        assert all(low != high for low, high in pairwise(plan.values))
+        step = 1 if end > start else -1
+        assert all((high - low) * step > 0 for low, high in pairwise(plan.values))
+
+
+def test_zero_length() -> None:
+    """Test that a transition without duration is one frame of the target."""
+    for duration in (0.0, 0.01, -1.0):
+        plan = build_frame_plan(start=0, end=500, duration=duration, frame_rate=50)
+        assert list(plan.values) == [500]
+        assert plan.offsets[0] == max(duration, 0.0)
+
+
+async def _async_play(duration: float) -> list[float]:
+    loop = asyncio.get_running_loop()
+    written: list[float] = []
+    done = asyncio.Event()
+    plan = build_frame_plan(start=0, end=1000, duration=duration, frame_rate=100)
+    runner = TransitionRunner(loop, plan, written.append, done.set)
+    runner.start()
+    await asyncio.wait_for(done.wait(), 5)
+    assert not runner.running
+    return written
+
+
+def test_runner_plays_to_the_end() -> None:
+    """Test that the runner writes the plan in order and ends on the target."""
+    start = time.monotonic()
+    written = asyncio.run(_async_play(0.2))
+    assert time.monotonic() - start >= 0.2
+    assert written[-1] == 1000
+    assert all(low < high for low, high in pairwise(written))
+
+    assert asyncio.run(_async_play(0)) == [1000]
+
+
+async def _async_cancel() -> None:
+    loop = asyncio.get_running_loop()
+    plan = build_frame_plan(start=0, end=1000, duration=0.5, frame_rate=100)
+    clock = FrameClock(loop)
+    for make_runner in (
+        lambda write, done: TransitionRunner(loop, plan, write, done),
+        lambda write, done: ThreadedTransitionRunner(clock, plan, write, done),
+    ):
+        written: list[float] = []
+        done = asyncio.Event()
+        runner = make_runner(written.append, done.set)
+        runner.start()
+        await asyncio.sleep(0.1)
+        runner.cancel()
+        assert not runner.running
+        count = len(written)
+        await asyncio.sleep(0.5)
+        assert len(written) == count
+        assert 0 < written[-1] < 1000
+        assert not done.is_set()
+    clock.stop()
+
+
+def test_cancel() -> None:
+    """Test that a cancelled run writes no further frames and never finishes."""
+    asyncio.run(_async_cancel())
+
+
+async def _async_retarget_slew() -> None:
+    loop = asyncio.get_running_loop()
+    written: list[float] = []
+    arrived = asyncio.Event()
+
+    def write(value: float) -> None:
+        written.append(value)
+        if value == -50:
+            arrived.set()
+
+    limiter = SlewRateLimiter(loop, write)
+    limiter.move_to(100, position=0, rate=500, frame_rate=100)
+    await asyncio.sleep(0.05)
+    assert limiter.running
+    reached = written[-1]
+    assert 0 < reached < 100
+
+    # A running limiter keeps its position and takes over target and rate.
+    limiter.move_to(-50, position=1000, rate=1000, frame_rate=100)
+    await asyncio.wait_for(arrived.wait(), 5)
+    assert not limiter.running
+    turn = written.index(max(written))
+    assert all(low <= high for low, high in pairwise(written[: turn + 1]))
+    assert all(low > high for low, high in pairwise(written[turn:]))
+    assert max(written) < 100
+
+
+def test_slew_retarget_in_flight() -> None:
+    """Test that a new target turns a running ramp around where it is."""
+    asyncio.run(_async_retarget_slew())
@@ -0,0 +1,146 @@
+"""Tests of the latest-wins writer against a fake channel."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import TYPE_CHECKING, Any
+
+from custom_components.rpi_pwm.metrics import ChannelMetrics
+from custom_components.rpi_pwm.remote import RemoteTransitionRunner
+from custom_components.rpi_pwm.transition import build_frame_plan
+from custom_components.rpi_pwm.writer import PwmWriter
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from custom_components.rpi_pwm.transition import FramePlan
+
+CANCELLED_AT = 3
+
+
+class FakeChannel:
+    """
+    Channel that records what the writer does with it, in order.
+
+    While the gate is closed, the writer thread blocks in the next operation,
+    so requests queued meanwhile stay pending.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an idle channel with an open gate."""
+        self.duty_ns = 0
+        self.ops: list[tuple[Any, ...]] = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+        self.played = threading.Event()
+
+    def _enter(self) -> None:
+        self.entered.set()
+        self.gate.wait()
+
+    def change_duty_ns(self, duty_ns: int) -> bool:
+        """Record a write."""
+        self._enter()
+        self.ops.append(("write", duty_ns))
+        written = duty_ns != self.duty_ns
+        self.duty_ns = duty_ns
+        return written
+
+    def play(
+        self,
+        plan: FramePlan,  # noqa: ARG002
+        period: float | None,  # noqa: ARG002
+        on_done: Callable[[int | None], None],  # noqa: ARG002
+    ) -> None:
+        """Record a plan handed to the channel."""
+        self._enter()
+        self.ops.append(("play",))
+        self.played.set()
+
+    def cancel_play(self) -> int:
+        """Record a cancelled plan, which stopped at CANCELLED_AT."""
+        self._enter()
+        self.ops.append(("cancel",))
+        self.duty_ns = CANCELLED_AT
+        return CANCELLED_AT
+
+
+async def _async_blocked_write(
+    writer: PwmWriter, pwm: FakeChannel, duty_ns: int
+) -> asyncio.Future[None]:
+    """Start a write and wait until the writer thread blocks in it."""
+    pwm.gate.clear()
+    pwm.entered.clear()
+    write = asyncio.ensure_future(writer.async_write(duty_ns))
+    await asyncio.get_running_loop().run_in_executor(None, pwm.entered.wait)
+    return write
+
+
+async def _async_burst() -> None:
+    metrics = ChannelMetrics()
+    writer = PwmWriter(asyncio.get_running_loop(), "test", metrics)
+    pwm = FakeChannel()
+    writer.start(pwm)  # type: ignore[arg-type]
+
+    first = await _async_blocked_write(writer, pwm, 1)
+    for duty_ns in range(2, 101):
+        writer.write_nowait(duty_ns)
+    last = asyncio.ensure_future(writer.async_write(200))
+    await asyncio.sleep(0)
+    pwm.gate.set()
+    await asyncio.gather(first, last)
+    await writer.async_stop()
+
+    assert pwm.ops == [("write", 1), ("write", 200)]
+    assert metrics.writes == 2
+    assert metrics.coalesced == 99
+    assert writer.duty_ns == 200
+
+
+async def _async_write_after_stop_play() -> None:
+    loop = asyncio.get_running_loop()
+    writer = PwmWriter(loop, "test", ChannelMetrics())
+    pwm = FakeChannel()
+    writer.start(pwm)  # type: ignore[arg-type]
+    plan = build_frame_plan(start=0, end=1000, duration=1.0, frame_rate=50)
+
+    # The plan reached the channel: the cancel is sent, then the write.
+    runner = RemoteTransitionRunner(writer, plan)
+    runner.start()
+    await loop.run_in_executor(None, pwm.played.wait)
+    pwm.gate.clear()
+    pwm.entered.clear()
+    runner.cancel()
+    await loop.run_in_executor(None, pwm.entered.wait)
+    write = asyncio.ensure_future(writer.async_write(7))
+    await asyncio.sleep(0)
+    pwm.gate.set()
+    await write
+    assert pwm.ops == [("play",), ("cancel",), ("write", 7)]
+    # The value the cancelled plan stopped at does not override the write.
+    assert writer.duty_ns == 7
+
+    # The plan is still pending: it is dropped and never reaches the channel.
+    pwm.ops.clear()
+    blocked = await _async_blocked_write(writer, pwm, 1)
+    runner = RemoteTransitionRunner(writer, plan)
+    runner.start()
+    runner.cancel()
+    writer.write_nowait(9)
+    pwm.gate.set()
+    await blocked
+    await writer.async_stop()
+    assert pwm.ops == [("write", 1), ("write", 9)]
+    assert writer.duty_ns == 9
+
+
+def test_burst_is_coalesced() -> None:
+    """Test that a burst of writes ends in one write of the last value."""
+    asyncio.run(_async_burst())
+
+
+def test_write_after_stop_play() -> None:
+    """Test that a write after a stopped plan is not overtaken by the plan."""
+    asyncio.run(_async_write_after_stop_play())